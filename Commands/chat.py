@@ -3,30 +3,51 @@ Chat empático - Conversación genuina sin juzgar
 Escucha, valida y acompaña sin pretender tener todas las respuestas
 """
 
+import asyncio
 import os
 import logging
 import re
+import time
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
-from groq import Groq
 
 # Importar desde utils
-from utils.credits import consume_credits, get_credits, add_credits
+from utils.credits import aconsume_credits, aget_credits, aadd_credits
+from utils.chat_store import chat_sessions
+from utils.conversation import (
+    build_messages,
+    cancel_summary_refresh,
+    compact_history,
+    messages_tokens,
+    schedule_summary_refresh,
+)
+from utils.emotional import detect_emotional_pain
+from utils.llm import get_llm_client
+from utils.llm_fallback import LLMUnavailable, stream_chat_resilient
+from utils.llm_scheduler import CRISIS, NORMAL
 
 logger = logging.getLogger(__name__)
 
 # Cliente de Groq
 groq_client = None
 
-# Palabras que indican dolor emocional
-EMOTIONAL_PAIN_KEYWORDS = [
-    "depresión", "deprimido", "tristeza", "triste", "suicidio", "suicidarme",
-    "muerte", "quiero morirme", "no aguanto", "no puedo", "solo/a", "soledad",
-    "ansiedad", "pánico", "miedo", "trauma", "abuso", "maltrato",
-    "duelo", "pérdida", "abandono", "rechazo", "humillación", "vergüenza",
-    "culpa", "fracaso", "inútil", "sin sentido", "vacío", "desesperado",
-    "acosado", "bullying", "autolesión", "trastorno", "bipolar", "esquizofrenia"
-]
+# Edición progresiva de la respuesta: como máximo una edición cada
+# CHAT_STREAM_EDIT_INTERVAL segundos y sólo si llegaron CHAT_STREAM_EDIT_MIN_CHARS
+# caracteres nuevos (Telegram limita las ediciones por chat)
+STREAM_EDIT_INTERVAL = float(os.getenv("CHAT_STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_EDIT_MIN_CHARS = int(os.getenv("CHAT_STREAM_EDIT_MIN_CHARS", "40"))
+
+# Mensajes del mismo usuario con menos de CHAT_DEBOUNCE_SECONDS entre uno y
+# otro se responden juntos
+CHAT_DEBOUNCE_SECONDS = float(os.getenv("CHAT_DEBOUNCE_SECONDS", "1.0"))
+
+# Respuesta de reserva cuando ningún modelo responde a tiempo
+CANNED_REPLY = (
+    "Te leí, y lo que sientes importa. Ahora mismo me cuesta encontrar las "
+    "palabras, pero sigo aquí contigo.\n\n"
+    "Si quieres, cuéntame un poco más. 💙"
+)
 
 SYSTEM_PROMPT_EMPATHETIC = """Eres un acompañante emocional genuino. Tu propósito NO es ser "útil" sino hacer que la persona se sienta menos sola.
 
@@ -66,46 +87,168 @@ def init_groq():
     """Inicializa el cliente de Groq si aún no existe."""
     global groq_client
     if groq_client is None:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
+        try:
+            groq_client = get_llm_client()
+        except ValueError:
             logger.error("GROQ_API_KEY no está definida en el .env")
-            raise ValueError("GROQ_API_KEY requerida")
-        groq_client = Groq(api_key=api_key)
+            raise
         logger.info("Cliente Groq inicializado para chat empático")
 
 
-def detect_emotional_pain(text: str) -> bool:
-    """Detecta si el usuario expresa dolor emocional profundo."""
-    text_lower = text.lower()
-    for keyword in EMOTIONAL_PAIN_KEYWORDS:
-        if keyword in text_lower:
-            return True
-    return False
-
-
-def get_crisis_resources(lang: str = "es") -> str:
-    """Retorna recursos de crisis según idioma."""
-    if lang == "es":
-        return (
-            "Si estás en crisis, por favor:\n"
-            "📞 Llama a una línea de crisis (busca 'línea de suicidio + tu país')\n"
-            "👨‍⚕️ Habla con un profesional mental\n"
-            "💙 Busca a alguien de confianza\n\n"
-            "Existes. Tu dolor es real. Mereces apoyo real. 💙"
-        )
-    return (
+CRISIS_RESOURCES = {
+    "es": (
+        "Si estás en crisis, por favor:\n"
+        "📞 Llama a una línea de crisis (busca 'línea de suicidio + tu país')\n"
+        "👨‍⚕️ Habla con un profesional mental\n"
+        "💙 Busca a alguien de confianza\n\n"
+        "Existes. Tu dolor es real. Mereces apoyo real. 💙"
+    ),
+    "en": (
         "If you're in crisis:\n"
         "📞 Call a crisis line (search 'suicide hotline + your country')\n"
         "👨‍⚕️ Talk to a mental health professional\n"
         "💙 Reach out to someone you trust\n\n"
         "You exist. Your pain is real. You deserve real support. 💙"
-    )
+    ),
+    "ru": (
+        "Если ты в кризисе, пожалуйста:\n"
+        "📞 Позвони на линию кризисной помощи (найди 'телефон доверия + твоя страна')\n"
+        "👨‍⚕️ Поговори со специалистом по психическому здоровью\n"
+        "💙 Обратись к человеку, которому доверяешь\n\n"
+        "Ты существуешь. Твоя боль реальна. Ты заслуживаешь настоящей поддержки. 💙"
+    ),
+}
+
+# Se añade al prompt cuando los recursos ya se enviaron en un mensaje aparte
+CRISIS_RESOURCES_SENT_NOTE = (
+    "La persona ya recibió, en un mensaje aparte, los recursos de crisis "
+    "(líneas de ayuda, profesionales, personas de confianza). No los repitas: "
+    "céntrate en acompañarla."
+)
+
+
+def get_crisis_resources(lang: str = "es") -> str:
+    """Retorna recursos de crisis según idioma (código de Telegram, p. ej. 'es-MX')."""
+    lang_code = (lang or "")[:2].lower()
+    if lang_code not in CRISIS_RESOURCES:
+        lang_code = "en"
+    return CRISIS_RESOURCES[lang_code]
+
+
+# Envíos de recursos en curso (referencia fuerte hasta que terminan)
+_crisis_sends = set()
+
+
+async def _send_crisis_resources(message, lang: str):
+    try:
+        await message.reply_text(get_crisis_resources(lang))
+    except Exception as e:
+        logger.error(f"No se pudieron enviar los recursos de crisis: {e}")
+
+
+def send_crisis_resources(message, lang: str):
+    """Envía los recursos de crisis ya, sin esperar al modelo ni bloquear al llamador."""
+    task = asyncio.ensure_future(_send_crisis_resources(message, lang))
+    _crisis_sends.add(task)
+    task.add_done_callback(_crisis_sends.discard)
+    return task
+
+
+class ProgressiveEditor:
+    """Edita un mensaje a medida que llega texto, agrupando las ediciones."""
+
+    def __init__(self, message, interval: float = STREAM_EDIT_INTERVAL, min_chars: int = STREAM_EDIT_MIN_CHARS):
+        self.message = message
+        self.interval = interval
+        self.min_chars = min_chars
+        self.started_at = time.monotonic()
+        self.first_visible_at = None
+        self.edits = 0
+        self._last_edit_at = 0.0
+        self._last_text = ""
+
+    async def _edit(self, text: str, final: bool = False):
+        if text == self._last_text:
+            return
+        try:
+            await self.message.edit_text(text)
+        except RetryAfter as e:
+            if final:
+                raise
+            # Saltamos esta edición; la siguiente (o la final) llevará el texto
+            logger.debug("Edición omitida por límite de Telegram (%s)", e)
+            return
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+        self._last_text = text
+        self._last_edit_at = time.monotonic()
+        self.edits += 1
+        if self.first_visible_at is None:
+            self.first_visible_at = self._last_edit_at
+
+    async def update(self, text: str):
+        """Muestra el texto parcial si ya pasó el intervalo y hay suficiente texto nuevo."""
+        now = time.monotonic()
+        if now - self._last_edit_at < self.interval:
+            return
+        if len(text) - len(self._last_text) < self.min_chars and self.first_visible_at is not None:
+            return
+        await self._edit(text + " …")
+
+    async def finish(self, text: str):
+        """Edición final con el texto completo (siempre llega al usuario).
+
+        Si Telegram la limita se espera retry_after y se reintenta una vez;
+        si vuelve a limitarla, el texto completo sale en un mensaje nuevo en
+        lugar de quedarse el parcial.
+        """
+        for attempt in range(2):
+            try:
+                await self._edit(text, final=True)
+                return
+            except RetryAfter as e:
+                delay = e.retry_after
+                # python-telegram-bot >= 21 puede darlo como timedelta
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                if attempt == 0:
+                    logger.info("Edición final limitada por Telegram; reintento en %.0fs", delay)
+                    await asyncio.sleep(delay)
+        logger.warning("Edición final limitada otra vez; se envía la respuesta en un mensaje nuevo")
+        await self.message.reply_text(text)
+        self._last_text = text
+
+    def time_to_first_text(self) -> float:
+        if self.first_visible_at is None:
+            return None
+        return self.first_visible_at - self.started_at
+
+
+class _Burst:
+    """Mensajes seguidos de un usuario que todavía no tienen respuesta."""
+
+    def __init__(self):
+        self.texts = []
+        self.seq = 0
+        self.placeholder = None
+        self.reply_task = None
+        # Recursos de crisis ya enviados en esta ráfaga
+        self.crisis_sent = False
+        self.message = None
+
+
+# user_id -> _Burst; la entrada se borra cuando todos sus mensajes tienen respuesta
+_bursts = {}
 
 
 async def handle_chat_empathetic(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Maneja mensajes con lógica empática genuina.
     Escucha, valida, acompaña sin resolver apresuradamente.
+
+    Los mensajes que llegan seguidos (a menos de CHAT_DEBOUNCE_SECONDS uno
+    de otro) se juntan en un solo turno y se responden con una sola
+    llamada al modelo, editando un único mensaje de "Pensando en ti...".
     """
     user = update.effective_user
     if not user:
@@ -114,6 +257,14 @@ async def handle_chat_empathetic(update: Update, context: ContextTypes.DEFAULT_T
     user_id = user.id
     message_text = update.message.text.strip()
     
+    # Los recursos de crisis salen ya: no esperan al modelo ni dependen de
+    # que esté configurado o responda. Una vez por ráfaga
+    has_emotional_pain = detect_emotional_pain(message_text, user.language_code)
+    pending = _bursts.get(user_id)
+    crisis_sent = has_emotional_pain and not (pending is not None and pending.crisis_sent)
+    if crisis_sent:
+        send_crisis_resources(update.message, user.language_code)
+    
     # Validar longitud
     if len(message_text) > 3000:
         await update.message.reply_text(
@@ -126,9 +277,6 @@ async def handle_chat_empathetic(update: Update, context: ContextTypes.DEFAULT_T
     if len(message_text) < 2:
         return  # Ignorar mensajes vacíos
     
-    # Verificar si detectamos dolor profundo
-    has_emotional_pain = detect_emotional_pain(message_text)
-    
     # Inicializar Groq
     try:
         init_groq()
@@ -139,58 +287,149 @@ async def handle_chat_empathetic(update: Update, context: ContextTypes.DEFAULT_T
         )
         return
     
-    # Mantener historial (últimos 10 mensajes = 5 intercambios)
-    if "chat_history" not in context.user_data:
-        context.user_data["chat_history"] = []
+    burst = _bursts.setdefault(user_id, _Burst())
+    burst.texts.append(message_text)
+    burst.seq += 1
+    seq = burst.seq
+    burst.message = update.message
+    if crisis_sent:
+        burst.crisis_sent = True
+    
+    # Una respuesta en curso queda superada: la nueva incluirá sus mensajes
+    if burst.reply_task is not None and not burst.reply_task.done():
+        burst.reply_task.cancel()
     
-    # Agregar mensaje del usuario
-    context.user_data["chat_history"].append({
+    # Mensaje de "está escribiendo", uno solo por ráfaga
+    if burst.placeholder is None:
+        burst.placeholder = asyncio.ensure_future(update.message.reply_text("Pensando en ti..."))
+    
+    await asyncio.sleep(CHAT_DEBOUNCE_SECONDS)
+    if burst.seq != seq:
+        return  # Llegó otro mensaje: responde el handler de ese mensaje
+    
+    task = asyncio.ensure_future(_reply_burst(burst, user, context))
+    burst.reply_task = task
+    try:
+        # wait() no propaga la cancelación de la tarea si la supera otro mensaje
+        await asyncio.wait({task})
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"No se pudo responder a la ráfaga de {user_id}: {task.exception()}")
+    if not burst.texts and _bursts.get(user_id) is burst:
+        del _bursts[user_id]
+
+
+async def _reply_burst(burst: _Burst, user, context: ContextTypes.DEFAULT_TYPE):
+    """Responde a todos los mensajes pendientes de la ráfaga con una sola completion."""
+    user_id = user.id
+    count = len(burst.texts)
+    message_text = "\n".join(burst.texts)
+    
+    # Verificar si detectamos dolor profundo (también entre mensajes de la ráfaga)
+    has_emotional_pain = burst.crisis_sent or detect_emotional_pain(message_text, user.language_code)
+    if has_emotional_pain and not burst.crisis_sent:
+        burst.crisis_sent = True
+        send_crisis_resources(burst.message, user.language_code)
+    
+    try:
+        # Historial persistente (se carga con el primer mensaje)
+        session = await chat_sessions.get(user_id)
+        typing_msg = await burst.placeholder
+    except Exception:
+        # Sin historial o sin "Pensando en ti..." no hay turno que responder:
+        # se descartan estos mensajes y el siguiente empieza una ráfaga nueva
+        del burst.texts[:count]
+        burst.placeholder = None
+        burst.reply_task = None
+        burst.crisis_sent = False
+        raise
+    
+    # Historial limitado por tokens; lo que no cabe pasa al resumen
+    if compact_history(session):
+        schedule_summary_refresh(
+            context.application, user_id, session,
+            on_update=lambda: chat_sessions.save(user_id, session),
+        )
+    user_turn = {
         "role": "user",
         "content": message_text
-    })
+    }
+    prompt_messages = build_messages(SYSTEM_PROMPT_EMPATHETIC, session)
+    if has_emotional_pain:
+        prompt_messages.append({"role": "system", "content": CRISIS_RESOURCES_SENT_NOTE})
+    prompt_messages.append(user_turn)
+    prompt_tokens = messages_tokens(prompt_messages)
     
-    # Limitar historial
-    if len(context.user_data["chat_history"]) > 10:
-        context.user_data["chat_history"] = context.user_data["chat_history"][-10:]
+    editor = ProgressiveEditor(typing_msg)
+    committed = False
     
-    # Mensaje de "está escribiendo"
-    typing_msg = await update.message.reply_text("Pensando en ti...")
+    def commit(reply: str = None):
+        # Sin await entre estas líneas: un mensaje nuevo ya no puede cancelar
+        # este turno ni mezclarse con él
+        nonlocal committed
+        committed = True
+        del burst.texts[:count]
+        burst.placeholder = None
+        burst.reply_task = None
+        burst.crisis_sent = False
+        session.setdefault("chat_history", []).append(user_turn)
+        if reply:
+            session["chat_history"].append({
+                "role": "assistant",
+                "content": reply
+            })
+        chat_sessions.save(user_id, session)
     
+    metrics = {}
     try:
-        # Llamar a Groq con sistema empático
-        response = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT_EMPATHETIC
-                }
-            ] + context.user_data["chat_history"],
-            model="llama-3.1-8b-instant",
+        # Llamar a Groq con sistema empático, mostrando la respuesta a medida que llega.
+        # Los mensajes con dolor emocional pasan delante en la cola del LLM
+        parts = []
+        # Modelos de CHAT_MODEL_CHAIN con respaldo y petición duplicada si tarda
+        async for delta in stream_chat_resilient(
+            priority=CRISIS if has_emotional_pain else NORMAL,
+            metrics=metrics,
+            messages=prompt_messages,
             max_tokens=400,  # Respuestas concisas, genuinas
             temperature=0.9,  # Más natural, menos robótico
-            timeout=15
-        )
+        ):
+            parts.append(delta)
+            await editor.update("".join(parts).strip())
         
-        bot_reply = response.choices[0].message.content.strip()
+        bot_reply = "".join(parts).strip()
+        if not bot_reply:
+            raise ValueError("Respuesta vacía del modelo")
         
-        # Agregar respuesta al historial
-        context.user_data["chat_history"].append({
-            "role": "assistant",
-            "content": bot_reply
-        })
+        # Agregar turno y respuesta al historial
+        commit(bot_reply)
         
-        # Si detectamos dolor profundo, agregar recursos
-        if has_emotional_pain:
-            bot_reply += f"\n\n{get_crisis_resources('es')}"
+        # Edición final con la respuesta completa
+        await editor.finish(bot_reply)
         
-        # Editar mensaje de "pensando" con la respuesta
-        await typing_msg.edit_text(bot_reply)
+        logger.info(
+            f"Chat empático con user {user_id}: tema detectado={has_emotional_pain} "
+            f"mensajes={count} "
+            f"primer_texto={editor.time_to_first_text() or 0:.2f}s ediciones={editor.edits} "
+            f"prompt_tokens~{prompt_tokens} cola={metrics.get('queue_wait', 0):.2f}s "
+            f"modelo={metrics.get('model')} intentos={metrics.get('attempts')} "
+            f"latencia={time.monotonic() - editor.started_at:.2f}s"
+        )
         
-        logger.info(f"Chat empático con user {user_id}: tema detectado={has_emotional_pain}")
+    except LLMUnavailable as e:
+        # Respuesta de reserva: nunca más tarde que CHAT_REPLY_SLA
+        logger.warning(f"Chat empático sin modelo disponible para {user_id}: {e}")
+        if not committed:
+            commit()
+        await editor.finish(CANNED_REPLY)
         
     except Exception as e:
         logger.error(f"Error en chat empático para {user_id}: {e}")
         
+        # El mensaje del usuario se conserva en el historial
+        if not committed:
+            commit()
         await typing_msg.edit_text(
             "Algo falló en mi parte. Pero tu sentimiento sigue siendo válido.\n\n"
             "¿Quieres intentar de nuevo? O si prefieres hablar con alguien de verdad, "
@@ -198,8 +437,6 @@ async def handle_chat_empathetic(update: Update, context: ContextTypes.DEFAULT_T
         )
 
 
-
-
 async def start_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mantener para compatibilidad."""
     await update.message.reply_text(
@@ -215,8 +452,12 @@ async def handle_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def clear_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Borra el historial de conversación."""
-    if "chat_history" in context.user_data:
-        context.user_data["chat_history"] = []
+    if update.effective_user:
+        burst = _bursts.pop(update.effective_user.id, None)
+        if burst is not None and burst.reply_task is not None:
+            burst.reply_task.cancel()
+        cancel_summary_refresh(update.effective_user.id)
+        await chat_sessions.clear(update.effective_user.id)
     
     await update.message.reply_text(
         "Historial limpio. Siempre podemos empezar de nuevo. 💙"
@@ -2,24 +2,29 @@ import os
 import time
 import logging
 import asyncio
-import requests
+import random
+import httpx
 from telegram import Update
 from telegram.ext import ContextTypes
-from io import BytesIO
 import urllib.parse
 
 # Importar desde utils
-from utils.credits import consume_credits, get_credits, add_credits, get_user_subscription, check_usage_limit
+from utils.credits import acheck_usage_limit, atry_charge_usage, arefund_usage, aget_user_subscription
+from utils.image_archive import image_archive
+from utils.image_cache import cache_key, image_cache
+from utils.image_client import POLLINATIONS_BASE_URL, fetch_image
+from utils.telegram_files import telegram_files
 
 logger = logging.getLogger(__name__)
 
-# Configuración
-output_dir = os.getenv("IMAGE_OUTPUT_DIR", "imagenes_generadas")
-os.makedirs(output_dir, exist_ok=True)
-
 # Costo en créditos por imagen
 IMAGE_COST = int(os.getenv("IMAGE_CREDIT_COST", "10"))
 
+# /batch: imágenes que se generan a la vez y cuántas van en cada álbum
+# (send_media_group admite de 2 a 10)
+BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "10"))
+BATCH_GROUP_SIZE = min(10, max(2, int(os.getenv("IMAGE_BATCH_GROUP_SIZE", "5"))))
+
 # Estilos especializados para creators
 ESTILOS_PREMIUM = {
     "glamour": "professional glamour photography, soft lighting, luxury aesthetic, beauty portrait, high fashion, studio lighting",
@@ -35,13 +40,46 @@ ESTILOS_PREMIUM = {
 }
 
 
-def generate_image_pollinations(prompt: str, style: str = None, timeout: int = 60) -> bytes:
+def format_quota(usage: dict) -> str:
+    """Línea con la cuota restante del plan (día y mes)."""
+    return (
+        f"📊 Cuota restante: {usage['daily_remaining']}/{usage['daily_limit']} hoy, "
+        f"{usage['monthly_remaining']}/{usage['monthly_limit']} este mes"
+    )
+
+
+def format_charge_rejected(usage: dict, cost: int) -> str:
+    """Mensaje para un cobro rechazado por créditos o por cuota del plan."""
+    if usage["reason"] == "quota":
+        return (
+            f"⚠️ Alcanzaste el límite de tu plan {usage['tier'].upper()}.\n\n"
+            f"{format_quota(usage)}\n\n"
+            f"Usa /planes para ampliar tus límites."
+        )
+    return (
+        f"⚠️ Créditos insuficientes.\n\n"
+        f"Necesitas: {cost} créditos\n"
+        f"Tienes: {usage['balance']} créditos\n\n"
+        f"Usa /planes para mejorar tu plan."
+    )
+
+
+async def generate_image_pollinations(prompt: str, style: str = None, timeout: int = 60, seed: int = None,
+                                      cache: bool = False) -> bytes:
     """Genera una imagen usando Pollinations.ai con estilos especializados.
     
+    Usa el cliente HTTP compartido (utils.image_client): no ocupa un hilo
+    y reutiliza las conexiones abiertas.
+    
     Args:
         prompt: Descripción de la imagen
         style: Estilo predefinido (ver ESTILOS_PREMIUM)
-        timeout: Tiempo máximo de espera en segundos
+        timeout: Timeout de lectura en segundos
+        seed: Semilla de Pollinations (por defecto, la hora actual: cada
+            petición es una variación nueva)
+        cache: Con una semilla explícita, reutilizar la imagen de una
+            petición idéntica (utils.image_cache) y compartir descargas
+            simultáneas. Sin semilla no hay nada que reutilizar y se ignora
         
     Returns:
         bytes: Imagen en formato PNG
@@ -59,39 +97,41 @@ def generate_image_pollinations(prompt: str, style: str = None, timeout: int = 6
     encoded_prompt = urllib.parse.quote(enhanced_prompt)
     
     # URL de Pollinations (genera imagen al vuelo)
-    url = f"https://image.pollinations.ai/prompt/{encoded_prompt}"
+    url = f"{POLLINATIONS_BASE_URL}/prompt/{encoded_prompt}"
     
     # Parámetros opcionales
     params = {
         "width": 1024,
         "height": 1024,
-        "seed": int(time.time()),  # Seed aleatorio basado en tiempo
+        "seed": seed if seed is not None else int(time.time()),  # Seed aleatorio basado en tiempo
         "nologo": "true"  # Sin marca de agua
     }
     
     try:
-        response = requests.get(
-            url,
-            params=params,
-            timeout=timeout
+        if not cache or seed is None:
+            return await fetch_image(url, params=params, timeout=timeout)
+        return await image_cache.get_or_fetch(
+            cache_key(enhanced_prompt, **params),
+            lambda: fetch_image(url, params=params, timeout=timeout),
+            meta={"prompt": enhanced_prompt, **params},
         )
         
-        if response.status_code != 200:
-            raise Exception(f"Error API: {response.status_code}")
-        
-        return response.content
-        
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise Exception("Timeout: la generación tardó demasiado.")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPStatusError as e:
+        raise Exception(str(e))
+    except httpx.HTTPError as e:
         raise Exception(f"Error de conexión: {str(e)}")
 
 
 async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Genera imágenes con IA usando Pollinations.ai.
     
-    Uso: /image <descripción>
+    Uso: /image [estilo] [seed=N] <descripción>
     Ejemplo: /image glamour un gato astronauta en el espacio
+    
+    Sin seed cada petición es una imagen nueva; con seed=N la misma
+    descripción, estilo y semilla dan la misma imagen (sale de la caché).
     """
     user = update.effective_user
     if not user:
@@ -102,19 +142,20 @@ async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Verificar que hay un prompt
     if not args:
-        credits = get_credits(user_id)
-        sub = get_user_subscription(user_id)
+        usage = await acheck_usage_limit(user_id, IMAGE_COST)
         
         styles_list = "\n".join([f"  • {k}" for k in ESTILOS_PREMIUM.keys()])
         
         await update.message.reply_text(
             f"🎨 Generador de imágenes IA Premium\n\n"
-            f"Uso: /image [estilo] <descripción>\n"
-            f"Ejemplo: /image glamour mujer elegante en playa\n\n"
+            f"Uso: /image [estilo] [seed=N] <descripción>\n"
+            f"Ejemplo: /image glamour mujer elegante en playa\n"
+            f"Con seed=N se repite la misma imagen.\n\n"
             f"Estilos disponibles:\n{styles_list}\n\n"
             f"💰 Costo: {IMAGE_COST} créditos por imagen\n"
-            f"📊 Plan actual: {sub['tier'].upper()}\n"
-            f"⭐ Tus créditos: {credits}"
+            f"📊 Plan actual: {usage['tier'].upper()}\n"
+            f"⭐ Tus créditos: {usage['credits']}\n"
+            f"{format_quota(usage)}"
         )
         return
     
@@ -126,6 +167,12 @@ async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         style = args[0]
         prompt_start = 1
     
+    # Semilla explícita: repetir una imagen ya generada
+    seed = None
+    if prompt_start < len(args) and args[prompt_start].startswith("seed=") and args[prompt_start][5:].isdigit():
+        seed = int(args[prompt_start][5:])
+        prompt_start += 1
+    
     # Construir prompt
     if prompt_start < len(args):
         prompt = " ".join(args[prompt_start:]).strip()
@@ -142,28 +189,10 @@ async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Descripción muy larga. Máximo 500 caracteres.")
         return
     
-    # Verificar límites de uso
-    usage = check_usage_limit(user_id, IMAGE_COST)
-    if not usage["allowed"]:
-        remaining = usage["credits"]
-        await update.message.reply_text(
-            f"⚠️ Créditos insuficientes.\n\n"
-            f"Necesitas: {IMAGE_COST} créditos\n"
-            f"Tienes: {remaining} créditos\n\n"
-            f"Mejora tu plan para obtener más créditos.\n"
-            f"Usa /planes para ver opciones."
-        )
-        return
-    
-    # Verificar y consumir créditos
-    if not consume_credits(user_id, IMAGE_COST):
-        remaining = get_credits(user_id)
-        await update.message.reply_text(
-            f"⚠️ Créditos insuficientes.\n\n"
-            f"Necesitas: {IMAGE_COST} créditos\n"
-            f"Tienes: {remaining} créditos\n\n"
-            f"Usa /planes para mejorar tu plan."
-        )
+    # Cobrar créditos y cuota del plan en una sola operación atómica
+    usage = await atry_charge_usage(user_id, 1, IMAGE_COST)
+    if not usage["ok"]:
+        await update.message.reply_text(format_charge_rejected(usage, IMAGE_COST))
         return
     
     # Mensaje de espera
@@ -176,19 +205,20 @@ async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     try:
-        # Generar imagen en thread separado
-        image_bytes = await asyncio.to_thread(generate_image_pollinations, prompt, style, timeout=60)
+        image_bytes = await generate_image_pollinations(prompt, style, timeout=60, seed=seed, cache=True)
         
-        # Guardar localmente (opcional)
-        filename = f"img_{user_id}_{int(time.time())}.png"
-        filepath = os.path.join(output_dir, filename)
-        with open(filepath, "wb") as f:
-            f.write(image_bytes)
+        # Archivar localmente, fuera del event loop y sin esperar
+        image_archive.save(user_id, image_bytes, prompt=prompt, style=style)
         
-        # Enviar imagen al usuario
-        await update.message.reply_photo(
-            photo=BytesIO(image_bytes),
-            caption=f"✨ Generado: {prompt[:200]}"
+        # Enviar imagen al usuario (por file_id si ya se subió antes)
+        await telegram_files.send_photo(
+            update.message,
+            image_bytes,
+            caption=(
+                f"✨ Generado: {prompt[:200]}\n"
+                f"💰 Créditos restantes: {usage['balance']}\n"
+                f"{format_quota(usage)}"
+            )
         )
         
         # Borrar mensaje de espera
@@ -199,8 +229,8 @@ async def image_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Error generando imagen para {user_id}: {e}")
         
-        # Devolver créditos
-        add_credits(user_id, IMAGE_COST, kind="refund")
+        # Devolver créditos y cuota
+        await arefund_usage(user_id, 1, IMAGE_COST)
         
         # Mensaje de error
         await status_msg.edit_text(
@@ -242,8 +272,8 @@ async def batch_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Puedes generar entre 1 y 10 imágenes a la vez.")
         return
     
-    # Verificar suscripción
-    sub = get_user_subscription(user_id)
+    # Verificar suscripción (en la DB: Stripe puede haberla cambiado hace segundos)
+    sub = await aget_user_subscription(user_id, fresh=True)
     if sub["tier"] not in ["pro", "agency"]:
         await update.message.reply_text(
             f"⚠️ La generación en lote solo está disponible en planes Pro y Agency.\n"
@@ -252,16 +282,6 @@ async def batch_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
-    total_cost = IMAGE_COST * count
-    if not consume_credits(user_id, total_cost):
-        remaining = get_credits(user_id)
-        await update.message.reply_text(
-            f"⚠️ Créditos insuficientes.\n\n"
-            f"Necesitas: {total_cost} créditos\n"
-            f"Tienes: {remaining} créditos"
-        )
-        return
-    
     # Detectar estilo
     style = None
     prompt_start = 1
@@ -275,29 +295,86 @@ async def batch_image_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         prompt = " ".join(args[prompt_start:]).strip()
     else:
         await update.message.reply_text("⚠️ Especifica la descripción.")
-        add_credits(user_id, total_cost, kind="refund")
+        return
+    
+    total_cost = IMAGE_COST * count
+    usage = await atry_charge_usage(user_id, count, total_cost)
+    if not usage["ok"]:
+        await update.message.reply_text(format_charge_rejected(usage, total_cost))
         return
     
     # Generar imágenes
     status_msg = await update.message.reply_text(
         f"🎨 Generando {count} imágenes...\n"
-        f"Esto puede tardar un minuto."
+        f"Te las envío a medida que estén listas."
     )
     
+    # Semillas distintas: si no, las imágenes generadas a la vez saldrían iguales
+    base_seed = random.randrange(2**31 - count)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def generate(i: int):
+        async with semaphore:
+            try:
+                return i, await generate_image_pollinations(prompt, style, timeout=60, seed=base_seed + i)
+            except Exception as e:
+                logger.error(f"Error en imagen {i+1}: {e}")
+                return i, None
+    
     successful = 0
-    for i in range(count):
+    failed = 0
+    
+    async def refund(n: int):
+        # Cada imagen fallida se devuelve por separado (créditos y cuota)
+        nonlocal failed
+        failed += n
+        await arefund_usage(user_id, n, IMAGE_COST * n)
+    
+    async def send(ready: list):
+        nonlocal successful
+        ready.sort()
+        # Sólo el envío va en el try: lo que pase después de entregarlas
+        # (registro de file_ids) no puede devolver imágenes entregadas
         try:
-            image_bytes = await asyncio.to_thread(generate_image_pollinations, prompt, style, timeout=60)
-            await update.message.reply_photo(
-                photo=BytesIO(image_bytes),
-                caption=f"✨ Imagen {i+1}/{count}"
-            )
-            successful += 1
+            if len(ready) == 1:
+                i, image_bytes = ready[0]
+                await telegram_files.send_photo(update.message, image_bytes, caption=f"✨ Imagen {i+1}/{count}")
+            else:
+                await telegram_files.send_media_group(
+                    update.message,
+                    [image_bytes for _, image_bytes in ready],
+                    captions=[f"✨ Imagen {i+1}/{count}" for i, _ in ready],
+                )
         except Exception as e:
-            logger.error(f"Error en imagen {i+1}: {e}")
-            continue
+            logger.error(f"Error enviando {len(ready)} imágenes del lote: {e}")
+            await refund(len(ready))
+            return
+        successful += len(ready)
+    
+    tasks = [asyncio.ensure_future(generate(i)) for i in range(count)]
+    ready = []
+    try:
+        # Se envían por álbumes a medida que terminan, sin esperar a las más lentas
+        for next_done in asyncio.as_completed(tasks):
+            i, image_bytes = await next_done
+            if image_bytes is None:
+                await refund(1)
+                continue
+            ready.append((i, image_bytes))
+            if len(ready) >= BATCH_GROUP_SIZE:
+                chunk, ready = ready, []
+                await send(chunk)
+        if ready:
+            await send(ready)
+    finally:
+        for task in tasks:
+            task.cancel()
     
+    if failed:
+        usage = await acheck_usage_limit(user_id, IMAGE_COST)
     await status_msg.edit_text(
         f"✅ Generadas {successful}/{count} imágenes.\n"
-        f"Créditos gastados: {total_cost}"
-    )
\ No newline at end of file
+        f"Créditos gastados: {IMAGE_COST * successful}\n"
+        + (f"↩️ Devueltos {IMAGE_COST * failed} créditos de {failed} imágenes fallidas.\n" if failed else "")
+        + format_quota(usage)
+    )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+/batch de imágenes: tiempo total, envíos a Telegram y créditos cobrados.
+
+Lanza un /batch de --count imágenes contra el servidor de imágenes falso
+local (benchmarks/fake_images.py) con --latency segundos por imagen y un
+--error-rate de fallos, con el handler anterior (sacado de git: por
+defecto la revisión anterior al cambio, o --before REV) y con el actual.
+Reporta el tiempo hasta la primera imagen y hasta el final, las llamadas a
+Telegram, las semillas distintas pedidas y los créditos que se quedan
+cobrados frente a las imágenes entregadas.
+
+Uso:
+    python benchmarks/bench_batch_images.py [--count 10] [--latency 2.0] [--error-rate 0.2] [--before REV]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import urllib.parse
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_chat_burst import load_handler_module, revision_before  # noqa: E402
+from fake_images import start_server  # noqa: E402
+
+# Texto que sólo existe en Commands/image.py desde /batch en paralelo
+BATCH_MARKER = "BATCH_CONCURRENCY"
+
+
+class StubMessage:
+    """Mensaje de Telegram falso: cuenta llamadas e imágenes entregadas."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def _count(self, method):
+        self.stats["calls"][method] = self.stats["calls"].get(method, 0) + 1
+
+    def _delivered(self, n):
+        self.stats["images"] += n
+        self.stats.setdefault("first_image", time.monotonic())
+
+    async def reply_text(self, text, **kwargs):
+        self._count("sendMessage")
+        return StubMessage(self.stats)
+
+    async def edit_text(self, text, **kwargs):
+        self._count("editMessageText")
+        self.stats["final_text"] = text
+        return self
+
+    def _sent_photo(self):
+        # Lo que devuelve Telegram: un Message con la foto ya subida
+        n = self.stats["images"]
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=f"AgAC-{n}", file_unique_id=f"AQAD-{n}")])
+
+    async def reply_photo(self, photo, **kwargs):
+        self._count("sendPhoto")
+        self._delivered(1)
+        return self._sent_photo()
+
+    async def reply_media_group(self, media, **kwargs):
+        self._count("sendMediaGroup")
+        sent = []
+        for _ in media:
+            self._delivered(1)
+            sent.append(self._sent_photo())
+        return sent
+
+
+async def run(name, handler, args, server, user_id):
+    from utils.credits import aadd_credits, aget_credits, aset_user_subscription
+
+    await aset_user_subscription(user_id, "pro")
+    await aadd_credits(user_id, 10_000)
+    credits_before = await aget_credits(user_id)
+    stats = {"calls": {}, "images": 0}
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=StubMessage(stats))
+    context = SimpleNamespace(args=[str(args.count), "glamour", "mujer", "en", "la", "playa"])
+
+    paths_before = len(server.paths)
+    start = time.monotonic()
+    await handler(update, context)
+    elapsed = time.monotonic() - start
+    charged = credits_before - await aget_credits(user_id)
+    seeds = {
+        urllib.parse.parse_qs(urllib.parse.urlsplit(p).query).get("seed", [""])[0]
+        for p in server.paths[paths_before:]
+    }
+    calls = ", ".join(f"{m}={n}" for m, n in sorted(stats["calls"].items()))
+    print(
+        f"{name:6s} total={elapsed:5.2f}s primera imagen={stats.get('first_image', start) - start:5.2f}s "
+        f"entregadas={stats['images']}/{args.count} cobrado={charged} "
+        f"(por imágenes entregadas: {stats['images'] * 10}) semillas distintas={len(seeds)} | {calls}"
+    )
+
+
+async def main_async(args, server):
+    from utils.image_client import close_image_client
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    from Commands import image as after
+
+    rev = args.before or revision_before(BATCH_MARKER, "Commands/image.py")
+    before = load_handler_module(rev, "Commands/image.py", marker=BATCH_MARKER)
+    for user_id, (name, module) in enumerate((("antes", before), ("ahora", after)), start=1):
+        await run(name, module.batch_image_command, args, server, user_id)
+        await close_image_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--before", help="revisión de git con el handler anterior (por defecto, la anterior al cambio)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, size=50_000, error_rate=args.error_rate, seed=3)
+    os.environ["POLLINATIONS_BASE_URL"] = base_url
+    os.environ["SSL_CERT_FILE"] = server.cert
+    os.environ.setdefault("IMAGE_CREDIT_COST", "10")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="batch_images_"), "bench.sqlite"))
+    try:
+        asyncio.run(main_async(args, server))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Ráfagas de mensajes: llamadas al LLM y a Telegram por ráfaga.
+
+Cada usuario simulado manda --burst mensajes cortos separados por --gap
+segundos. Se mide, con el handler anterior (sacado de git: por defecto, la
+revisión anterior al commit que introdujo las ráfagas; --before REV para
+elegir otra) y con el actual, cuántas peticiones recibe el Groq falso local y cuántas
+llamadas a Telegram (reply_text + edit_text) se hacen, y cuánto tarda la
+respuesta final desde el último mensaje.
+
+Uso:
+    python benchmarks/bench_chat_burst.py [--users 20] [--burst 5] [--gap 0.3] [--before REV]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_groq import start_server  # noqa: E402
+
+
+class StubMessage:
+    """Mensaje de Telegram falso que cuenta las llamadas a la API."""
+
+    def __init__(self, counter, text=""):
+        self.counter = counter
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        self.counter["calls"] += 1
+        return StubMessage(self.counter, text)
+
+    async def edit_text(self, text, **kwargs):
+        self.counter["calls"] += 1
+        self.text = text
+        self.counter["last_edit"] = time.monotonic()
+        return self
+
+
+# Texto que sólo existe en Commands/chat.py desde que se juntan las ráfagas
+BURST_MARKER = "class _Burst"
+
+
+def revision_before(marker, module_path="Commands/chat.py"):
+    """Revisión anterior al commit que añadió `marker` a `module_path`.
+
+    Se busca en el historial (git log -S) en lugar de usar HEAD~1, que sólo
+    es "antes del cambio" en el commit que añadió el benchmark.
+    """
+    commits = subprocess.run(
+        ["git", "log", "--reverse", "--format=%H", "-S", marker, "--", module_path],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    if not commits:
+        raise SystemExit(f"Ningún commit añade {marker!r} a {module_path}")
+    return f"{commits[0]}~1"
+
+
+def load_handler_module(rev, module_path="Commands/chat.py", marker=None):
+    """Carga `module_path` (por defecto Commands/chat.py) tal como estaba en `rev`.
+
+    Con `marker`, falla si esa versión ya lo contiene: no sería la anterior
+    al cambio que se mide.
+    """
+    source = subprocess.run(
+        ["git", "show", f"{rev}:{module_path}"], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    if marker is not None and marker in source:
+        raise SystemExit(f"{rev}:{module_path} ya contiene {marker!r}; usa --before con una revisión anterior al cambio")
+    name = os.path.splitext(os.path.basename(module_path))[0] + "_before"
+    path = os.path.join(tempfile.mkdtemp(prefix=f"{name}_"), f"{name}.py")
+    with open(path, "w") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_users(handler, args, server):
+    counters = []
+    requests_before = server.requests
+
+    async def one_user(uid):
+        counter = {"calls": 0, "last_edit": 0.0}
+        counters.append(counter)
+        context = SimpleNamespace(application=None, user_data={})
+        user = SimpleNamespace(id=uid, language_code="es", first_name="u")
+        tasks = []
+        for i in range(args.burst):
+            update = SimpleNamespace(effective_user=user, message=StubMessage(counter, f"mensaje {i} de la ráfaga"))
+            # Como con concurrent_updates: cada update en su propia tarea
+            tasks.append(asyncio.ensure_future(handler(update, context)))
+            if i < args.burst - 1:
+                await asyncio.sleep(args.gap)
+        last_sent = time.monotonic()
+        await asyncio.gather(*tasks)
+        counter["reply_after_last"] = counter["last_edit"] - last_sent
+
+    await asyncio.gather(*(one_user(uid) for uid in range(args.users)))
+    return {
+        "llm_calls_per_burst": (server.requests - requests_before) / args.users,
+        "telegram_calls_per_burst": sum(c["calls"] for c in counters) / args.users,
+        "reply_after_last_s": sum(c["reply_after_last"] for c in counters) / args.users,
+    }
+
+
+async def main_async(args, server):
+    from utils.llm import close_llm_client
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    from Commands import chat as after
+
+    before = load_handler_module(args.before or revision_before(BURST_MARKER), marker=BURST_MARKER)
+    for name, module in (("antes", before), ("ahora", after)):
+        result = await run_users(module.handle_chat_empathetic, args, server)
+        print(
+            f"{name:6s} LLM/ráfaga={result['llm_calls_per_burst']:.1f}  "
+            f"Telegram/ráfaga={result['telegram_calls_per_burst']:.1f}  "
+            f"respuesta final tras el último mensaje={result['reply_after_last_s']:.2f}s"
+        )
+    await close_llm_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--gap", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--before", help="revisión de git con el handler anterior (por defecto, la anterior al cambio)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    # El servidor falso no tiene límites de cuenta
+    os.environ.setdefault("GROQ_RPM", "0")
+    os.environ.setdefault("GROQ_TPM", "0")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="chat_burst_"), "bench.sqlite"))
+    try:
+        asyncio.run(main_async(args, server))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
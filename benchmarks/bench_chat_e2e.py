@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Prueba de extremo a extremo del chat contra el Groq falso local.
+
+Lanza --users usuarios simulados a la vez; cada uno manda --messages
+mensajes, esperando la respuesta del anterior y --think segundos más. Los
+mensajes son Updates reales de python-telegram-bot ligados a un bot falso
+que cuenta las llamadas a la API de Telegram, y los procesa
+handle_chat_empathetic tal cual. Reporta:
+  - latencia por mensaje (p50/p95/p99/máx.) hasta la respuesta final,
+  - mensajes por segundo,
+  - llamadas a Telegram por método y por mensaje,
+  - peticiones al Groq falso, 500 y 429 inyectados, y respuestas de
+    reserva o de error que vio el usuario.
+
+Uso:
+    python benchmarks/bench_chat_e2e.py [--users 50] [--messages 3] \\
+        [--latency mix:0.9@0.4,0.1@3] [--error-rate 0.02] [--rate-limit-rate 0.02]
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram import Chat, Message, Update, User  # noqa: E402
+
+from fake_groq import start_server  # noqa: E402
+
+TEXTS = [
+    "hoy fue un día raro, no sé cómo sentirme",
+    "me cuesta dormir desde hace semanas",
+    "siento que nadie me escucha en casa",
+    "creo que estoy mejor que ayer, pero cansado",
+    "no sé si hablar con mi amiga de lo que pasó",
+]
+
+
+class StubBot:
+    """Bot de Telegram falso: cuenta llamadas y guarda el último texto de cada mensaje."""
+
+    def __init__(self, api_latency):
+        self.api_latency = api_latency
+        self.calls = {}
+        self.texts = {}
+        self._ids = itertools.count(1_000_000)
+
+    def _count(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def make_message(self, chat_id, text, from_user=None, message_id=None):
+        message = Message(
+            message_id=message_id or next(self._ids),
+            date=datetime.datetime.now(datetime.timezone.utc),
+            chat=Chat(chat_id, Chat.PRIVATE),
+            from_user=from_user,
+            text=text,
+        )
+        message.set_bot(self)
+        return message
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._count("sendMessage")
+        await asyncio.sleep(self.api_latency)
+        message = self.make_message(chat_id, text)
+        self.texts[message.message_id] = text
+        return message
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._count("editMessageText")
+        await asyncio.sleep(self.api_latency)
+        self.texts[message_id] = text
+        return True
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def main_async(args, server):
+    from Commands.chat import CANNED_REPLY, handle_chat_empathetic
+    from utils.llm import close_llm_client
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    bot = StubBot(args.api_latency)
+    rng = random.Random(7)
+    update_ids = itertools.count(1)
+    latencies = []
+
+    async def one_user(uid):
+        user = User(uid, f"u{uid}", False, language_code="es")
+        context = SimpleNamespace(application=None, user_data={})
+        await asyncio.sleep(rng.uniform(0, args.think))
+        for _ in range(args.messages):
+            update = Update(next(update_ids), message=bot.make_message(uid, rng.choice(TEXTS), from_user=user))
+            start = time.monotonic()
+            await handle_chat_empathetic(update, context)
+            latencies.append(time.monotonic() - start)
+            await asyncio.sleep(args.think)
+
+    requests_before = server.requests
+    start = time.monotonic()
+    await asyncio.gather(*(one_user(uid) for uid in range(1, args.users + 1)))
+    elapsed = time.monotonic() - start
+    await close_llm_client()
+
+    total = len(latencies)
+    final_texts = list(bot.texts.values())
+    canned = sum(1 for t in final_texts if t == CANNED_REPLY)
+    failed = sum(1 for t in final_texts if t.startswith("Algo falló"))
+    print(f"{args.users} usuarios x {args.messages} mensajes, latencia Groq={args.latency}")
+    print(
+        f"latencia por mensaje: p50={percentile(latencies, 0.5):.2f}s p95={percentile(latencies, 0.95):.2f}s "
+        f"p99={percentile(latencies, 0.99):.2f}s máx={max(latencies):.2f}s"
+    )
+    print(f"rendimiento: {total / elapsed:.1f} mensajes/s ({total} en {elapsed:.1f}s)")
+    print(
+        "Telegram: " + ", ".join(f"{m}={n} ({n / total:.2f}/msg)" for m, n in sorted(bot.calls.items()))
+    )
+    print(
+        f"Groq falso: peticiones={server.requests - requests_before} ({(server.requests - requests_before) / total:.2f}/msg) "
+        f"500={server.errors} 429={server.rate_limited}"
+    )
+    print(f"respuestas de reserva={canned} errores vistos por el usuario={failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="usuarios simultáneos")
+    parser.add_argument("--messages", type=int, default=3, help="mensajes por usuario")
+    parser.add_argument("--think", type=float, default=1.5, help="segundos entre respuesta y siguiente mensaje")
+    parser.add_argument("--latency", default="mix:0.9@0.4,0.1@3", help="latencia del Groq falso (ver fake_groq.py)")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="latencia de cada llamada a Telegram")
+    args = parser.parse_args()
+
+    server, base_url = start_server(
+        latency=args.latency, token_delay=args.token_delay, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, seed=1,
+    )
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    # El servidor falso no tiene límites de cuenta (los 429 son inyectados)
+    os.environ.setdefault("GROQ_RPM", "0")
+    os.environ.setdefault("GROQ_TPM", "0")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="chat_e2e_"), "bench.sqlite"))
+    try:
+        asyncio.run(main_async(args, server))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Latencia de cola (p99) de la respuesta del chat con y sin hedging/respaldo.
+
+Sustituye el stream de Groq por uno simulado con latencia de cola pesada
+(la mayoría responde rápido, unas pocas tardan segundos y algunas se
+cuelgan o fallan) y mide, por petición, el tiempo hasta que el usuario ve
+algo: el primer fragmento, la respuesta de reserva o el mensaje de error.
+  - antes: un solo intento con el modelo principal y timeout de 15 s.
+  - ahora: utils.llm_fallback (cadena de modelos, hedging al p95 y SLA).
+
+Después lanza --turns turnos a la vez contra el planificador real con un
+límite ajustado (GROQ_RPM=30, GROQ_TPM=6000) y un modelo que responde
+en 0.5 s: la espera en cola no debe contar como lentitud del modelo (sin
+intentos descartados ni turnos adelantados).
+
+Uso:
+    python benchmarks/bench_chat_hedging.py [--requests 1000] [--sla 10] [--turns 6]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import llm_fallback  # noqa: E402
+
+PRIMARY = "llama-3.1-8b-instant"
+FALLBACK = "llama-3.3-70b-versatile"
+
+
+def make_fake_stream(rng, calls):
+    def sample_first_chunk(model):
+        r = rng.random()
+        if r < 0.02:
+            return None  # error inmediato
+        if r < 0.04:
+            return 60.0  # colgada
+        if r < 0.12:
+            return rng.uniform(2.0, 6.0)  # lenta
+        return rng.lognormvariate(-1.0, 0.4) * (2.0 if model == FALLBACK else 1.0)
+
+    async def fake_stream(priority=None, metrics=None, on_admit=None, model=None, **kwargs):
+        calls[model] = calls.get(model, 0) + 1
+        if on_admit is not None:
+            on_admit()
+        delay = sample_first_chunk(model)
+        if delay is None:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("500 del proveedor")
+        await asyncio.sleep(delay)
+        for word in "Estoy aquí contigo, cuéntame más".split():
+            yield word + " "
+            await asyncio.sleep(0.005)
+
+    return fake_stream
+
+
+async def before(stream, timeout=15.0):
+    start = time.monotonic()
+    agen = stream(model=PRIMARY)
+    try:
+        await asyncio.wait_for(agen.__anext__(), timeout)
+        return time.monotonic() - start, "ok"
+    except asyncio.TimeoutError:
+        return time.monotonic() - start, "error"
+    except Exception:
+        return time.monotonic() - start, "error"
+    finally:
+        await agen.aclose()
+
+
+async def after(sla):
+    start = time.monotonic()
+    agen = llm_fallback.stream_chat_resilient(models=[PRIMARY, FALLBACK], sla=sla, messages=[])
+    try:
+        await agen.__anext__()
+        return time.monotonic() - start, "ok"
+    except llm_fallback.LLMUnavailable:
+        return time.monotonic() - start, "reserva"
+    finally:
+        await agen.aclose()
+
+
+def report(name, results, calls, requests):
+    times = sorted(t for t, _ in results)
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def pct(p):
+        return times[min(len(times) - 1, int(len(times) * p))]
+
+    print(
+        f"{name:6s} p50={pct(0.5):5.2f}s p95={pct(0.95):5.2f}s p99={pct(0.99):5.2f}s máx={times[-1]:5.2f}s "
+        f"resultados={outcomes} llamadas/petición={sum(calls.values()) / requests:.2f}"
+    )
+
+
+async def queued_turns(args):
+    """Turnos simultáneos que esperan cupo de TPM en el planificador."""
+    from utils.llm_scheduler import LLMScheduler
+
+    scheduler = LLMScheduler(rpm=30, tpm=6000)
+    llm_fallback.llm_scheduler = scheduler
+    calls = {}
+
+    async def queued_stream(priority=None, metrics=None, on_admit=None, model=None, **kwargs):
+        # ~2300 tokens por turno: prompt con historial + max_tokens
+        async with scheduler.slot(priority, tokens=2300, model=model):
+            calls[model] = calls.get(model, 0) + 1
+            if on_admit is not None:
+                on_admit()
+            await asyncio.sleep(0.5)
+            yield "Estoy aquí contigo"
+
+    llm_fallback.stream_chat_completion = queued_stream
+
+    async def turn(i):
+        await asyncio.sleep(i * 0.01)  # orden de llegada
+        elapsed, outcome = await after(args.sla)
+        return f"{i}:{outcome}@{elapsed:.1f}s"
+
+    results = await asyncio.gather(*(turn(i) for i in range(args.turns)))
+    print(f"cola   {' '.join(results)} | peticiones admitidas={sum(calls.values())}")
+
+
+async def main_async(args):
+    rng = random.Random(3)
+
+    async def spread(coro_factory):
+        async def one():
+            await asyncio.sleep(rng.uniform(0, args.spread))
+            return await coro_factory()
+        return await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    calls = {}
+    stream = make_fake_stream(rng, calls)
+    report("antes", await spread(lambda: before(stream)), calls, args.requests)
+
+    calls = {}
+    llm_fallback.stream_chat_completion = make_fake_stream(rng, calls)
+    report("ahora", await spread(lambda: after(args.sla)), calls, args.requests)
+
+    await queued_turns(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=10.0, help="segundos en los que llegan las peticiones")
+    parser.add_argument("--sla", type=float, default=10.0)
+    parser.add_argument("--turns", type=int, default=6)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
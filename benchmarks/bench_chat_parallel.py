@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Comprueba que varios usuarios reciben respuesta del LLM en paralelo.
+
+Contra el Groq falso local (benchmarks/fake_groq.py) con latencia fija,
+lanza N conversaciones concurrentes:
+  - "antes": cliente Groq síncrono llamado dentro de corrutinas (bloquea
+    el loop, así que las respuestas salen una detrás de otra),
+  - "después": utils.llm (AsyncGroq con pool compartido).
+Con el cliente async el tiempo total debe acercarse a la latencia de una
+sola llamada. También verifica que cancelar una conversación corta la
+petición sin esperar al modelo.
+
+Uso:
+    python benchmarks/bench_chat_parallel.py [--users 10] [--latency 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_groq import start_server  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "me siento solo"}]
+
+
+async def sync_client_run(base_url, users):
+    from groq import Groq
+
+    client = Groq(api_key="test", base_url=base_url)
+
+    async def one():
+        start = time.perf_counter()
+        client.chat.completions.create(messages=MESSAGES, model="llama-3.1-8b-instant")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(users)))
+    return time.perf_counter() - start, latencies
+
+
+async def async_client_run(users):
+    from utils.llm import stream_chat_completion
+
+    async def one():
+        start = time.perf_counter()
+        async for _ in stream_chat_completion(messages=MESSAGES, model="llama-3.1-8b-instant"):
+            pass
+        return time.perf_counter() - start
+
+    await one()  # calentar el pool (import de modelos y primera conexión)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(users)))
+    return time.perf_counter() - start, latencies
+
+
+async def cancellation_check(latency):
+    from utils.llm import stream_chat_completion
+
+    async def consume():
+        async for _ in stream_chat_completion(messages=MESSAGES, model="llama-3.1-8b-instant"):
+            pass
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(latency / 4)
+    start = time.perf_counter()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return time.perf_counter() - start
+
+
+async def main_async(args, base_url):
+    from utils.llm import close_llm_client
+
+    total_sync, _ = await sync_client_run(base_url, args.users)
+    total_async, latencies = await async_client_run(args.users)
+    cancel_time = await cancellation_check(args.latency)
+    await close_llm_client()
+
+    print(f"{args.users} usuarios, latencia del modelo {args.latency:.2f}s")
+    print(f"  antes  (Groq síncrono): total {total_sync:6.2f}s")
+    print(f"  después (AsyncGroq):    total {total_async:6.2f}s  (máx por usuario {max(latencies):.2f}s)")
+    print(f"  cancelación propagada en {cancel_time * 1000:.1f} ms")
+    assert total_async < args.latency * 2 + 1, "las respuestas no se sirvieron en paralelo"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    # El servidor falso no tiene límites de cuenta
+    os.environ.setdefault("GROQ_RPM", "0")
+    os.environ.setdefault("GROQ_TPM", "0")
+    try:
+        asyncio.run(main_async(args, base_url))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
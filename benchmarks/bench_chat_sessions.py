@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Memoria del historial de chat con muchos usuarios.
+
+Simula N usuarios (100k por defecto) que mandan un mensaje cada uno y
+compara la memoria residente (RSS) de dos estrategias:
+  - user_data: un dict por usuario en memoria, sin expulsión (antes).
+  - store: utils.chat_store, sesiones en SQLite con caché LRU + TTL (ahora).
+Cada estrategia corre en su propio proceso para medir su RSS por separado.
+Al final comprueba que una sesión expulsada de memoria se recupera de la
+base de datos.
+
+Uso:
+    python benchmarks/bench_chat_sessions.py [--users 100000] [--cache 10000] [--ttl 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGE = "hoy me costó levantarme, no sé muy bien por qué, pero quería contártelo " * 3
+REPLY = "Gracias por contármelo. Estoy aquí contigo; cuéntame lo que quieras. " * 3
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def turn(session, uid):
+    # Textos distintos por usuario, como en el bot real
+    session.setdefault("chat_history", []).extend([
+        {"role": "user", "content": f"{MESSAGE}({uid})"},
+        {"role": "assistant", "content": f"{REPLY}({uid})"},
+    ])
+
+
+async def run_user_data(args, samples):
+    user_data = {}
+    for uid in range(args.users):
+        turn(user_data.setdefault(uid, {}), uid)
+        if uid % (args.users // 10) == 0:
+            samples.append((uid, rss_mb()))
+    samples.append((args.users, rss_mb()))
+    return {"in_memory": len(user_data)}
+
+
+async def run_store(args, samples):
+    from utils.chat_store import ChatSessionStore
+    from utils.db import shutdown_db_executor
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    store = ChatSessionStore(maxsize=args.cache, ttl=args.ttl)
+    start = time.perf_counter()
+    for uid in range(args.users):
+        session = await store.get(uid)
+        turn(session, uid)
+        store.save(uid, session)
+        if uid % 1000 == 999:
+            await store.flush()
+        if uid % (args.users // 10) == 0:
+            samples.append((uid, rss_mb()))
+    await store.flush()
+    elapsed = time.perf_counter() - start
+    samples.append((args.users, rss_mb()))
+
+    # Un usuario del principio ya salió de memoria: debe volver de SQLite
+    fresh = ChatSessionStore(maxsize=args.cache, ttl=args.ttl)
+    restored = await fresh.get(0)
+    ok = [m["content"] for m in restored["chat_history"]] == [f"{MESSAGE}(0)", f"{REPLY}(0)"]
+    stats = store.stats()
+    shutdown_db_executor()
+    return {
+        "in_memory": stats["size"],
+        "loads": stats["loads"],
+        "saves": stats["saves"],
+        "turns_per_sec": round(args.users / elapsed),
+        "restored_after_eviction": ok,
+    }
+
+
+def child(args):
+    samples = []
+    runner = run_user_data if args.mode == "user_data" else run_store
+    result = asyncio.run(runner(args, samples))
+    result["rss_mb"] = [(uid, round(mb, 1)) for uid, mb in samples]
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--cache", type=int, default=10_000)
+    parser.add_argument("--ttl", type=float, default=5.0)
+    parser.add_argument("--mode", choices=["user_data", "store"])
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args)
+        return
+
+    env = dict(os.environ, DB_PATH=os.path.join(tempfile.mkdtemp(prefix="chat_sessions_"), "bench.sqlite"))
+    for mode in ("user_data", "store"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--users", str(args.users),
+             "--cache", str(args.cache), "--ttl", str(args.ttl)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        curve = "  ".join(f"{uid // 1000}k:{mb:.0f}" for uid, mb in result.pop("rss_mb"))
+        print(f"{mode:10s} RSS MB por usuarios atendidos -> {curve}")
+        print(f"{'':10s} {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tokens de prompt por turno: últimos 10 mensajes vs ventana por presupuesto.
+
+Simula una conversación con mensajes de longitud variable (hasta 3000
+caracteres) y compara, turno a turno, los tokens estimados del prompt con
+el recorte anterior (sistema + últimos 10 mensajes) y con utils.conversation
+(sistema + resumen + ventana limitada por CHAT_HISTORY_TOKEN_BUDGET). El
+resumen se pide a un servidor falso local (benchmarks/fake_groq.py), en
+segundo plano como en el bot.
+
+Uso:
+    python benchmarks/bench_chat_window.py [--turns 40] [--budget 1500]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_groq import start_server  # noqa: E402
+
+WORDS = (
+    "hoy volví a sentir ese peso en el pecho cuando llegué a casa y no había nadie "
+    "mi hermana no contesta y en el trabajo todo sigue igual pienso demasiado"
+).split()
+
+
+def random_text(rng, max_chars):
+    length = rng.choice([80, 200, 600, 1500, max_chars])
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:length]
+
+
+async def run(args):
+    from Commands.chat import SYSTEM_PROMPT_EMPATHETIC
+    from utils import conversation
+    from utils.llm import close_llm_client
+
+    rng = random.Random(7)
+    old_history = []
+    data = {}
+    old_total = new_total = 0
+    old_max = new_max = 0
+    build_times = []
+    for _ in range(args.turns):
+        user_msg = {"role": "user", "content": random_text(rng, 3000)}
+        reply = {"role": "assistant", "content": random_text(rng, 1200)}
+
+        old_history = (old_history + [user_msg])[-10:]
+        old_tokens = conversation.messages_tokens(
+            [{"role": "system", "content": SYSTEM_PROMPT_EMPATHETIC}] + old_history
+        )
+
+        start = time.perf_counter()
+        data.setdefault("chat_history", []).append(user_msg)
+        if conversation.compact_history(data, args.budget):
+            conversation.schedule_summary_refresh(None, "bench", data)
+        new_tokens = conversation.messages_tokens(conversation.build_messages(SYSTEM_PROMPT_EMPATHETIC, data))
+        build_times.append(time.perf_counter() - start)
+
+        old_history.append(reply)
+        data["chat_history"].append(reply)
+        old_total += old_tokens
+        new_total += new_tokens
+        old_max = max(old_max, old_tokens)
+        new_max = max(new_max, new_tokens)
+        # Tiempo de "respuesta" simulado: deja correr el resumen en segundo plano
+        await asyncio.sleep(0.02)
+
+    await asyncio.sleep(0.5)
+    await close_llm_client()
+    turns = args.turns
+    print(f"Turnos: {turns}  presupuesto de historial: {args.budget} tokens")
+    print(f"  últimos 10 mensajes  media={old_total / turns:7.0f}  máx={old_max:6d} tokens de prompt")
+    print(f"  ventana + resumen    media={new_total / turns:7.0f}  máx={new_max:6d} tokens de prompt")
+    print(f"  ahorro medio: {100 * (1 - new_total / old_total):.0f}%")
+    print(f"  resumen actual: {len(data.get('chat_summary', ''))} caracteres, "
+          f"pendientes: {len(data.get('chat_summary_pending', []))}")
+    print(f"  coste de recorte por turno: {1e6 * sum(build_times) / turns:.0f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=0.05)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    # El servidor falso no tiene límites de cuenta
+    os.environ.setdefault("GROQ_RPM", "0")
+    os.environ.setdefault("GROQ_TPM", "0")
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
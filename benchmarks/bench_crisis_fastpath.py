@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tiempo hasta que el usuario ve los recursos de crisis.
+
+Cada usuario simulado manda un mensaje con dolor emocional. Con el handler
+anterior (sacado de git: por defecto la revisión anterior al cambio, o
+--before REV) y con el actual se mide, contra el Groq falso local con
+--latency segundos de latencia, cuándo aparece el texto de los recursos
+(en un mensaje nuevo o en una edición) y cuándo la respuesta final del
+modelo, y si la respuesta los repite.
+
+Uso:
+    python benchmarks/bench_crisis_fastpath.py [--users 20] [--latency 3.0] [--before REV]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_chat_burst import load_handler_module, revision_before  # noqa: E402
+from fake_groq import start_server  # noqa: E402
+
+# Línea común a los recursos en todos los idiomas
+RESOURCES_MARK = "📞"
+
+# Texto que sólo existe en Commands/chat.py desde los recursos de crisis inmediatos
+CRISIS_MARKER = "def send_crisis_resources"
+
+
+class RecordingMessage:
+    """Mensaje de Telegram falso que guarda cuándo se mostró cada texto."""
+
+    def __init__(self, log, text=""):
+        self.log = log
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        self.log.append((time.monotonic(), text))
+        return RecordingMessage(self.log, text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        self.log.append((time.monotonic(), text))
+        return self
+
+
+async def run_users(handler, args):
+    results = []
+
+    async def one_user(uid):
+        log = []
+        context = SimpleNamespace(application=None, user_data={})
+        user = SimpleNamespace(id=uid, language_code="es", first_name="u")
+        update = SimpleNamespace(effective_user=user, message=RecordingMessage(log, "ya no quiero vivir, no aguanto más"))
+        start = time.monotonic()
+        await handler(update, context)
+        resources = [t for t, text in log if RESOURCES_MARK in text]
+        final = log[-1][0] if log else start
+        results.append({
+            "resources_s": (resources[0] - start) if resources else None,
+            "reply_s": final - start,
+        })
+
+    await asyncio.gather(*(one_user(uid) for uid in range(args.users)))
+    shown = [r["resources_s"] for r in results if r["resources_s"] is not None]
+    return {
+        "resources_s": sum(shown) / len(shown) if shown else float("nan"),
+        "shown": len(shown),
+        "reply_s": sum(r["reply_s"] for r in results) / len(results),
+    }
+
+
+async def main_async(args):
+    from utils.llm import close_llm_client
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    from Commands import chat as after
+
+    before = load_handler_module(args.before or revision_before(CRISIS_MARKER), marker=CRISIS_MARKER)
+    for name, module in (("antes", before), ("ahora", after)):
+        result = await run_users(module.handle_chat_empathetic, args)
+        print(
+            f"{name:6s} recursos a los {result['resources_s']:.2f}s ({result['shown']}/{args.users} usuarios)  "
+            f"respuesta final a los {result['reply_s']:.2f}s"
+        )
+    await close_llm_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=3.0)
+    parser.add_argument("--before", help="revisión de git con el handler anterior (por defecto, la anterior al cambio)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    # El servidor falso no tiene límites de cuenta
+    os.environ.setdefault("GROQ_RPM", "0")
+    os.environ.setdefault("GROQ_TPM", "0")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="crisis_fastpath_"), "bench.sqlite"))
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
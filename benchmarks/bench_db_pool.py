@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la capa de conexiones de utils.credits.
+
+Compara el patrón anterior (una conexión nueva por llamada, más otra en
+_ensure_user) contra las funciones actuales sobre el pool persistente.
+
+Uso:
+    python benchmarks/bench_db_pool.py [--ops 5000] [--users 200]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_functions(db_path):
+    """Réplica del acceso anterior: sqlite3.connect() en cada función."""
+
+    def _ensure_user(telegram_id):
+        with sqlite3.connect(db_path) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT telegram_id FROM users WHERE telegram_id = ?", (telegram_id,))
+            if not cur.fetchone():
+                cur.execute(
+                    "INSERT INTO users(telegram_id, credits, is_admin, created_at) VALUES(?,?,?,?)",
+                    (telegram_id, 100, 0, datetime.utcnow().isoformat()),
+                )
+                conn.commit()
+
+    def get_credits(telegram_id):
+        with sqlite3.connect(db_path) as conn:
+            row = conn.execute("SELECT credits FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+            return row[0] if row else 0
+
+    def add_credits(telegram_id, amount, kind="manual"):
+        _ensure_user(telegram_id)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE users SET credits = credits + ? WHERE telegram_id = ?", (amount, telegram_id))
+            conn.execute(
+                "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
+                (telegram_id, kind, amount, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+
+    def consume_credits(telegram_id, amount):
+        _ensure_user(telegram_id)
+        with sqlite3.connect(db_path) as conn:
+            row = conn.execute("SELECT credits FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+            if (row[0] if row else 0) < amount:
+                return False
+            conn.execute("UPDATE users SET credits = credits - ? WHERE telegram_id = ?", (amount, telegram_id))
+            conn.execute(
+                "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
+                (telegram_id, "consume", -amount, datetime.utcnow().isoformat()),
+            )
+            conn.commit()
+            return True
+
+    def get_user_subscription(telegram_id):
+        _ensure_user(telegram_id)
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute(
+                "SELECT subscription_tier, subscription_expires_at FROM users WHERE telegram_id = ?",
+                (telegram_id,),
+            ).fetchone()
+
+    return {
+        "get_credits": get_credits,
+        "add_credits": add_credits,
+        "consume_credits": consume_credits,
+        "get_user_subscription": get_user_subscription,
+    }
+
+
+def pooled_functions():
+    from utils import credits
+
+    return {
+        "get_credits": credits.get_credits,
+        "add_credits": credits.add_credits,
+        "consume_credits": credits.consume_credits,
+        "get_user_subscription": credits.get_user_subscription,
+    }
+
+
+def run(funcs, ops, users):
+    results = {}
+    for name, fn in funcs.items():
+        start = time.perf_counter()
+        for i in range(ops):
+            uid = 1000 + (i % users)
+            if name == "add_credits":
+                fn(uid, 1)
+            elif name == "consume_credits":
+                fn(uid, 1)
+            else:
+                fn(uid)
+        elapsed = time.perf_counter() - start
+        results[name] = ops / elapsed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_db_")
+    db_path = os.path.join(tmpdir, "bench.sqlite")
+    os.environ["DB_PATH"] = db_path
+
+    from utils import credits
+
+    credits.init_db()
+    for uid in range(1000, 1000 + args.users):
+        credits.add_credits(uid, 0)
+
+    before = run(legacy_functions(db_path), args.ops, args.users)
+    after = run(pooled_functions(), args.ops, args.users)
+
+    print(f"{'función':<24}{'antes ops/s':>14}{'después ops/s':>16}{'x':>8}")
+    for name in before:
+        print(f"{name:<24}{before[name]:>14.0f}{after[name]:>16.0f}{after[name] / before[name]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Precisión y velocidad del detector de dolor emocional.
+
+Compara el detector anterior (búsqueda de subcadenas sobre una lista de
+palabras) con utils.emotional sobre un corpus etiquetado, y mide el tiempo
+por mensaje con textos cortos y de 3000 caracteres (el máximo que acepta
+el chat).
+
+Uso:
+    python benchmarks/bench_emotional.py [--iterations 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.emotional import detect_emotional_pain  # noqa: E402
+
+# Lista y algoritmo del detector anterior (Commands/chat.py)
+OLD_KEYWORDS = [
+    "depresión", "deprimido", "tristeza", "triste", "suicidio", "suicidarme",
+    "muerte", "quiero morirme", "no aguanto", "no puedo", "solo/a", "soledad",
+    "ansiedad", "pánico", "miedo", "trauma", "abuso", "maltrato",
+    "duelo", "pérdida", "abandono", "rechazo", "humillación", "vergüenza",
+    "culpa", "fracaso", "inútil", "sin sentido", "vacío", "desesperado",
+    "acosado", "bullying", "autolesión", "trastorno", "bipolar", "esquizofrenia",
+]
+
+
+def old_detect(text):
+    text_lower = text.lower()
+    for keyword in OLD_KEYWORDS:
+        if keyword in text_lower:
+            return True
+    return False
+
+
+# (texto, idioma, esperado)
+CORPUS = [
+    # Dolor emocional
+    ("Tengo mucha depresion desde hace meses", "es", True),
+    ("Me siento deprimida y no sé por qué", "es", True),
+    ("Estoy muy triste hoy", "es", True),
+    ("A veces pienso en el suicidio", "es", True),
+    ("QUIERO MORIRME", "es", True),
+    ("ya no quiero vivir así", "es", True),
+    ("No aguanto más esta situación", "es", True),
+    ("me siento sola todo el tiempo", "es", True),
+    ("la ansiedad no me deja dormir", "es", True),
+    ("tuve un ataque de panico en el metro", "es", True),
+    ("sufrí maltrato de niño", "es", True),
+    ("estoy en duelo por mi padre", "es", True),
+    ("me siento un fracaso total", "es", True),
+    ("todo me parece sin sentido", "es", True),
+    ("estoy desesperada", "es", True),
+    ("en el colegio me hacen bullying", "es", True),
+    ("he pensado en autolesionarme", "es", True),
+    ("tengo miedo y no puedo dejar de pensar en eso", "es", True),
+    ("siento un vacío enorme y mucha culpa", "es", True),
+    ("I feel so depressed lately", "en", True),
+    ("sometimes I want to die", "en", True),
+    ("I'm lonely and hopeless", "en", True),
+    ("мне очень одиноко", "ru", True),
+    ("у меня депрессия", "ru", True),
+    ("я не хочу жить", "ru", True),
+    # Idioma del mensaje distinto del de la interfaz de Telegram
+    ("quiero morirme", "en", True),
+    ("pienso mucho en el suicidio", "en-US", True),
+    ("me siento sola y deprimida", "ru", True),
+    ("I want to die", "es", True),
+    ("мне очень одиноко", "en", True),
+    # Sin dolor emocional
+    ("¿Me recomiendas una película para el finde?", "es", False),
+    ("No puedo ir a la reunión del martes", "es", False),
+    ("Solo quería saludarte", "es", False),
+    ("Estoy leyendo sobre la muerteteria de Edimburgo", "es", False),
+    ("Hoy vi a los tristes payasos del circo en la tele", "es", False),
+    ("Me da miedo el final de la serie jaja", "es", False),
+    ("La culpa fue del árbitro", "es", False),
+    ("El duelo de espadas fue épico", "es", False),
+    ("Trabajo en la oficina de rechazos de correo", "es", False),
+    ("el vaso está vacío", "es", False),
+    ("Can you help me write an email?", "en", False),
+    ("I can't find my keys", "en", False),
+    ("Привет, как дела?", "ru", False),
+    ("No puedo ir a la reunión del martes", "en", False),
+    ("I can't find my keys", "es", False),
+]
+
+FILLER = (
+    "Hoy fui al trabajo, tomé un café con una compañera y hablamos de la "
+    "reunión del lunes, del proyecto nuevo y de las vacaciones de verano. "
+)
+
+
+def accuracy(detect):
+    tp = fp = fn = tn = 0
+    for text, lang, expected in CORPUS:
+        got = detect(text, lang)
+        if got and expected:
+            tp += 1
+        elif got:
+            fp += 1
+        elif expected:
+            fn += 1
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn, "precision": precision, "recall": recall}
+
+
+def build_messages(count, length=3000):
+    rng = random.Random(42)
+    messages = []
+    for i in range(count):
+        text = (FILLER * (length // len(FILLER) + 1))[:length]
+        # La mitad lleva una frase de dolor al final (peor caso para el escaneo)
+        if i % 2:
+            text = text[: length - 30] + " y me siento muy deprimido"
+        messages.append(text[:length])
+    rng.shuffle(messages)
+    return messages
+
+
+def timeit(detect, messages):
+    start = time.perf_counter()
+    for text in messages:
+        detect(text, "es")
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    old = lambda text, lang=None: old_detect(text)  # noqa: E731
+    print("Precisión sobre %d frases:" % len(CORPUS))
+    for name, detect in (("anterior", old), ("utils.emotional", detect_emotional_pain)):
+        r = accuracy(detect)
+        print(
+            f"  {name:16s} precision={r['precision']:.2f} recall={r['recall']:.2f} "
+            f"(VP={r['tp']} FP={r['fp']} FN={r['fn']} VN={r['tn']})"
+        )
+
+    for length in (200, 3000):
+        messages = build_messages(args.iterations, length)
+        print(f"Tiempo por mensaje de {length} caracteres ({args.iterations} mensajes):")
+        for name, detect in (("anterior", old), ("utils.emotional", detect_emotional_pain)):
+            print(f"  {name:16s} {timeit(detect, messages):8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
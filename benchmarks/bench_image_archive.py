@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Archivo de imágenes: bloqueo del event loop, colisiones de nombres y presupuesto.
+
+Simula --images imágenes de --size bytes generadas por --users usuarios en
+ráfagas de --burst a la vez y compara:
+  - antes: open().write() en el event loop, en una carpeta plana, con
+    nombre img_<usuario>_<segundo>.png (como hacía image_command);
+  - ahora: utils.image_archive (escritura en hilo, subcarpetas por hash,
+    índice en SQLite y presupuesto de --max-mb).
+Reporta el retraso del event loop (utils.loop_lag), las imágenes perdidas
+por nombres repetidos, el tamaño en disco frente al presupuesto y cuánto
+cuesta buscar las imágenes de un usuario. Después cada usuario vuelve a
+archivar --repeats veces su última imagen (como un acierto de la caché de
+imágenes) y se cuentan las copias que llegan al disco.
+
+Uso:
+    python benchmarks/bench_image_archive.py [--images 300] [--size 1500000] [--max-mb 100] [--repeats 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def disk_usage(directory):
+    total = files = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            total += os.path.getsize(os.path.join(root, name))
+            files += 1
+    return total, files
+
+
+async def run(mode, args, directory):
+    from utils.image_archive import ImageArchive, alist_user_images
+    from utils.loop_lag import LoopLagMonitor
+
+    monitor = LoopLagMonitor(interval=0.005, warn_threshold=10)
+    monitor.start()
+    archive = ImageArchive(directory, max_bytes=int(args.max_mb * 1e6), max_age_days=30, interval=3600)
+    if mode == "ahora":
+        archive.start()
+    os.makedirs(directory, exist_ok=True)
+    base = os.urandom(args.size)
+
+    def payload(j):
+        # Contenido distinto por imagen, como las generadas con semillas distintas
+        return j.to_bytes(8, "big") + base[8:]
+
+    start = time.perf_counter()
+    for i in range(0, args.images, args.burst):
+        for j in range(i, min(i + args.burst, args.images)):
+            user_id = j % args.users
+            if mode == "antes":
+                # Igual que la versión anterior de image_command
+                filepath = os.path.join(directory, f"img_{user_id}_{int(time.time())}.png")
+                with open(filepath, "wb") as f:
+                    f.write(payload(j))
+            else:
+                archive.save(user_id, payload(j), prompt=f"prompt {j}")
+        await asyncio.sleep(0.02)
+    await archive.flush()
+    if mode == "ahora":
+        await archive.evict()
+        await archive.stop()
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+
+    size, files = disk_usage(directory)
+    repeated = ""
+    if mode == "ahora":
+        # La última imagen de cada usuario otra vez (acierto de caché)
+        last = {j % args.users: j for j in range(args.images)}
+        for _ in range(args.repeats):
+            for user_id, j in last.items():
+                archive.save(user_id, payload(j), prompt=f"prompt {j}")
+            await archive.flush()
+        _, files_after = disk_usage(directory)
+        repeated = (
+            f" | repetidas={args.repeats * len(last)} copias nuevas en disco={files_after - files} "
+            f"(duplicadas={archive.duplicates})"
+        )
+    lookup_start = time.perf_counter()
+    if mode == "antes":
+        found = [n for n in os.listdir(directory) if n.startswith("img_7_")]
+    else:
+        found = await alist_user_images(7, limit=1000)
+    lookup_ms = (time.perf_counter() - lookup_start) * 1000
+    lag = monitor.stats()
+    print(
+        f"{mode:6s} retraso del loop p99={lag['p99_ms']:6.1f} ms máx={lag['max_ms']:6.1f} ms | "
+        f"archivos={files}/{args.images} (perdidas por nombre repetido={args.images - files if mode == 'antes' else 0}, "
+        f"expulsadas={archive.evicted}) "
+        f"en disco={size / 1e6:6.1f} MB (presupuesto {args.max_mb:.0f} MB) | "
+        f"imágenes del usuario 7: {len(found)} en {lookup_ms:.2f} ms | {elapsed:.1f}s{repeated}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--size", type=int, default=1_500_000)
+    parser.add_argument("--max-mb", type=float, default=100.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="image_archive_")
+    os.environ.setdefault("DB_PATH", os.path.join(tmp, "bench.sqlite"))
+    from utils.migrations import run_migrations
+
+    run_migrations()
+    asyncio.run(run("antes", args, os.path.join(tmp, "plano")))
+    asyncio.run(run("ahora", args, os.path.join(tmp, "archivo")))
+
+
+if __name__ == "__main__":
+    main()
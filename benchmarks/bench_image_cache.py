@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Caché de imágenes: peticiones a Pollinations, ratio de aciertos y bytes ahorrados.
+
+Contra el servidor de imágenes falso local (benchmarks/fake_images.py) con
+--latency segundos por imagen, lanza --requests peticiones de /image en
+oleadas de --concurrent. Los prompts siguen una distribución de Zipf sobre
+--prompts descripciones, como los prompts populares que se repiten, todas
+con la misma semilla explícita (/image seed=N: sin semilla cada petición es
+una imagen nueva y no pasa por la caché). Compara
+generate_image_pollinations sin caché y con caché (cache=True), y reporta
+las peticiones que llegan al servidor, la latencia, el ratio de aciertos,
+los bytes ahorrados y el tamaño en disco frente al límite --max-mb.
+
+Uso:
+    python benchmarks/bench_image_cache.py [--requests 400] [--prompts 50] [--concurrent 20] [--max-mb 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_images import start_server  # noqa: E402
+
+
+def zipf_prompts(rng, n_requests, n_prompts, s=1.1):
+    weights = [1 / (rank ** s) for rank in range(1, n_prompts + 1)]
+    prompts = [f"gato astronauta número {i}" for i in range(n_prompts)]
+    return rng.choices(prompts, weights, k=n_requests)
+
+
+async def run(name, use_cache, workload, args, server):
+    from Commands.image import generate_image_pollinations
+
+    requests_before = server.requests
+    latencies = []
+
+    async def one(prompt):
+        start = time.perf_counter()
+        await generate_image_pollinations(prompt, "neon", timeout=60, seed=7, cache=use_cache)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(workload), args.concurrent):
+        await asyncio.gather(*(one(p) for p in workload[i:i + args.concurrent]))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{name:10s} peticiones a Pollinations={server.requests - requests_before:4d}/{len(workload)} "
+        f"p50={latencies[len(latencies) // 2]:.2f}s total={elapsed:.1f}s"
+    )
+
+
+async def main_async(args, server):
+    from utils.image_cache import image_cache
+    from utils.image_client import close_image_client
+
+    workload = zipf_prompts(random.Random(5), args.requests, args.prompts)
+    await run("sin caché", False, workload, args, server)
+    await run("con caché", True, workload, args, server)
+    stats = image_cache.stats()
+    print(
+        f"           aciertos={stats['hits']} compartidas={stats['coalesced']} fallos={stats['misses']} "
+        f"ratio={stats['hit_ratio']:.2f} ahorrado={stats['bytes_saved'] / 1e6:.1f} MB "
+        f"en disco={stats['bytes'] / 1e6:.2f}/{stats['max_bytes'] / 1e6:.2f} MB expulsadas={stats['evictions']}"
+    )
+    await close_image_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--prompts", type=int, default=50)
+    parser.add_argument("--concurrent", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--max-mb", type=float, default=5.0, help="límite de la caché (pequeño para forzar expulsiones)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, size=args.size)
+    os.environ["POLLINATIONS_BASE_URL"] = base_url
+    os.environ["SSL_CERT_FILE"] = server.cert
+    os.environ["IMAGE_CACHE"] = "1"
+    os.environ["IMAGE_CACHE_MAX_MB"] = str(args.max_mb)
+    os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="image_cache_")
+    try:
+        asyncio.run(main_async(args, server))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Descarga de imágenes: requests en hilos vs cliente async compartido.
+
+Contra el servidor de imágenes falso local (benchmarks/fake_images.py, por
+HTTPS) compara:
+  - antes: requests.get sin sesión dentro de asyncio.to_thread (como hacía
+    generate_image_pollinations): conexión y handshake TLS nuevos por
+    imagen, y un hilo del executor ocupado mientras se genera;
+  - ahora: generate_image_pollinations con utils.image_client.
+Dos escenarios:
+  - secuencial: --sequential imágenes una tras otra sin latencia de
+    generación (coste por imagen del transporte);
+  - concurrente: --rounds rondas de --concurrent imágenes a la vez con
+    --latency segundos de generación (como varios /image y /batch).
+Reporta tiempo, conexiones TLS abiertas (handshakes) e hilos usados.
+
+Uso:
+    python benchmarks/bench_image_client.py [--sequential 50] [--rounds 3] [--concurrent 16] [--latency 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_images import start_server  # noqa: E402
+
+
+def requests_fetch(base_url, prompt):
+    import requests
+
+    # Igual que la versión anterior de generate_image_pollinations
+    url = f"{base_url}/prompt/{urllib.parse.quote(prompt)}"
+    params = {"width": 1024, "height": 1024, "seed": int(time.time()), "nologo": "true"}
+    response = requests.get(url, params=params, timeout=60)
+    if response.status_code != 200:
+        raise Exception(f"Error API: {response.status_code}")
+    return response.content
+
+
+async def run(mode, args, server, base_url):
+    from Commands.image import generate_image_pollinations
+    from utils.image_client import close_image_client
+
+    peak_threads = threading.active_count()
+
+    async def one(i):
+        nonlocal peak_threads
+        prompt = f"gato astronauta {i}"
+        if mode == "antes":
+            task = asyncio.to_thread(requests_fetch, base_url, prompt)
+        else:
+            task = generate_image_pollinations(prompt, timeout=60)
+        peak_threads = max(peak_threads, threading.active_count())
+        data = await task
+        peak_threads = max(peak_threads, threading.active_count())
+        return len(data)
+
+    results = {}
+    server.latency = 0.0
+    connections = server.connections
+    start = time.perf_counter()
+    for i in range(args.sequential):
+        await one(i)
+    elapsed = time.perf_counter() - start
+    results["secuencial"] = (elapsed, elapsed / args.sequential * 1000, server.connections - connections)
+
+    server.latency = args.latency
+    connections = server.connections
+    threads_before = threading.active_count()
+    start = time.perf_counter()
+    for r in range(args.rounds):
+        await asyncio.gather(*(one(r * args.concurrent + i) for i in range(args.concurrent)))
+    elapsed = time.perf_counter() - start
+    results["concurrente"] = (elapsed, elapsed / args.rounds * 1000, server.connections - connections)
+
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    executor_threads = len(executor._threads) if executor is not None else 0
+    await close_image_client()
+
+    seq, conc = results["secuencial"], results["concurrente"]
+    print(
+        f"{mode:6s} secuencial: {seq[1]:6.1f} ms/imagen, {seq[2]} conexiones TLS | "
+        f"concurrente: {conc[0]:5.2f}s ({conc[1] / 1000:.2f}s/ronda de {args.concurrent}), "
+        f"{conc[2]} conexiones TLS | hilos del executor={executor_threads} "
+        f"(hilos del proceso: {threads_before} -> pico {peak_threads})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequential", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrent", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=0.0, size=args.size)
+    os.environ["POLLINATIONS_BASE_URL"] = base_url
+    os.environ["SSL_CERT_FILE"] = server.cert
+    os.environ["REQUESTS_CA_BUNDLE"] = server.cert
+    try:
+        for mode in ("antes", "ahora"):
+            asyncio.run(run(mode, args, server, base_url))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark de consultas sobre un ledger sintético, antes y después de los índices.
+
+Genera N filas en transactions (por defecto 10M) repartidas entre U usuarios
+y a lo largo de D días, aplica la migración 1 (sin índices), mide las
+consultas típicas, aplica la migración 2 (índices) y vuelve a medir.
+
+Uso:
+    python benchmarks/bench_ledger_indexes.py [--rows 10000000] [--users 100000] [--days 365]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = {
+    "historial de un usuario (50 últimos)": (
+        "SELECT kind, amount, created_at FROM transactions WHERE telegram_id = ? "
+        "ORDER BY created_at DESC LIMIT 50",
+        lambda i, a: (1 + (i * 7919) % a.users,),
+    ),
+    "movimientos de un usuario en 30 días": (
+        "SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE telegram_id = ? "
+        "AND created_at >= date('2025-01-01', '+' || ? || ' days') "
+        "AND created_at < date('2025-01-01', '+' || (? + 30) || ' days')",
+        lambda i, a: (1 + (i * 7919) % a.users, i % (a.days - 30), i % (a.days - 30)),
+    ),
+    "suscripciones expiradas": (
+        "SELECT COUNT(*) FROM users WHERE subscription_expires_at < '2025-02-01'",
+        lambda i, a: (),
+    ),
+    "usuario por stripe_customer_id": (
+        "SELECT telegram_id FROM users WHERE stripe_customer_id = ?",
+        lambda i, a: (f"cus_{1 + (i * 7919) % a.users}",),
+    ),
+}
+
+
+def populate(conn, args):
+    conn.execute("BEGIN")
+    conn.execute(
+        """
+        WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+        INSERT INTO users(telegram_id, credits, created_at, subscription_tier,
+                          stripe_customer_id, subscription_expires_at)
+        SELECT n, 100, '2025-01-01', CASE WHEN n % 10 = 0 THEN 'pro' ELSE 'free' END,
+               CASE WHEN n % 10 = 0 THEN 'cus_' || n END,
+               CASE WHEN n % 10 = 0 THEN date('2025-01-01', '+' || (n % 365) || ' days') END
+        FROM seq
+        """,
+        (args.users,),
+    )
+    conn.execute(
+        """
+        WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+        INSERT INTO transactions(telegram_id, kind, amount, created_at)
+        SELECT 1 + abs(random()) % ?,
+               CASE n % 3 WHEN 0 THEN 'consume' WHEN 1 THEN 'daily_bonus' ELSE 'refund' END,
+               CASE n % 3 WHEN 0 THEN -10 WHEN 1 THEN 45 ELSE 10 END,
+               strftime('%Y-%m-%dT%H:%M:%S', '2025-01-01', '+' || (n * ? / ?) || ' seconds')
+        FROM seq
+        """,
+        (args.rows, args.users, args.days * 86400, args.rows),
+    )
+    conn.execute("COMMIT")
+
+
+def measure(conn, args):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            conn.execute(sql, params(i, args)).fetchall()
+        results[name] = (time.perf_counter() - start) / args.repeat * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_idx_"), "ledger.sqlite")
+
+    from utils.db import get_connection
+    from utils.migrations import run_migrations
+
+    run_migrations(target=1)
+    conn = get_connection()
+    start = time.perf_counter()
+    populate(conn, args)
+    print(f"Generadas {args.rows} transacciones en {time.perf_counter() - start:.1f}s")
+
+    before = measure(conn, args)
+    start = time.perf_counter()
+    run_migrations()
+    print(f"Migración de índices: {time.perf_counter() - start:.1f}s")
+    after = measure(conn, args)
+
+    print(f"{'consulta':<40}{'antes ms':>12}{'después ms':>14}")
+    for name in QUERIES:
+        print(f"{name:<40}{before[name]:>12.2f}{after[name]:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
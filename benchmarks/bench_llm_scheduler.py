@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Ráfaga de llamadas al LLM con y sin utils.llm_scheduler.
+
+Simula una API con límite de peticiones por minuto (token bucket del lado
+del servidor, como Groq) que responde 429 cuando se supera. Lanza
+--requests llamadas repartidas en --spread segundos, un --crisis % de ellas
+marcadas como crisis, y compara:
+  - sin planificador: todas salen a la vez (429s = "Algo falló" al usuario);
+  - con planificador: límite RPM, concurrencia acotada y prioridad.
+Reporta 429s, máximo de llamadas simultáneas y espera en cola por prioridad.
+
+Uso:
+    python benchmarks/bench_llm_scheduler.py [--requests 1500] [--rpm 1200] [--crisis 10]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.llm_scheduler import CRISIS, NORMAL, LLMScheduler, TokenBucket  # noqa: E402
+
+
+class FakeAPI:
+    def __init__(self, rpm, duration):
+        self.bucket = TokenBucket(rpm)
+        self.duration = duration
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.ok = 0
+        self.rate_limited = 0
+
+    async def call(self):
+        if self.bucket.delay(1) > 0:
+            self.rate_limited += 1
+            return False
+        self.bucket.take(1)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.duration)
+        self.in_flight -= 1
+        self.ok += 1
+        return True
+
+
+async def run(args, use_scheduler):
+    rng = random.Random(1)
+    api = FakeAPI(args.rpm, args.duration)
+    scheduler = LLMScheduler(rpm=args.rpm, tpm=0, max_concurrency=args.concurrency)
+    waits = {CRISIS: [], NORMAL: []}
+
+    async def one(delay, priority):
+        await asyncio.sleep(delay)
+        if not use_scheduler:
+            await api.call()
+            return
+        async with scheduler.slot(priority) as queue_wait:
+            waits[priority].append(queue_wait)
+            await api.call()
+
+    jobs = []
+    for _ in range(args.requests):
+        priority = CRISIS if rng.random() < args.crisis / 100 else NORMAL
+        jobs.append(one(rng.uniform(0, args.spread), priority))
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - start
+
+    name = "con planificador" if use_scheduler else "sin planificador"
+    print(f"{name}: ok={api.ok} 429={api.rate_limited} simultáneas máx={api.max_in_flight} ({elapsed:.1f}s)")
+    if use_scheduler:
+        for priority, label in ((CRISIS, "crisis"), (NORMAL, "normal")):
+            w = sorted(waits[priority])
+            if w:
+                print(
+                    f"    espera en cola {label:7s} n={len(w):5d} p50={w[len(w) // 2]:6.2f}s "
+                    f"p95={w[int(len(w) * 0.95)]:6.2f}s máx={w[-1]:6.2f}s"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=0.2, help="duración de cada llamada (s)")
+    parser.add_argument("--spread", type=float, default=2.0, help="segundos en los que llegan las peticiones")
+    parser.add_argument("--crisis", type=float, default=10.0, help="%% de peticiones de crisis")
+    args = parser.parse_args()
+    asyncio.run(run(args, use_scheduler=False))
+    asyncio.run(run(args, use_scheduler=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Mide la latencia del event loop mientras los handlers acceden a créditos.
+
+Simula N handlers concurrentes que leen y consumen créditos mientras otra
+conexión mantiene bloqueada la base de datos a intervalos (contención
+real de SQLite). Compara las funciones síncronas llamadas directamente en
+el loop ("antes") con la fachada async sobre el hilo dedicado ("después").
+
+Uso:
+    python benchmarks/bench_loop_lag.py [--handlers 50] [--lock-ms 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def hold_locks(db_path, stop, lock_ms):
+    """Toma el lock de escritura repetidamente desde otra conexión."""
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(lock_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(0.05)
+    conn.close()
+
+
+async def scenario(use_async, handlers, rounds):
+    from utils import credits
+    from utils.loop_lag import LoopLagMonitor
+
+    monitor = LoopLagMonitor(interval=0.01, warn_threshold=float("inf"), window=100000)
+    monitor.start()
+
+    async def handler(uid):
+        for _ in range(rounds):
+            if use_async:
+                await credits.aget_credits(uid)
+                await credits.aconsume_credits(uid, 1)
+            else:
+                credits.get_credits(uid)
+                credits.consume_credits(uid, 1)
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(5000 + i) for i in range(handlers)))
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    return elapsed, monitor.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--lock-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_lag_"), "bench.sqlite")
+    os.environ["DB_PATH"] = db_path
+
+    from utils import credits
+    from utils.db import shutdown_db_executor
+
+    credits.init_db()
+    for i in range(args.handlers):
+        credits.add_credits(5000 + i, 10_000)
+
+    stop = threading.Event()
+    locker = threading.Thread(target=hold_locks, args=(db_path, stop, args.lock_ms), daemon=True)
+    locker.start()
+    try:
+        for label, use_async in (("antes (sync en el loop)", False), ("después (hilo de DB)", True)):
+            elapsed, stats = asyncio.run(scenario(use_async, args.handlers, args.rounds))
+            print(
+                f"{label:<26} tiempo={elapsed:6.2f}s  lag p50={stats['p50_ms']:7.1f}ms  "
+                f"p99={stats['p99_ms']:7.1f}ms  max={stats['max_ms']:7.1f}ms"
+            )
+    finally:
+        stop.set()
+        locker.join()
+        shutdown_db_executor()
+
+
+if __name__ == "__main__":
+    main()
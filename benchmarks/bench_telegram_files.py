@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Reenvío de fotos por file_id: bytes subidos y latencia de envío.
+
+Varios usuarios piden por /image las mismas --prompts descripciones con la
+misma semilla (seed=7: la caché de imágenes devuelve los mismos bytes). Un
+Telegram falso simula la subida (--latency base + tamaño / --bandwidth) y
+devuelve un file_id por foto subida; un envío por file_id solo paga la
+latencia base. Se compara el handler anterior (sacado de git: por defecto
+la revisión anterior al cambio, o --before REV) con el actual y se
+reportan, para las entregas repetidas, los bytes subidos y la latencia de
+reply_photo. Al final se invalida un file_id para comprobar que la foto se
+vuelve a subir.
+
+Uso:
+    python benchmarks/bench_telegram_files.py [--requests 60] [--prompts 5] [--bandwidth 2.0] [--before REV]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram.error import BadRequest  # noqa: E402
+
+from bench_chat_burst import load_handler_module, revision_before  # noqa: E402
+from fake_images import start_server  # noqa: E402
+
+# Texto que sólo existe en Commands/image.py desde el reenvío por file_id
+FILES_MARKER = "from utils.telegram_files import"
+
+
+class FakeTelegram:
+    """Servidor de Telegram simulado: coste de subida y file_ids válidos."""
+
+    def __init__(self, latency, bandwidth_mb):
+        self.latency = latency
+        self.bandwidth = bandwidth_mb * 1e6
+        self.file_ids = set()
+        self._ids = itertools.count(1)
+        self.sends = []  # (modo, bytes subidos, segundos)
+
+    async def send_photo(self, photo):
+        start = time.monotonic()
+        if isinstance(photo, str):
+            if photo not in self.file_ids:
+                raise BadRequest("Wrong file identifier/http url specified")
+            await asyncio.sleep(self.latency)
+            self.sends.append(("file_id", 0, time.monotonic() - start))
+            return photo
+        data = photo.read()
+        await asyncio.sleep(self.latency + len(data) / self.bandwidth)
+        file_id = f"AgAC-{next(self._ids)}"
+        self.file_ids.add(file_id)
+        self.sends.append(("upload", len(data), time.monotonic() - start))
+        return file_id
+
+
+class StubMessage:
+    def __init__(self, telegram):
+        self.telegram = telegram
+
+    async def reply_text(self, text, **kwargs):
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        return self
+
+    async def delete(self):
+        return True
+
+    async def reply_photo(self, photo, **kwargs):
+        file_id = await self.telegram.send_photo(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=file_id, file_unique_id=file_id + "-u")])
+
+
+def summarize(name, sends, first_sends):
+    repeats = sends[first_sends:]
+    uploaded = sum(b for _, b, _ in repeats)
+    durations = sorted(d for _, _, d in repeats)
+    print(
+        f"{name:6s} entregas repetidas={len(repeats)} subidos={uploaded / 1e6:6.2f} MB "
+        f"latencia reply_photo p50={durations[len(durations) // 2] * 1000:6.1f} ms "
+        f"p95={durations[int(len(durations) * 0.95)] * 1000:6.1f} ms"
+    )
+
+
+async def run(name, handler, args, user_base):
+    from utils.credits import aadd_credits
+
+    telegram = FakeTelegram(args.latency, args.bandwidth)
+    for i in range(args.requests):
+        user_id = user_base + i % 20
+        await aadd_credits(user_id, 100)
+        prompt = f"seed=7 gato astronauta número {i % args.prompts}"
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=StubMessage(telegram))
+        await handler(update, SimpleNamespace(args=prompt.split()))
+    summarize(name, telegram.sends, args.prompts)
+    return telegram
+
+
+async def main_async(args):
+    from utils.credits import aadd_credits
+    from utils.image_client import close_image_client
+    from utils.migrations import run_migrations
+    from utils.telegram_files import telegram_files
+
+    run_migrations()
+    from Commands import image as after
+
+    rev = args.before or revision_before(FILES_MARKER, "Commands/image.py")
+    before = load_handler_module(rev, "Commands/image.py", marker=FILES_MARKER)
+    await run("antes", before.image_command, args, 1000)
+    telegram = await run("ahora", after.image_command, args, 2000)
+    print(f"       {telegram_files.stats()}")
+
+    # file_id caducado: se olvida y la foto se vuelve a subir
+    telegram.file_ids.clear()
+    uploads = telegram_files.uploads
+    # Usuario nuevo: los anteriores pueden haber agotado la cuota diaria
+    await aadd_credits(3000, 100)
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=3000), message=StubMessage(telegram))
+    await after.image_command(update, SimpleNamespace(args="seed=7 gato astronauta número 0".split()))
+    print(f"file_id rechazado: resubidas={telegram_files.uploads - uploads} descartados={telegram_files.stale}")
+    await close_image_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--size", type=int, default=1_500_000, help="bytes por imagen (PNG de 1024x1024)")
+    parser.add_argument("--bandwidth", type=float, default=2.0, help="MB/s de subida a Telegram")
+    parser.add_argument("--latency", type=float, default=0.08, help="latencia base de la API de Telegram")
+    parser.add_argument("--before", help="revisión de git con el handler anterior (por defecto, la anterior al cambio)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=0.05, size=args.size)
+    tmp = tempfile.mkdtemp(prefix="telegram_files_")
+    os.environ["POLLINATIONS_BASE_URL"] = base_url
+    os.environ["SSL_CERT_FILE"] = server.cert
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(tmp, "cache")
+    os.environ["IMAGE_OUTPUT_DIR"] = os.path.join(tmp, "out")
+    os.environ.setdefault("DB_PATH", os.path.join(tmp, "bench.sqlite"))
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia: débitos paralelos nunca dejan saldo negativo.
+
+Lanza muchos hilos (cada uno con su propia conexión) que intentan debitar
+del mismo usuario a la vez y verifica que:
+  - el saldo final nunca es negativo,
+  - débitos exitosos * monto == saldo inicial - saldo final,
+  - la tabla transactions registra exactamente esos débitos.
+
+Uso:
+    python benchmarks/check_no_overdraft.py [--threads 32] [--attempts 50]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=50)
+    parser.add_argument("--amount", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="overdraft_"), "check.sqlite")
+
+    from utils import credits
+    from utils.audit import flush_audit_log
+    from utils.db import get_connection
+
+    credits.init_db()
+    user_id = 424242
+    initial = credits.add_credits(user_id, 0)  # crea el usuario con el saldo inicial
+    successes = []
+    barrier = threading.Barrier(args.threads)
+
+    def worker():
+        ok_count = 0
+        barrier.wait()
+        for _ in range(args.attempts):
+            if credits.consume_credits(user_id, args.amount):
+                ok_count += 1
+        successes.append(ok_count)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    flush_audit_log()
+    final = credits.get_credits(user_id)
+    debited = sum(successes) * args.amount
+    logged = get_connection().execute(
+        "SELECT COALESCE(-SUM(amount), 0) FROM transactions WHERE telegram_id = ? AND kind = 'consume'",
+        (user_id,),
+    ).fetchone()[0]
+
+    print(f"saldo inicial={initial} final={final} débitos exitosos={sum(successes)} debitado={debited}")
+    assert final >= 0, "saldo negativo"
+    assert initial - final == debited, "el saldo no cuadra con los débitos exitosos"
+    assert logged == debited, "transactions no cuadra con los débitos exitosos"
+    assert final < args.amount, "quedaron créditos sin debitar"
+    print("OK: sin sobregiro bajo débitos paralelos")
+
+
+if __name__ == "__main__":
+    main()
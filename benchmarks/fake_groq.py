@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatible con la API de chat completions de Groq/OpenAI.
+
+Responde en /openai/v1/chat/completions (la ruta que usa el SDK de Groq) con
+una respuesta fija, en streaming (SSE) o completa, tras una latencia
+configurable. Sirve para medir el bot sin red ni API key real:
+
+    python benchmarks/fake_groq.py --port 8765 --latency 1.0
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=test python bot.py
+
+La latencia (hasta la cabecera de la respuesta) puede ser una distribución:
+    1.0                      fija
+    uniform:0.2,1.5          uniforme entre 0.2 y 1.5 s
+    lognormal:0.5,0.6        lognormal con mediana 0.5 s y sigma 0.6
+    mix:0.9@0.3,0.1@4.0      90% a 0.3 s y 10% a 4.0 s (cola pesada)
+--error-rate y --rate-limit-rate inyectan respuestas 500 y 429 (con
+Retry-After) en esa fracción de las peticiones.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Lo que sientes tiene sentido. Estoy aquí contigo, sin prisa. "
+    "Si quieres, cuéntame un poco más de lo que está pasando."
+)
+
+
+def parse_latency(spec, rng):
+    """Convierte una latencia (número o texto, ver arriba) en una función sin argumentos."""
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        value = float(kind)
+        return lambda: value
+    if kind == "uniform":
+        low, high = (float(x) for x in params.split(","))
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = (float(x) for x in params.split(","))
+        return lambda: median * rng.lognormvariate(0.0, sigma)
+    if kind == "mix":
+        weights, values = [], []
+        for part in params.split(","):
+            weight, value = part.split("@")
+            weights.append(float(weight))
+            values.append(float(value))
+        return lambda: rng.choices(values, weights)[0]
+    raise ValueError(f"Latencia no reconocida: {spec!r}")
+
+
+def make_handler(latency, reply=REPLY, token_delay=0.01, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1.0, seed=None):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    sample_latency = parse_latency(latency, rng)
+
+    def draw():
+        with rng_lock:
+            r = rng.random()
+            if r < rate_limit_rate:
+                return 429, 0.0
+            if r < rate_limit_rate + error_rate:
+                return 500, sample_latency()
+            return 200, sample_latency()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            with self.server.lock:
+                self.server.requests += 1
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            status, delay = draw()
+            time.sleep(delay)
+            if status != 200:
+                with self.server.lock:
+                    if status == 429:
+                        self.server.rate_limited += 1
+                    else:
+                        self.server.errors += 1
+                self._error(status)
+                return
+            model = body.get("model", "fake")
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for word in reply.split(" "):
+                    self._chunk(self._sse(model, {"content": word + " "}))
+                    time.sleep(token_delay)
+                self._chunk(self._sse(model, {}, finish="stop"))
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+                return
+            payload = json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _error(self, status):
+            message = "Rate limit reached" if status == 429 else "Internal server error"
+            payload = json.dumps({"error": {"message": message, "type": "fake_error"}}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if status == 429:
+                self.send_header("Retry-After", f"{retry_after:g}")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _sse(self, model, delta, finish=None):
+            data = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(port=0, latency=1.0, **kwargs):
+    """Arranca el servidor en un hilo de fondo. Devuelve (server, base_url).
+
+    `server.requests` cuenta las peticiones recibidas; `server.errors` y
+    `server.rate_limited`, las respondidas con 500 y 429.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, **kwargs))
+    server.daemon_threads = True
+    server.requests = 0
+    server.errors = 0
+    server.rate_limited = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="1.0", help="segundos o distribución (ver arriba)")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+    server, url = start_server(
+        args.port, args.latency, token_delay=args.token_delay, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+    )
+    print(f"Groq falso escuchando en {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Servidor local de imágenes compatible con Pollinations (/prompt/<texto>).
+
+Devuelve una imagen PNG falsa de --size bytes tras --latency segundos, por
+HTTPS con un certificado autofirmado generado al vuelo (openssl) para que
+el coste del handshake TLS sea real, o por HTTP con --no-tls. Cuenta las
+conexiones aceptadas (handshakes) y las peticiones:
+
+    python benchmarks/fake_images.py --port 8766 --latency 2.0
+    POLLINATIONS_BASE_URL=https://127.0.0.1:8766 SSL_CERT_FILE=<cert> python bot.py
+"""
+
+import argparse
+import os
+import random
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def make_cert():
+    """Genera un certificado autofirmado para 127.0.0.1. Devuelve (cert, key)."""
+    directory = tempfile.mkdtemp(prefix="fake_images_")
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def make_handler(size, error_rate=0.0, seed=None):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with self.server.lock:
+                self.server.requests += 1
+                self.server.paths.append(self.path)
+            with rng_lock:
+                failed = rng.random() < error_rate
+            time.sleep(self.server.latency)
+            if failed:
+                self.send_response(502)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            # Contenido distinto por petición, como una imagen generada de verdad
+            body = PNG_HEADER + os.urandom(16) + b"\0" * max(0, size - len(PNG_HEADER) - 16)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, address = super().get_request()
+        # Cabeceras y cuerpo van en escrituras separadas: sin esto el ACK
+        # retardado añade ~40 ms a cada respuesta pequeña
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.connections += 1
+        return request, address
+
+
+def start_server(port=0, latency=1.0, size=200_000, tls=True, **kwargs):
+    """Arranca el servidor en un hilo de fondo. Devuelve (server, base_url).
+
+    `server.connections` cuenta conexiones aceptadas, `server.requests` las
+    peticiones y `server.cert` es el certificado (None sin TLS).
+    `server.latency` se puede cambiar en marcha.
+    """
+    server = _Server(("127.0.0.1", port), make_handler(size, **kwargs))
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.paths = []
+    server.cert = None
+    scheme = "http"
+    if tls:
+        cert, key = make_cert()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        server.cert = cert
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+    server, url = start_server(args.port, args.latency, args.size, tls=not args.no_tls)
+    print(f"Imágenes falsas en {url}" + (f" (SSL_CERT_FILE={server.cert})" if server.cert else ""))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga concurrente para utils.credits.
+
+Lanza N hilos (cada uno con su propia conexión) o N corrutinas (sobre la API
+async y el hilo dedicado de la DB) que ejecutan una mezcla de
+consume_credits / add_credits / claim_daily_bonus / get_credits contra una
+base temporal, y reporta:
+  - ops/s totales y por operación,
+  - latencias p50/p95/p99 (ms),
+  - errores "database is locked" y otros errores,
+  - consistencia final: saldo == 100 iniciales + SUM(transactions) por usuario.
+
+El resultado se imprime como JSON (o se guarda con --json) para comparar
+cambios en la capa de almacenamiento entre ejecuciones.
+
+Uso:
+    python benchmarks/load_credits.py --mode threads --workers 16 --ops 2000
+    python benchmarks/load_credits.py --mode async --workers 200 --ops 200 --json out.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_MIX = "consume=40,add=10,bonus=10,get=40"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"consume", "add", "bonus", "get"}
+    if unknown:
+        raise SystemExit(f"Operaciones desconocidas en --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.locked_errors = 0
+        self.other_errors = 0
+
+    def record(self, op, seconds):
+        with self.lock:
+            self.latencies.setdefault(op, []).append(seconds)
+
+    def error(self, exc):
+        with self.lock:
+            if isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc):
+                self.locked_errors += 1
+            else:
+                self.other_errors += 1
+
+
+def pick_ops(mix, n, seed):
+    rng = random.Random(seed)
+    names = list(mix)
+    return rng.choices(names, weights=[mix[k] for k in names], k=n)
+
+
+def sync_call(credits, op, uid):
+    if op == "consume":
+        credits.consume_credits(uid, 1)
+    elif op == "add":
+        credits.add_credits(uid, 1, kind="load")
+    elif op == "bonus":
+        credits.claim_daily_bonus(uid)
+    else:
+        credits.get_credits(uid)
+
+
+async def async_call(credits, op, uid):
+    if op == "consume":
+        await credits.aconsume_credits(uid, 1)
+    elif op == "add":
+        await credits.aadd_credits(uid, 1, kind="load")
+    elif op == "bonus":
+        await credits.aclaim_daily_bonus(uid)
+    else:
+        await credits.aget_credits(uid)
+
+
+def run_threads(credits, args, mix, stats):
+    barrier = threading.Barrier(args.workers)
+
+    def worker(w):
+        rng = random.Random(w)
+        ops = pick_ops(mix, args.ops, w)
+        barrier.wait()
+        for op in ops:
+            uid = rng.randrange(args.users)
+            start = time.perf_counter()
+            try:
+                sync_call(credits, op, uid)
+            except Exception as e:
+                stats.error(e)
+                continue
+            stats.record(op, time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(args.workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def run_async(credits, args, mix, stats):
+    async def worker(w):
+        rng = random.Random(w)
+        for op in pick_ops(mix, args.ops, w):
+            uid = rng.randrange(args.users)
+            start = time.perf_counter()
+            try:
+                await async_call(credits, op, uid)
+            except Exception as e:
+                stats.error(e)
+                continue
+            stats.record(op, time.perf_counter() - start)
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(args.workers)))
+        return time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def check_consistency():
+    from utils.audit import flush_audit_log
+    from utils.db import get_connection
+
+    flush_audit_log()
+    conn = get_connection()
+    rows = conn.execute(
+        """
+        SELECT u.telegram_id, u.credits, 100 + COALESCE(SUM(t.amount), 0)
+        FROM users u LEFT JOIN transactions t ON t.telegram_id = u.telegram_id
+        GROUP BY u.telegram_id
+        """
+    ).fetchall()
+    mismatched = [r[0] for r in rows if r[1] != r[2]]
+    negative = [r[0] for r in rows if r[1] < 0]
+    return {
+        "users": len(rows),
+        "mismatched_users": len(mismatched),
+        "negative_balances": len(negative),
+        "consistent": not mismatched and not negative,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("threads", "async"), default="threads")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=1000, help="operaciones por worker")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--json", help="guardar el resultado en este archivo")
+    parser.add_argument("--db", help="ruta de la base (por defecto, una temporal)")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    os.environ["DB_PATH"] = args.db or os.path.join(tempfile.mkdtemp(prefix="load_credits_"), "load.sqlite")
+
+    from utils import credits
+    from utils.db import shutdown_db_executor
+
+    credits.init_db()
+    stats = Stats()
+    runner = run_threads if args.mode == "threads" else run_async
+    elapsed = runner(credits, args, mix, stats)
+    shutdown_db_executor()
+
+    all_latencies = sorted(x for values in stats.latencies.values() for x in values)
+    per_op = {}
+    for op, values in sorted(stats.latencies.items()):
+        values.sort()
+        per_op[op] = {
+            "count": len(values),
+            "ops_per_sec": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+        }
+
+    result = {
+        "config": {
+            "mode": args.mode,
+            "workers": args.workers,
+            "ops_per_worker": args.ops,
+            "users": args.users,
+            "mix": mix,
+            "audit_durability": os.getenv("AUDIT_DURABILITY", "grouped"),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "elapsed_sec": elapsed,
+        "ops_per_sec": len(all_latencies) / elapsed,
+        "p50_ms": percentile(all_latencies, 0.50),
+        "p95_ms": percentile(all_latencies, 0.95),
+        "p99_ms": percentile(all_latencies, 0.99),
+        "locked_errors": stats.locked_errors,
+        "other_errors": stats.other_errors,
+        "per_op": per_op,
+        "consistency": check_consistency(),
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    if not result["consistency"]["consistent"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
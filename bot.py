@@ -7,6 +7,7 @@ import logging.handlers
 import traceback
 import time
 import re
+import datetime
 
 from telegram.ext import ContextTypes, Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
@@ -14,10 +15,22 @@ from dotenv import load_dotenv
 
 # Importar funciones de créditos desde utils
 from utils.credits import (
-    init_db, get_credits, add_credits, claim_daily_bonus,
-    get_user_subscription, set_user_subscription, SUBSCRIPTION_TIERS
+    init_db, aget_credits, aadd_credits, aclaim_daily_bonus,
+    aexpire_subscriptions, SUBSCRIPTION_TIERS
 )
+from utils.audit import audit_log
+from utils.chat_store import chat_sessions
+from utils.db import run_db, shutdown_db_executor
+from utils.image_archive import image_archive
+from utils.image_cache import image_cache
+from utils.image_client import close_image_client
+from utils.ledger import acompact_ledger
+from utils.llm import close_llm_client
+from utils.llm_scheduler import llm_scheduler
+from utils.loop_lag import LoopLagMonitor
+from utils.notifier import RateLimitedSender
 from utils.payments import create_payment_link, create_trial_subscription, get_subscription_info
+from utils.telegram_files import telegram_files
 
 load_dotenv()
 
@@ -26,22 +39,15 @@ logger = logging.getLogger(__name__)
 # ADMIN_IDS: se construirá en main() pero aquí la inicializamos como global
 ADMIN_IDS = set()
 
-# Palabras clave que indican dolor emocional
-EMOTIONAL_PAIN_KEYWORDS = [
-    "depresión", "deprimido", "tristeza", "triste", "suicidio", "suicidarme",
-    "muerte", "quiero morirme", "no aguanto", "no puedo", "solo/a", "soledad",
-    "ansiedad", "pánico", "miedo", "fobia", "trauma", "abuso", "maltrato",
-    "duelo", "pérdida", "abandono", "rechazo", "humillación", "vergüenza",
-    "culpa", "fracaso", "inútil", "sin sentido", "vacío", "desesperado/a",
-    "acosado", "bullyng", "autolesión", "automutilación", "trastorno",
-]
+# Monitor de latencia del event loop (ver LOOP_LAG_WARN_MS)
+loop_lag_monitor = LoopLagMonitor(warn_threshold=int(os.getenv("LOOP_LAG_WARN_MS", "250")) / 1000)
 
 
 async def start(update, context):
     user = update.effective_user
     if user:
         # Intentar reclamar bonus diario
-        bonus_claimed = claim_daily_bonus(user.id)
+        bonus_claimed = await aclaim_daily_bonus(user.id)
         
         welcome_message = (
             f"Hola {user.first_name}. Estoy aquí para acompañarte.\n\n"
@@ -132,7 +138,7 @@ async def credits_command(update, context):
         await update.message.reply_text("No pude identificar al usuario.")
         return
     
-    credits = get_credits(user.id)
+    credits = await aget_credits(user.id)
     lang_code = None
     if getattr(user, "language_code", None):
         lang_code = (user.language_code or "")[:2].lower()
@@ -178,7 +184,7 @@ async def addcredits_command(update, context):
         await update.message.reply_text("❌ La cantidad debe ser positiva.")
         return
     
-    add_credits(target_id, amount, kind="admin")
+    await aadd_credits(target_id, amount, kind="admin")
     await update.message.reply_text(f"✅ Añadidos {amount} créditos al usuario {target_id}.")
 
 
@@ -236,7 +242,7 @@ async def estado_command(update, context):
     if not user:
         return
     
-    credits = get_credits(user.id)
+    credits = await aget_credits(user.id)
     
     status = (
         "📊 **Tu estado con nosotros**\n\n"
@@ -327,6 +333,56 @@ async def create_letter_callback(update, context):
     )
 
 
+async def compact_ledger_job(context):
+    """Tarea diaria: mueve el ledger antiguo al archivo y lo resume por día."""
+    try:
+        moved = await acompact_ledger()
+        logger.info("Compactación del ledger: %d filas archivadas", moved)
+    except Exception:
+        logger.exception("Falló la compactación del ledger")
+
+
+async def expire_subscriptions_job(context):
+    """Tarea periódica: baja a free las suscripciones vencidas y, opcionalmente, avisa."""
+    try:
+        downgraded = await aexpire_subscriptions()
+    except Exception:
+        logger.exception("Falló el barrido de suscripciones vencidas")
+        return
+    if not downgraded:
+        return
+    logger.info("Suscripciones vencidas pasadas a free: %d", len(downgraded))
+    if os.getenv("SUBSCRIPTION_EXPIRY_NOTIFY", "1") == "1":
+        text = (
+            "Tu plan ha vencido y ahora estás en el plan Free.\n"
+            "Puedes renovarlo cuando quieras con /planes. 💙"
+        )
+        sender = context.bot_data.setdefault("notifier", RateLimitedSender(context.bot))
+        await sender.send_many([(user_id, text) for user_id in downgraded])
+
+
+async def post_init(application):
+    """Arranca tareas de fondo una vez que el event loop está en marcha."""
+    loop_lag_monitor.start()
+    image_archive.start()
+
+
+async def post_shutdown(application):
+    """Detiene tareas de fondo y libera la base de datos al apagar."""
+    await loop_lag_monitor.stop()
+    await image_archive.stop()
+    logger.info("Latencia del event loop: %s", loop_lag_monitor.stats())
+    logger.info("Cola del LLM: %s", llm_scheduler.stats())
+    logger.info("Caché de imágenes: %s", image_cache.stats())
+    logger.info("Fotos enviadas por file_id: %s", telegram_files.stats())
+    await close_llm_client()
+    await close_image_client()
+    await chat_sessions.flush()
+    await image_archive.flush()
+    logger.info("Archivo de imágenes: %s", image_archive.stats())
+    await run_db(audit_log.close)
+    shutdown_db_executor()
+
 
 def main():
     TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -334,7 +390,16 @@ def main():
         sys.stderr.write("ERROR: la variable de entorno TELEGRAM_TOKEN no está definida.\n")
         sys.exit(1)
 
-    app = Application.builder().token(TOKEN).build()
+    # concurrent_updates: cada update se atiende en su propia tarea, así una
+    # respuesta lenta del LLM no retrasa los mensajes de los demás usuarios
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(int(os.getenv("CONCURRENT_UPDATES", "256")))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Logging
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -471,6 +536,23 @@ def main():
 
     set_bot_commands(TOKEN)
 
+    # Tareas programadas
+    if app.job_queue is not None:
+        compact_hour = int(os.getenv("LEDGER_COMPACT_HOUR_UTC", "4"))
+        app.job_queue.run_daily(
+            compact_ledger_job,
+            time=datetime.time(hour=compact_hour, tzinfo=datetime.timezone.utc),
+            name="compact_ledger",
+        )
+        app.job_queue.run_repeating(
+            expire_subscriptions_job,
+            interval=int(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL", "300")),
+            first=10,
+            name="expire_subscriptions",
+        )
+    else:
+        logger.warning("JobQueue no disponible: instala python-telegram-bot[job-queue] para las tareas programadas")
+
     # Importar handlers de Commands
     from Commands.chat import handle_chat_empathetic
     
@@ -0,0 +1,128 @@
+"""
+Registro de auditoría (tabla transactions) con escritura diferida.
+
+En modo "grouped" las filas se acumulan en memoria y un hilo de fondo las
+inserta en lote cada AUDIT_FLUSH_ROWS filas o cada AUDIT_FLUSH_MS
+milisegundos, en una sola transacción. Los saldos (tabla users) se siguen
+confirmando en cada operación: sólo el log de auditoría se agrupa.
+
+En modo "strict" cada fila se inserta dentro de la misma transacción que
+el cambio de saldo, como antes. El servidor de webhooks usa siempre este
+modo: corre aparte del bot, sin un apagado ordenado que vacíe el buffer.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from utils.db import transaction
+
+logger = logging.getLogger(__name__)
+
+AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "grouped").lower()
+AUDIT_FLUSH_ROWS = int(os.getenv("AUDIT_FLUSH_ROWS", "500"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "200"))
+# Tope de filas pendientes cuando los lotes fallan y se re-encolan
+AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "50000"))
+
+INSERT_SQL = "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)"
+
+
+class AuditLog:
+    """Buffer de filas de auditoría con group commit."""
+
+    def __init__(self, durability: str = AUDIT_DURABILITY, flush_rows: int = AUDIT_FLUSH_ROWS,
+                 flush_ms: int = AUDIT_FLUSH_MS, max_pending: int = AUDIT_MAX_PENDING):
+        self.strict = durability != "grouped"
+        self.flush_rows = flush_rows
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        self._rows = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def set_strict(self):
+        """Pasa a modo strict (volcando antes lo que hubiera en el buffer)."""
+        self.close()
+        self.strict = True
+
+    def record(self, conn, row: tuple):
+        """Registra una fila (telegram_id, kind, amount, created_at).
+
+        En modo strict se inserta en `conn`, dentro de la transacción del
+        llamador; en modo grouped se encola para el próximo lote.
+        """
+        if self.strict:
+            conn.execute(INSERT_SQL, row)
+            return
+        with self._cond:
+            self._rows.append(row)
+            if self._thread is None:
+                self._start()
+            if len(self._rows) >= self.flush_rows:
+                self._cond.notify()
+
+    def _start(self):
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._rows) >= self.flush_rows or self._closed,
+                    timeout=self.flush_ms / 1000,
+                )
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> int:
+        """Escribe en la DB todas las filas pendientes. Devuelve cuántas escribió."""
+        with self._write_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                with transaction() as conn:
+                    conn.executemany(INSERT_SQL, rows)
+            except Exception:
+                logger.exception("No se pudo escribir el lote de auditoría (%d filas); se reintentará", len(rows))
+                with self._cond:
+                    self._rows[:0] = rows
+                    dropped = len(self._rows) - self.max_pending
+                    if dropped > 0:
+                        # La DB lleva tiempo fallando: no crecemos sin límite
+                        del self._rows[:dropped]
+                        logger.error("Buffer de auditoría lleno: se descartan las %d filas más antiguas", dropped)
+                return 0
+            return len(rows)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._rows)
+
+    def close(self):
+        """Detiene el hilo de fondo tras volcar lo pendiente (usar al apagar)."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._closed = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.close)
+
+
+def flush_audit_log() -> int:
+    """Vuelca el buffer de auditoría a la DB (p. ej. antes de leer transactions)."""
+    return audit_log.flush()
@@ -0,0 +1,167 @@
+"""
+Historial de chat persistente y acotado en memoria.
+
+Cada usuario tiene una fila en chat_sessions con su ventana de historial,
+el resumen y los mensajes pendientes de resumir, en JSON compacto. La
+sesión se lee de SQLite con el primer mensaje del usuario, vive en una
+caché LRU con TTL (CHAT_SESSION_TTL, CHAT_SESSION_CACHE_SIZE) y se escribe
+de vuelta tras cada turno a través del hilo de la DB, sin que la respuesta
+espere. Las sesiones inactivas salen de memoria al caducar; la copia en la
+base de datos sobrevive a los reinicios.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from utils.cache import TTLCache
+from utils.db import get_connection, get_db_executor, run_db
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_CACHE_SIZE = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "10000"))
+
+
+def _empty_session() -> dict:
+    return {"chat_history": [], "chat_summary": "", "chat_summary_pending": []}
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_session(telegram_id: int) -> dict:
+    """Lee la sesión guardada de un usuario (vacía si no tiene)."""
+    row = get_connection().execute(
+        "SELECT history, summary, pending FROM chat_sessions WHERE telegram_id = ?",
+        (telegram_id,),
+    ).fetchone()
+    if row is None:
+        return _empty_session()
+    return {
+        "chat_history": json.loads(row[0]),
+        "chat_summary": row[1],
+        "chat_summary_pending": json.loads(row[2]),
+    }
+
+
+def save_session(telegram_id: int, history: str, summary: str, pending: str):
+    """Guarda la sesión ya serializada (upsert de una fila)."""
+    get_connection().execute(
+        """
+        INSERT INTO chat_sessions(telegram_id, history, summary, pending, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(telegram_id) DO UPDATE SET
+            history = excluded.history,
+            summary = excluded.summary,
+            pending = excluded.pending,
+            updated_at = excluded.updated_at
+        """,
+        (telegram_id, history, summary, pending, datetime.utcnow().isoformat()),
+    )
+
+
+def delete_session(telegram_id: int):
+    get_connection().execute("DELETE FROM chat_sessions WHERE telegram_id = ?", (telegram_id,))
+
+
+class ChatSessionStore:
+    """Sesiones de chat en memoria respaldadas por SQLite."""
+
+    def __init__(self, maxsize: int = CHAT_SESSION_CACHE_SIZE, ttl: float = CHAT_SESSION_TTL):
+        self._cache = TTLCache(maxsize, ttl)
+        self._loading = {}
+        self._writes = set()
+        self._purge_every = max(1.0, ttl / 10)
+        self._last_purge = time.monotonic()
+        self.loads = 0
+        self.saves = 0
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge >= self._purge_every:
+            self._last_purge = now
+            evicted = self._cache.purge_expired()
+            if evicted:
+                logger.debug("%d sesiones de chat inactivas liberadas de memoria", evicted)
+
+    async def get(self, telegram_id: int) -> dict:
+        """Sesión del usuario; la carga de la base de datos si no está en memoria.
+
+        Dos mensajes simultáneos del mismo usuario comparten una sola lectura
+        y reciben el mismo dict.
+        """
+        self._maybe_purge()
+        session = self._cache.get(telegram_id)
+        if session is not None:
+            return session
+        pending = self._loading.get(telegram_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[telegram_id] = future
+        try:
+            session = await run_db(load_session, telegram_id)
+            self.loads += 1
+            self._cache.set(telegram_id, session)
+            future.set_result(session)
+            return session
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Si nadie más espera, evita "Future exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(telegram_id, None)
+
+    def save(self, telegram_id: int, session: dict):
+        """Programa la escritura de la sesión y renueva su TTL en memoria.
+
+        Se serializa aquí, en el event loop, para que el hilo de la DB no lea
+        un dict que otra tarea está modificando. Las escrituras salen en
+        orden por el único hilo de la DB.
+        """
+        self._cache.set(telegram_id, session)
+        payload = (
+            _dumps(session.get("chat_history", [])),
+            session.get("chat_summary", ""),
+            _dumps(session.get("chat_summary_pending", [])),
+        )
+        # run_in_executor encola ya mismo: un clear() posterior no se adelanta
+        write = asyncio.get_running_loop().run_in_executor(
+            get_db_executor(), functools.partial(save_session, telegram_id, *payload)
+        )
+        self._writes.add(write)
+        write.add_done_callback(self._write_done)
+        self.saves += 1
+
+    def _write_done(self, write):
+        self._writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            logger.error("No se pudo guardar la sesión de chat: %s", write.exception())
+
+    async def clear(self, telegram_id: int):
+        """Borra el historial del usuario en memoria y en disco."""
+        self._cache.invalidate(telegram_id)
+        await run_db(delete_session, telegram_id)
+
+    async def flush(self):
+        """Espera a que terminen las escrituras pendientes (usar al apagar)."""
+        if self._writes:
+            await asyncio.gather(*list(self._writes), return_exceptions=True)
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats.update(loads=self.loads, saves=self.saves, pending_writes=len(self._writes))
+        return stats
+
+
+chat_sessions = ChatSessionStore()
@@ -0,0 +1,137 @@
+"""
+Ventana de conversación limitada por tokens con resumen acumulado.
+
+El historial que se envía al modelo ya no se corta por número de mensajes
+sino por un presupuesto estimado de tokens (CHAT_HISTORY_TOKEN_BUDGET).
+Los mensajes que no caben salen de la ventana y quedan pendientes de
+resumir; una tarea en segundo plano los funde con el resumen anterior en
+un texto corto que acompaña al prompt. El resumen se actualiza fuera del
+camino de la respuesta: un turno puede usar el resumen del turno anterior.
+
+El estado de cada usuario es un dict con las claves chat_history,
+chat_summary y chat_summary_pending (ver utils.chat_store).
+"""
+
+import asyncio
+import logging
+import os
+
+from utils.llm import chat_completion, messages_tokens
+from utils.llm_scheduler import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+SUMMARY_PROMPT = (
+    "Resume la conversación entre una persona y su acompañante emocional en "
+    "menos de 120 palabras, en el idioma de la conversación. Conserva lo que la "
+    "persona ha contado (hechos, personas, emociones, lo que le preocupa) y lo "
+    "que ya se le respondió. Integra el resumen previo si lo hay. Devuelve sólo "
+    "el resumen."
+)
+
+# Una sola actualización de resumen en curso por usuario
+_refresh_tasks = {}
+
+
+def trim_to_budget(history: list, budget: int = None) -> tuple:
+    """Separa el historial en (ventana, desbordados) según el presupuesto.
+
+    La ventana son los mensajes más recientes que caben en `budget`; el
+    último mensaje se conserva siempre aunque por sí solo lo supere.
+    """
+    budget = CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    used = 0
+    start = len(history)
+    while start > 0:
+        cost = messages_tokens(history[start - 1:start])
+        if used + cost > budget and start < len(history):
+            break
+        used += cost
+        start -= 1
+    return history[start:], history[:start]
+
+
+def compact_history(data: dict, budget: int = None) -> int:
+    """Saca del historial lo que no cabe y lo deja pendiente de resumir.
+
+    Returns:
+        int: número de mensajes movidos a chat_summary_pending.
+    """
+    window, overflow = trim_to_budget(data.get("chat_history", []), budget)
+    if overflow:
+        data["chat_history"] = window
+        data.setdefault("chat_summary_pending", []).extend(overflow)
+    return len(overflow)
+
+
+def build_messages(system_prompt: str, data: dict) -> list:
+    """Prompt completo: sistema, resumen (si hay) y ventana de historial."""
+    messages = [{"role": "system", "content": system_prompt}]
+    summary = data.get("chat_summary")
+    if summary:
+        messages.append({"role": "system", "content": f"Resumen de la conversación anterior: {summary}"})
+    return messages + data.get("chat_history", [])
+
+
+async def summarize(previous: str, messages: list) -> str:
+    """Funde `messages` con el resumen previo en un resumen nuevo."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    if previous:
+        transcript = f"Resumen previo: {previous}\n\n{transcript}"
+    return await chat_completion(
+        priority=BACKGROUND,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ],
+        model=CHAT_SUMMARY_MODEL,
+        max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        temperature=0.3,
+    )
+
+
+async def refresh_summary(data: dict, on_update=None):
+    """Resume los mensajes pendientes hasta vaciarlos.
+
+    Si el modelo falla, los mensajes vuelven a la cola y se reintentarán
+    en la próxima actualización. `on_update()` se llama tras cada resumen
+    nuevo (p. ej. para persistir la sesión).
+    """
+    while data.get("chat_summary_pending"):
+        pending = data["chat_summary_pending"]
+        data["chat_summary_pending"] = []
+        try:
+            summary = await summarize(data.get("chat_summary", ""), pending)
+        except Exception as e:
+            logger.warning("No se pudo actualizar el resumen de la conversación: %s", e)
+            data["chat_summary_pending"] = pending + data.get("chat_summary_pending", [])
+            return
+        if summary:
+            data["chat_summary"] = summary
+        if on_update is not None:
+            on_update()
+
+
+def schedule_summary_refresh(application, key, data: dict, on_update=None):
+    """Lanza refresh_summary en segundo plano si no hay otra en curso para `key`."""
+    if not data.get("chat_summary_pending"):
+        return
+    task = _refresh_tasks.get(key)
+    if task is not None and not task.done():
+        # La tarea en curso recogerá los nuevos pendientes antes de terminar
+        return
+    coro = refresh_summary(data, on_update)
+    task = application.create_task(coro) if application is not None else asyncio.create_task(coro)
+    _refresh_tasks[key] = task
+    task.add_done_callback(lambda t: _refresh_tasks.pop(key, None) if _refresh_tasks.get(key) is t else None)
+
+
+def cancel_summary_refresh(key):
+    """Cancela la actualización en curso (p. ej. al borrar el historial)."""
+    task = _refresh_tasks.pop(key, None)
+    if task is not None:
+        task.cancel()
@@ -2,8 +2,10 @@ import os
 import sqlite3
 from datetime import datetime, date
 
-# Path de la base de datos
-DB_PATH = os.getenv("DB_PATH") or "bot_data.sqlite"
+from utils.audit import audit_log
+from utils.cache import TTLCache
+from utils.db import get_connection, run_db, transaction
+from utils.migrations import run_migrations
 
 # Tiers de suscripción
 SUBSCRIPTION_TIERS = {
@@ -39,145 +41,162 @@ SUBSCRIPTION_TIERS = {
 
 
 def init_db():
-    """Crea las tablas necesarias si no existen."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                telegram_id INTEGER PRIMARY KEY,
-                credits INTEGER NOT NULL DEFAULT 0,
-                is_admin INTEGER NOT NULL DEFAULT 0,
-                created_at TEXT NOT NULL,
-                last_daily_bonus TEXT,
-                subscription_tier TEXT NOT NULL DEFAULT 'free',
-                stripe_customer_id TEXT,
-                stripe_subscription_id TEXT,
-                subscription_expires_at TEXT
-            )
-            """
-        )
-        # Agregar columnas si no existen (para usuarios existentes)
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN last_daily_bonus TEXT")
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN subscription_tier TEXT NOT NULL DEFAULT 'free'")
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN stripe_customer_id TEXT")
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN stripe_subscription_id TEXT")
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN subscription_expires_at TEXT")
-        except sqlite3.OperationalError:
-            pass
-        
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER NOT NULL,
-                kind TEXT NOT NULL,
-                amount INTEGER NOT NULL,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY(telegram_id) REFERENCES users(telegram_id)
-            )
-            """
-        )
-        conn.commit()
+    """Crea o actualiza el esquema aplicando las migraciones pendientes."""
+    run_migrations()
+
+
+DAILY_BONUS = 45
+
+# Caché de estado por usuario (créditos, tier, expiración, último bonus).
+# Toda función que modifica esas columnas actualiza o invalida su entrada.
+# Los cambios hechos desde otro proceso (webhook_server) se ven, como mucho,
+# USER_CACHE_TTL segundos más tarde; por eso los cobros y /batch leen el plan
+# directamente de la DB.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+USER_STATE_COLUMNS = "credits, subscription_tier, subscription_expires_at, last_daily_bonus"
+
+
+def _row_to_state(row) -> dict:
+    return {
+        "credits": row[0],
+        "tier": row[1] or "free",
+        "expires_at": row[2],
+        # Se parsea una vez al cargar la entrada, no en cada lectura
+        "expires_dt": datetime.fromisoformat(row[2]) if row[2] else None,
+        "last_daily_bonus": row[3],
+    }
+
+
+def _select_user_state(telegram_id: int):
+    row = get_connection().execute(
+        f"SELECT {USER_STATE_COLUMNS} FROM users WHERE telegram_id = ?", (telegram_id,)
+    ).fetchone()
+    return _row_to_state(row) if row else None
+
+
+def get_user_state(telegram_id: int, create: bool = False, fresh: bool = False):
+    """Devuelve el estado cacheado del usuario, leyendo la DB sólo si no está en caché.
+
+    Con `create=True` el usuario se da de alta si no existe; si no, devuelve
+    None para usuarios desconocidos. Con `fresh=True` se lee siempre la DB
+    (y se refresca la caché).
+    """
+    state = None if fresh else _user_cache.get(telegram_id)
+    if state is not None:
+        return state
+    state = _select_user_state(telegram_id)
+    if state is None and create:
+        _ensure_user(telegram_id)
+        state = _select_user_state(telegram_id)
+    if state is not None:
+        _user_cache.set(telegram_id, state)
+    return state
+
+
+def invalidate_user_cache(telegram_id: int = None):
+    """Descarta la entrada cacheada de un usuario (o toda la caché si no se indica)."""
+    if telegram_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.invalidate(telegram_id)
+
+
+def cache_stats() -> dict:
+    """Contadores de aciertos/fallos de la caché de usuarios."""
+    return _user_cache.stats()
 
 
 def _ensure_user(telegram_id: int):
-    """Crea un usuario en la DB si no existe con 100 créditos iniciales."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT telegram_id FROM users WHERE telegram_id = ?", (telegram_id,))
-        if not cur.fetchone():
-            cur.execute(
-                "INSERT INTO users(telegram_id, credits, is_admin, created_at) VALUES(?,?,?,?)",
-                (telegram_id, 100, 0, datetime.utcnow().isoformat()),
-            )
-            conn.commit()
+    """Crea un usuario en la DB si no existe con 100 créditos iniciales (upsert atómico)."""
+    get_connection().execute(
+        "INSERT INTO users(telegram_id, credits, is_admin, created_at) VALUES(?,?,?,?) "
+        "ON CONFLICT(telegram_id) DO NOTHING",
+        (telegram_id, 100, 0, datetime.utcnow().isoformat()),
+    )
+
+
+def _log_transaction(conn: sqlite3.Connection, telegram_id: int, kind: str, amount: int):
+    """Registra un movimiento en la tabla transactions (ver utils.audit).
+
+    Debe ser la última sentencia de la transacción del llamador: en modo
+    grouped la fila se encola y ya no se deshace con un ROLLBACK.
+    """
+    audit_log.record(conn, (telegram_id, kind, amount, datetime.utcnow().isoformat()))
 
 
 def get_credits(telegram_id: int) -> int:
     """Obtiene el saldo de créditos de un usuario."""
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT credits FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cur.fetchone()
-        return row[0] if row else 0
+    state = get_user_state(telegram_id)
+    return state["credits"] if state else 0
 
 
-def add_credits(telegram_id: int, amount: int, kind: str = "manual"):
-    """Añade créditos a un usuario y registra la transacción."""
-    _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET credits = credits + ? WHERE telegram_id = ?", (amount, telegram_id))
-        cur.execute(
-            "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
-            (telegram_id, kind, amount, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
+def add_credits(telegram_id: int, amount: int, kind: str = "manual") -> int:
+    """Añade créditos a un usuario, registra la transacción y devuelve el nuevo saldo."""
+    with transaction() as conn:
+        _ensure_user(telegram_id)
+        row = conn.execute(
+            f"UPDATE users SET credits = credits + ? WHERE telegram_id = ? RETURNING {USER_STATE_COLUMNS}",
+            (amount, telegram_id),
+        ).fetchone()
+        _log_transaction(conn, telegram_id, kind, amount)
+    state = _row_to_state(row)
+    _user_cache.set(telegram_id, state)
+    return state["credits"]
+
+
+def try_consume_credits(telegram_id: int, amount: int) -> tuple:
+    """Debita créditos de forma atómica.
+
+    El débito condicional y el nuevo saldo salen de la misma sentencia
+    (UPDATE ... WHERE credits >= ? RETURNING credits), así que dos llamadas
+    concurrentes nunca pueden dejar el saldo en negativo.
+
+    Returns:
+        tuple: (True, saldo_nuevo) si se debitó, (False, saldo_actual) si no alcanzaba.
+    """
+    with transaction() as conn:
+        _ensure_user(telegram_id)
+        row = conn.execute(
+            "UPDATE users SET credits = credits - ? WHERE telegram_id = ? AND credits >= ? "
+            f"RETURNING {USER_STATE_COLUMNS}",
+            (amount, telegram_id, amount),
+        ).fetchone()
+        if row is None:
+            state = _select_user_state(telegram_id)
+        else:
+            _log_transaction(conn, telegram_id, "consume", -amount)
+            state = _row_to_state(row)
+    _user_cache.set(telegram_id, state)
+    return row is not None, state["credits"]
 
 
 def consume_credits(telegram_id: int, amount: int) -> bool:
     """Intenta consumir créditos. Devuelve True si tuvo suficientes, False si no."""
-    _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT credits FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cur.fetchone()
-        credits = row[0] if row else 0
-        
-        if credits < amount:
-            return False
-        
-        cur.execute("UPDATE users SET credits = credits - ? WHERE telegram_id = ?", (amount, telegram_id))
-        cur.execute(
-            "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
-            (telegram_id, "consume", -amount, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
-        return True
+    ok, _ = try_consume_credits(telegram_id, amount)
+    return ok
 
 
 def claim_daily_bonus(telegram_id: int) -> bool:
     """Intenta reclamar el bonus diario de 45 créditos. Devuelve True si se otorgó, False si ya lo reclamó hoy."""
-    _ensure_user(telegram_id)
     today = date.today().isoformat()
     
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT last_daily_bonus FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cur.fetchone()
-        last_bonus_date = row[0] if row else None
-        
-        # Si ya reclamó hoy, no otorgar bonus
-        if last_bonus_date == today:
+    with transaction() as conn:
+        _ensure_user(telegram_id)
+        # Un solo UPDATE condicional: otorga el bonus y marca el día a la vez
+        row = conn.execute(
+            "UPDATE users SET credits = credits + ?, last_daily_bonus = ? "
+            "WHERE telegram_id = ? AND (last_daily_bonus IS NULL OR last_daily_bonus != ?) "
+            f"RETURNING {USER_STATE_COLUMNS}",
+            (DAILY_BONUS, today, telegram_id, today),
+        ).fetchone()
+        if row is None:
             return False
-        
-        # Otorgar 45 créditos
-        cur.execute("UPDATE users SET credits = credits + 45 WHERE telegram_id = ?", (telegram_id,))
-        cur.execute("UPDATE users SET last_daily_bonus = ? WHERE telegram_id = ?", (today, telegram_id))
-        cur.execute(
-            "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
-            (telegram_id, "daily_bonus", 45, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
-        return True
+        _log_transaction(conn, telegram_id, "daily_bonus", DAILY_BONUS)
+    _user_cache.set(telegram_id, _row_to_state(row))
+    return True
 
 
 def is_admin(telegram_id: int, admin_ids: set) -> bool:
@@ -186,23 +205,51 @@ def is_admin(telegram_id: int, admin_ids: set) -> bool:
 
 
 # NUEVAS FUNCIONES PARA SUSCRIPCIÓN
-def get_user_subscription(telegram_id: int) -> dict:
-    """Obtiene la suscripción actual del usuario."""
-    _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT subscription_tier, subscription_expires_at FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cur.fetchone()
-        if row:
-            tier, expires = row
-            # Verificar si la suscripción expiró
-            if expires:
-                if datetime.fromisoformat(expires) < datetime.utcnow():
-                    # Renovar a free
-                    set_user_subscription(telegram_id, "free")
-                    return {"tier": "free", "info": SUBSCRIPTION_TIERS["free"]}
-            return {"tier": tier or "free", "info": SUBSCRIPTION_TIERS.get(tier or "free", SUBSCRIPTION_TIERS["free"])}
-        return {"tier": "free", "info": SUBSCRIPTION_TIERS["free"]}
+def get_user_subscription(telegram_id: int, fresh: bool = False) -> dict:
+    """Obtiene la suscripción actual del usuario.
+
+    Es una lectura pura: una suscripción vencida se informa como "free" y
+    expire_subscriptions() (tarea periódica) la baja en la DB. Con
+    `fresh=True` no se usa la caché (ver get_user_state).
+    """
+    return _subscription(get_user_state(telegram_id, create=True, fresh=fresh))
+
+
+def _subscription(state: dict) -> dict:
+    tier, expires = state["tier"], state["expires_dt"]
+    if expires and expires < datetime.utcnow():
+        tier = "free"
+    return {"tier": tier, "info": SUBSCRIPTION_TIERS.get(tier, SUBSCRIPTION_TIERS["free"])}
+
+
+def expire_subscriptions(now: datetime = None) -> list:
+    """Pasa a "free" todas las suscripciones vencidas con un único UPDATE indexado.
+
+    Returns:
+        list: telegram_id de los usuarios que bajaron a free (los que tenían
+        un plan de pago).
+    """
+    now = now or datetime.utcnow()
+    with transaction() as conn:
+        paid = {
+            row[0] for row in conn.execute(
+                "SELECT telegram_id FROM users WHERE subscription_expires_at < ? AND subscription_tier != 'free'",
+                (now.isoformat(),),
+            )
+        }
+        rows = conn.execute(
+            "UPDATE users SET subscription_tier = 'free', subscription_expires_at = NULL "
+            f"WHERE subscription_expires_at < ? RETURNING telegram_id, {USER_STATE_COLUMNS}",
+            (now.isoformat(),),
+        ).fetchall()
+        for row in rows:
+            _log_transaction(conn, row[0], "subscription_free", 0)
+    downgraded = []
+    for row in rows:
+        _user_cache.set(row[0], _row_to_state(row[1:]))
+        if row[0] in paid:
+            downgraded.append(row[0])
+    return downgraded
 
 
 def set_user_subscription(telegram_id: int, tier: str, expires_at: str = None):
@@ -210,54 +257,220 @@ def set_user_subscription(telegram_id: int, tier: str, expires_at: str = None):
     if tier not in SUBSCRIPTION_TIERS:
         tier = "free"
     
-    _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "UPDATE users SET subscription_tier = ?, subscription_expires_at = ? WHERE telegram_id = ?",
+    with transaction() as conn:
+        _ensure_user(telegram_id)
+        row = conn.execute(
+            "UPDATE users SET subscription_tier = ?, subscription_expires_at = ? WHERE telegram_id = ? "
+            f"RETURNING {USER_STATE_COLUMNS}",
             (tier, expires_at, telegram_id)
-        )
-        cur.execute(
-            "INSERT INTO transactions(telegram_id, kind, amount, created_at) VALUES(?,?,?,?)",
-            (telegram_id, f"subscription_{tier}", 0, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
+        ).fetchone()
+        _log_transaction(conn, telegram_id, f"subscription_{tier}", 0)
+    _user_cache.set(telegram_id, _row_to_state(row))
 
 
 def set_stripe_customer(telegram_id: int, stripe_customer_id: str, stripe_subscription_id: str = None):
     """Asigna IDs de Stripe al usuario."""
-    _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute(
+    with transaction() as conn:
+        _ensure_user(telegram_id)
+        conn.execute(
             "UPDATE users SET stripe_customer_id = ?, stripe_subscription_id = ? WHERE telegram_id = ?",
             (stripe_customer_id, stripe_subscription_id, telegram_id)
         )
-        conn.commit()
 
 
 def get_stripe_customer_id(telegram_id: int) -> str:
     """Obtiene el stripe_customer_id de un usuario."""
     _ensure_user(telegram_id)
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT stripe_customer_id FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cur.fetchone()
-        return row[0] if row and row[0] else None
+    cur = get_connection().execute("SELECT stripe_customer_id FROM users WHERE telegram_id = ?", (telegram_id,))
+    row = cur.fetchone()
+    return row[0] if row and row[0] else None
+
+
+# CUOTAS POR PLAN
+# usage_counters guarda, por usuario, el uso de la ventana actual de día y de
+# mes. Comprobar e incrementar es un único upsert condicional: nunca se
+# recorre transactions.
+class _ChargeRejected(Exception):
+    pass
 
 
-def check_usage_limit(telegram_id: int, operation_cost: int = 1) -> dict:
-    """Verifica si el usuario puede hacer una operación según su tier y límite diario."""
+def _usage_windows(now: datetime = None) -> tuple:
+    now = now or datetime.utcnow()
+    return now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+
+
+def get_usage(telegram_id: int) -> dict:
+    """Uso de la ventana actual (día y mes) y límites del plan del usuario."""
+    day, month = _usage_windows()
+    row = get_connection().execute(
+        "SELECT CASE WHEN day = ? THEN day_count ELSE 0 END, "
+        "CASE WHEN month = ? THEN month_count ELSE 0 END "
+        "FROM usage_counters WHERE telegram_id = ?",
+        (day, month, telegram_id),
+    ).fetchone()
+    day_used, month_used = row if row else (0, 0)
     sub = get_user_subscription(telegram_id)
-    tier_info = sub["info"]
-    
-    # Por ahora usamos créditos, pero aquí puedes agregar lógica de límites diarios
-    credits = get_credits(telegram_id)
-    
+    daily_limit = sub["info"].get("daily_limit", 5)
+    monthly_limit = sub["info"].get("monthly_limit", 50)
     return {
-        "allowed": credits >= operation_cost,
-        "credits": credits,
         "tier": sub["tier"],
-        "daily_limit": tier_info.get("daily_limit", 5),
-        "monthly_limit": tier_info.get("monthly_limit", 50)
+        "daily_used": day_used,
+        "monthly_used": month_used,
+        "daily_limit": daily_limit,
+        "monthly_limit": monthly_limit,
+        "daily_remaining": max(daily_limit - day_used, 0),
+        "monthly_remaining": max(monthly_limit - month_used, 0),
+    }
+
+
+def try_charge_usage(telegram_id: int, units: int, cost: int, kind: str = "consume") -> dict:
+    """Cobra `cost` créditos y suma `units` a las cuotas de día/mes, todo o nada.
+
+    Los límites salen del plan que devuelve el propio UPDATE, no de la caché:
+    un cambio de plan hecho por el webhook de Stripe cuenta desde ya.
+
+    Returns:
+        dict: resultado de get_usage() más "ok", "balance" y "reason"
+        (None, "credits" o "quota") cuando no se pudo cobrar.
+    """
+    day, month = _usage_windows()
+    reason = None
+    try:
+        with transaction() as conn:
+            _ensure_user(telegram_id)
+            row = conn.execute(
+                "UPDATE users SET credits = credits - ? WHERE telegram_id = ? AND credits >= ? "
+                f"RETURNING {USER_STATE_COLUMNS}",
+                (cost, telegram_id, cost),
+            ).fetchone()
+            if row is None:
+                reason = "credits"
+                raise _ChargeRejected()
+            sub = _subscription(_row_to_state(row))
+            daily_limit = sub["info"].get("daily_limit", 5)
+            monthly_limit = sub["info"].get("monthly_limit", 50)
+            counted = None
+            if units <= daily_limit and units <= monthly_limit:
+                counted = conn.execute(
+                    """
+                    INSERT INTO usage_counters(telegram_id, day, day_count, month, month_count)
+                    VALUES(?, ?, ?, ?, ?)
+                    ON CONFLICT(telegram_id) DO UPDATE SET
+                        day_count = CASE WHEN day = excluded.day THEN day_count ELSE 0 END + excluded.day_count,
+                        month_count = CASE WHEN month = excluded.month THEN month_count ELSE 0 END
+                                      + excluded.month_count,
+                        day = excluded.day,
+                        month = excluded.month
+                    WHERE CASE WHEN day = excluded.day THEN day_count ELSE 0 END + excluded.day_count <= ?
+                      AND CASE WHEN month = excluded.month THEN month_count ELSE 0 END
+                          + excluded.month_count <= ?
+                    RETURNING day_count, month_count
+                    """,
+                    (telegram_id, day, units, month, units, daily_limit, monthly_limit),
+                ).fetchone()
+            if counted is None:
+                reason = "quota"
+                raise _ChargeRejected()
+            _log_transaction(conn, telegram_id, kind, -cost)
+    except _ChargeRejected:
+        # El ROLLBACK deshizo el débito; se relee el estado para informar
+        # saldo y plan actuales aunque la caché estuviera desfasada
+        get_user_state(telegram_id, fresh=True)
+        usage = get_usage(telegram_id)
+        usage.update({"ok": False, "reason": reason, "balance": get_credits(telegram_id)})
+        return usage
+
+    state = _row_to_state(row)
+    _user_cache.set(telegram_id, state)
+    return {
+        "ok": True,
+        "reason": None,
+        "balance": state["credits"],
+        "tier": sub["tier"],
+        "daily_used": counted[0],
+        "monthly_used": counted[1],
+        "daily_limit": daily_limit,
+        "monthly_limit": monthly_limit,
+        "daily_remaining": max(daily_limit - counted[0], 0),
+        "monthly_remaining": max(monthly_limit - counted[1], 0),
     }
+
+
+def refund_usage(telegram_id: int, units: int, cost: int, kind: str = "refund") -> int:
+    """Devuelve créditos y cuota de una operación fallida. Devuelve el nuevo saldo."""
+    day, month = _usage_windows()
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE usage_counters SET "
+            "day_count = CASE WHEN day = ? THEN MAX(day_count - ?, 0) ELSE day_count END, "
+            "month_count = CASE WHEN month = ? THEN MAX(month_count - ?, 0) ELSE month_count END "
+            "WHERE telegram_id = ?",
+            (day, units, month, units, telegram_id),
+        )
+        return add_credits(telegram_id, cost, kind=kind)
+
+
+def check_usage_limit(telegram_id: int, operation_cost: int = 1, units: int = 1) -> dict:
+    """Verifica si el usuario puede hacer una operación según sus créditos y las cuotas de su plan.
+
+    Sólo lee: para cobrar de forma atómica usar try_charge_usage().
+    """
+    usage = get_usage(telegram_id)
+    credits = get_credits(telegram_id)
+    
+    usage.update({
+        "allowed": (
+            credits >= operation_cost
+            and usage["daily_remaining"] >= units
+            and usage["monthly_remaining"] >= units
+        ),
+        "credits": credits,
+    })
+    return usage
+
+
+# API ASÍNCRONA
+# Para usar desde handlers async: cada llamada se ejecuta en el hilo dedicado
+# de la DB (utils.db.run_db) y nunca bloquea el event loop del bot.
+async def aget_credits(telegram_id: int) -> int:
+    return await run_db(get_credits, telegram_id)
+
+
+async def aadd_credits(telegram_id: int, amount: int, kind: str = "manual") -> int:
+    return await run_db(add_credits, telegram_id, amount, kind)
+
+
+async def aconsume_credits(telegram_id: int, amount: int) -> bool:
+    return await run_db(consume_credits, telegram_id, amount)
+
+
+async def atry_consume_credits(telegram_id: int, amount: int) -> tuple:
+    return await run_db(try_consume_credits, telegram_id, amount)
+
+
+async def aclaim_daily_bonus(telegram_id: int) -> bool:
+    return await run_db(claim_daily_bonus, telegram_id)
+
+
+async def aget_user_subscription(telegram_id: int, fresh: bool = False) -> dict:
+    return await run_db(get_user_subscription, telegram_id, fresh)
+
+
+async def aset_user_subscription(telegram_id: int, tier: str, expires_at: str = None):
+    return await run_db(set_user_subscription, telegram_id, tier, expires_at)
+
+
+async def aexpire_subscriptions() -> list:
+    return await run_db(expire_subscriptions)
+
+
+async def acheck_usage_limit(telegram_id: int, operation_cost: int = 1, units: int = 1) -> dict:
+    return await run_db(check_usage_limit, telegram_id, operation_cost, units)
+
+
+async def atry_charge_usage(telegram_id: int, units: int, cost: int, kind: str = "consume") -> dict:
+    return await run_db(try_charge_usage, telegram_id, units, cost, kind)
+
+
+async def arefund_usage(telegram_id: int, units: int, cost: int, kind: str = "refund") -> int:
+    return await run_db(refund_usage, telegram_id, units, cost, kind)
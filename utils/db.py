@@ -0,0 +1,139 @@
+"""
+Capa de conexiones SQLite compartida.
+
+Mantiene una conexión persistente por hilo (y por ruta de base de datos) en
+modo WAL, con pragmas ajustados y caché de sentencias preparadas, en lugar
+de abrir una conexión nueva en cada llamada. Sólo el threading.local del
+hilo guarda sus conexiones: cuando el hilo termina (p. ej. los hilos por
+petición del servidor de webhooks) se liberan y se cierran solas.
+"""
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Path de la base de datos
+DB_PATH = os.getenv("DB_PATH") or "bot_data.sqlite"
+
+# Ajustes de rendimiento (configurables por entorno)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+_local = threading.local()
+
+
+class _ThreadConnections(dict):
+    """Conexiones de un hilo (ruta -> conexión); se cierran al terminar el hilo."""
+
+    def __del__(self):
+        for conn in self.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """Abre una conexión nueva y aplica los pragmas de rendimiento."""
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # Transacciones explícitas con transaction()
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection(path: str = None) -> sqlite3.Connection:
+    """Devuelve la conexión persistente del hilo actual para `path`.
+
+    Cada hilo reutiliza siempre la misma conexión; sqlite3 no permite
+    compartir una conexión entre hilos sin sincronización externa.
+    """
+    path = path or DB_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = _ThreadConnections()
+    conn = conns.get(path)
+    if conn is None:
+        conn = _open_connection(path)
+        conns[path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(path: str = None):
+    """Abre una transacción de escritura (BEGIN IMMEDIATE) en la conexión del hilo.
+
+    Si ya hay una transacción abierta en esta conexión, se reutiliza y el
+    commit queda a cargo del bloque exterior.
+    """
+    conn = get_connection(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def close_all():
+    """Cierra las conexiones del hilo actual (usar al apagar el proceso).
+
+    sqlite3 no deja cerrar una conexión desde otro hilo; las de los demás
+    hilos se cierran cuando termina su hilo.
+    """
+    conns = getattr(_local, "conns", None) or {}
+    _local.conns = _ThreadConnections()
+    for conn in conns.values():
+        conn.close()
+
+
+# EJECUTOR DEDICADO PARA EL EVENT LOOP
+# Un único hilo con su cola de peticiones: los handlers async nunca tocan
+# SQLite directamente y todas las escrituras quedan serializadas.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Devuelve (creándolo si hace falta) el ejecutor de un solo hilo para la DB."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    return _executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """Ejecuta `fn(*args, **kwargs)` en el hilo de la DB sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_db_executor():
+    """Espera a que terminen las peticiones pendientes y detiene el hilo de la DB."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.submit(close_all).result()
+        executor.shutdown(wait=True)
@@ -0,0 +1,165 @@
+"""
+Detección de dolor emocional en los mensajes del usuario.
+
+Una lista de frases por idioma, con peso, compiladas al importar en una
+única expresión regular (un trie de frases). Se buscan siempre las frases
+de todos los idiomas: el idioma de la interfaz de Telegram no dice en qué
+idioma escribe el usuario. La búsqueda ignora
+mayúsculas y tildes ("depresión" == "depresion") y admite cualquier
+espacio o guion entre palabras. Las frases sólo coinciden como palabras
+completas, así que "muerte" no salta dentro de palabras más largas.
+
+Un mensaje se considera con dolor emocional cuando la suma de los pesos de
+las frases distintas encontradas llega a PAIN_THRESHOLD. Las frases de
+riesgo (suicidio, autolesión) pesan CRISIS_WEIGHT y bastan por sí solas;
+las ambiguas ("no puedo", "miedo") pesan menos y necesitan otra señal.
+"""
+
+import re
+import unicodedata
+
+PAIN_THRESHOLD = 1.0
+CRISIS_WEIGHT = 3.0
+
+# idioma -> {frase: peso}
+PAIN_PHRASES = {
+    "es": {
+        # Riesgo
+        "suicidio": CRISIS_WEIGHT, "suicidarme": CRISIS_WEIGHT, "suicidarse": CRISIS_WEIGHT,
+        "quiero morir": CRISIS_WEIGHT, "quiero morirme": CRISIS_WEIGHT, "me quiero morir": CRISIS_WEIGHT,
+        "no quiero vivir": CRISIS_WEIGHT, "quitarme la vida": CRISIS_WEIGHT,
+        "autolesion": CRISIS_WEIGHT, "autolesionarme": CRISIS_WEIGHT, "automutilacion": CRISIS_WEIGHT,
+        "hacerme dano": CRISIS_WEIGHT, "cortarme": CRISIS_WEIGHT,
+        # Dolor emocional
+        "depresion": 1.0, "deprimido": 1.0, "deprimida": 1.0, "tristeza": 1.0, "triste": 1.0,
+        "muerte": 1.0, "no aguanto": 1.0, "no aguanto mas": 1.0, "soledad": 1.0,
+        "me siento solo": 1.0, "me siento sola": 1.0, "estoy solo": 1.0, "estoy sola": 1.0,
+        "ansiedad": 1.0, "panico": 1.0, "fobia": 1.0, "trauma": 1.0, "abuso": 1.0, "maltrato": 1.0,
+        "duelo": 1.0, "abandono": 1.0, "humillacion": 1.0, "verguenza": 1.0,
+        "fracaso": 1.0, "inutil": 1.0, "sin sentido": 1.0, "desesperado": 1.0, "desesperada": 1.0,
+        "acosado": 1.0, "acosada": 1.0, "bullying": 1.0, "trastorno": 1.0,
+        "bipolar": 1.0, "esquizofrenia": 1.0,
+        # Ambiguas: necesitan otra señal
+        "no puedo": 0.5, "miedo": 0.5, "culpa": 0.5, "rechazo": 0.5, "perdida": 0.5, "vacio": 0.5,
+    },
+    "en": {
+        "suicide": CRISIS_WEIGHT, "kill myself": CRISIS_WEIGHT, "want to die": CRISIS_WEIGHT,
+        "end my life": CRISIS_WEIGHT, "self harm": CRISIS_WEIGHT, "hurt myself": CRISIS_WEIGHT,
+        "cut myself": CRISIS_WEIGHT,
+        "depression": 1.0, "depressed": 1.0, "sadness": 1.0, "sad": 1.0, "lonely": 1.0,
+        "loneliness": 1.0, "anxiety": 1.0, "panic": 1.0, "trauma": 1.0, "abuse": 1.0, "abused": 1.0,
+        "grief": 1.0, "hopeless": 1.0, "worthless": 1.0, "bullied": 1.0, "can't take it": 1.0,
+        "cant take it": 1.0,
+        "afraid": 0.5, "scared": 0.5, "guilt": 0.5, "empty": 0.5, "rejected": 0.5,
+    },
+    "ru": {
+        "суицид": CRISIS_WEIGHT, "покончить с собой": CRISIS_WEIGHT, "хочу умереть": CRISIS_WEIGHT,
+        "не хочу жить": CRISIS_WEIGHT, "навредить себе": CRISIS_WEIGHT,
+        "депрессия": 1.0, "тоска": 1.0, "грусть": 1.0, "одиночество": 1.0, "одиноко": 1.0,
+        "тревога": 1.0, "паника": 1.0, "травма": 1.0, "насилие": 1.0, "безнадежно": 1.0,
+        "страх": 0.5, "вина": 0.5, "пустота": 0.5,
+    },
+}
+
+def _fold(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes ni diacríticos y con espacios y guiones colapsados."""
+    return " ".join(_fold(text.casefold()).replace("-", " ").split())
+
+
+def _build_accent_classes() -> dict:
+    """letra base -> clase regex con todas sus variantes acentuadas en minúscula.
+
+    Las tildes se resuelven en el patrón y no en el texto: así el mensaje
+    sólo se pasa a minúsculas antes de buscar, sin recorrerlo carácter a
+    carácter en Python.
+    """
+    variants = {}
+    # Latín-1 (español y demás idiomas de Europa occidental) más й/ё rusas
+    for char in [chr(code) for code in range(0x00C0, 0x0100)] + ["й", "ё"]:
+        if char != char.casefold():
+            continue
+        base = _fold(char)
+        if base != char and len(base) == 1:
+            variants.setdefault(base, [base]).append(char)
+    return {base: "[" + "".join(chars) + "]" for base, chars in variants.items()}
+
+
+_ACCENT_CLASSES = _build_accent_classes()
+
+
+def _char_pattern(char: str) -> str:
+    if char == " ":
+        return r"[\s-]+"
+    return _ACCENT_CLASSES.get(char) or re.escape(char)
+
+
+def _trie_regex(phrases) -> str:
+    """Alternativa única en forma de trie: en cada posición del texto el
+    motor sólo compara el carácter siguiente, no todas las frases."""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node) -> str:
+        optional = "" in node
+        branches = [_char_pattern(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            body = "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+def _compile(phrases: dict) -> tuple:
+    weights = {normalize(p): w for p, w in phrases.items()}
+    # El trie es codicioso: "no aguanto mas" gana a "no aguanto"
+    return re.compile(rf"\b(?:{_trie_regex(weights)})\b"), weights
+
+
+_PATTERN, _WEIGHTS = _compile({p: w for phrases in PAIN_PHRASES.values() for p, w in phrases.items()})
+
+
+def _prepare(text: str) -> str:
+    text = text.casefold()
+    # Texto con tildes descompuestas (letra + diacrítico): recomponer
+    if not text.isascii() and not unicodedata.is_normalized("NFC", text):
+        text = unicodedata.normalize("NFC", text)
+    return text
+
+
+def emotional_pain_score(text: str, lang: str = None) -> float:
+    """Suma de los pesos de las frases distintas encontradas en el texto."""
+    found = {normalize(p) for p in _PATTERN.findall(_prepare(text))}
+    return sum(_WEIGHTS[p] for p in found)
+
+
+def detect_emotional_pain(text: str, lang: str = None) -> bool:
+    """Detecta si el usuario expresa dolor emocional profundo.
+
+    Args:
+        text: Mensaje del usuario
+        lang: Código de idioma de Telegram ("es", "en-US"...). No se usa:
+            un usuario con Telegram en inglés puede escribir en español, así
+            que se buscan las frases de todos los idiomas.
+    """
+    score = 0.0
+    seen = set()
+    for match in _PATTERN.finditer(_prepare(text)):
+        phrase = normalize(match.group(0))
+        if phrase in seen:
+            continue
+        seen.add(phrase)
+        score += _WEIGHTS[phrase]
+        if score >= PAIN_THRESHOLD:
+            return True
+    return False
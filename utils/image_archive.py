@@ -0,0 +1,275 @@
+"""
+Archivo acotado de las imágenes generadas.
+
+Cada imagen se guarda fuera del event loop en IMAGE_OUTPUT_DIR, repartida
+en subcarpetas por hash (ab/cd/<uuid>.png) y con nombres que no chocan
+aunque un usuario genere dos imágenes en el mismo segundo. La tabla
+image_archive indexa cada archivo (usuario, hash del contenido, tamaño,
+prompt), así que las imágenes de un usuario se buscan sin listar carpetas.
+Si el usuario ya tiene archivada una imagen con el mismo contenido (p. ej.
+un acierto de la caché de imágenes), no se escribe otra copia.
+
+Una tarea de fondo aplica el presupuesto:
+  - borra las imágenes con más de IMAGE_ARCHIVE_MAX_DAYS días;
+  - si el total pasa de IMAGE_ARCHIVE_MAX_MB, borra las más antiguas.
+Se ejecuta cada IMAGE_ARCHIVE_EVICT_INTERVAL segundos, y antes si las
+escrituras superan el presupuesto.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from utils.db import get_connection, run_db, transaction
+
+logger = logging.getLogger(__name__)
+
+IMAGE_OUTPUT_DIR = os.getenv("IMAGE_OUTPUT_DIR", "imagenes_generadas")
+IMAGE_ARCHIVE_MAX_MB = float(os.getenv("IMAGE_ARCHIVE_MAX_MB", "2048"))
+IMAGE_ARCHIVE_MAX_DAYS = float(os.getenv("IMAGE_ARCHIVE_MAX_DAYS", "30"))
+IMAGE_ARCHIVE_EVICT_INTERVAL = float(os.getenv("IMAGE_ARCHIVE_EVICT_INTERVAL", "3600"))
+
+# Filas que se borran por transacción al expulsar
+_EVICT_BATCH = 500
+
+
+def archive_path(name: str) -> str:
+    """Ruta relativa, repartida en dos niveles de subcarpetas por hash."""
+    return os.path.join(name[:2], name[2:4], name + ".png")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_file(directory: str, relative_path: str, data: bytes):
+    path = os.path.join(directory, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def remove_files(directory: str, relative_paths: list):
+    for relative_path in relative_paths:
+        try:
+            os.remove(os.path.join(directory, relative_path))
+        except FileNotFoundError:
+            pass
+
+
+def insert_entry(telegram_id: int, path: str, digest: str, size: int, prompt: str, style: str):
+    get_connection().execute(
+        "INSERT INTO image_archive(telegram_id, path, content_hash, size, prompt, style, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (telegram_id, path, digest, size, prompt, style, datetime.utcnow().isoformat()),
+    )
+
+
+def find_user_image(telegram_id: int, digest: str):
+    """Ruta de una imagen del usuario con ese contenido, o None."""
+    row = get_connection().execute(
+        "SELECT path FROM image_archive WHERE telegram_id = ? AND content_hash = ? LIMIT 1",
+        (telegram_id, digest),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def list_user_images(telegram_id: int, limit: int = 20) -> list:
+    """Imágenes archivadas de un usuario, de la más reciente a la más antigua."""
+    rows = get_connection().execute(
+        "SELECT path, content_hash, size, prompt, style, created_at FROM image_archive "
+        "WHERE telegram_id = ? ORDER BY created_at DESC LIMIT ?",
+        (telegram_id, limit),
+    ).fetchall()
+    keys = ("path", "content_hash", "size", "prompt", "style", "created_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def evict_entries(max_bytes: int, max_age_days: float, now: datetime = None) -> tuple:
+    """Quita del índice lo caducado y, si sobra, lo más antiguo.
+
+    Returns:
+        tuple: (rutas a borrar del disco, tamaño total que queda).
+    """
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=max_age_days)).isoformat()
+    removed = []
+    with transaction() as conn:
+        rows = conn.execute("SELECT id, path FROM image_archive WHERE created_at < ?", (cutoff,)).fetchall()
+        conn.executemany("DELETE FROM image_archive WHERE id = ?", [(row[0],) for row in rows])
+        removed.extend(row[1] for row in rows)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM image_archive").fetchone()[0]
+    while total > max_bytes:
+        with transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, path, size FROM image_archive ORDER BY created_at LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for row_id, path, size in rows:
+                if total <= max_bytes:
+                    break
+                victims.append((row_id,))
+                removed.append(path)
+                total -= size
+            conn.executemany("DELETE FROM image_archive WHERE id = ?", victims)
+    return removed, total
+
+
+class ImageArchive:
+    """Escrituras del archivo fuera del event loop y expulsión en segundo plano."""
+
+    def __init__(self, directory: str = IMAGE_OUTPUT_DIR, max_bytes: int = int(IMAGE_ARCHIVE_MAX_MB * 1024 * 1024),
+                 max_age_days: float = IMAGE_ARCHIVE_MAX_DAYS, interval: float = IMAGE_ARCHIVE_EVICT_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.interval = interval
+        # Tamaño total estimado; None hasta la primera expulsión
+        self.bytes = None
+        self._writes = set()
+        # (usuario, hash) de las imágenes que se están archivando ahora
+        self._pending = set()
+        self._task = None
+        self._wakeup = None
+        self._evicting = None
+        self._evict_lock = asyncio.Lock()
+        self.saved = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self.failed = 0
+
+    def save(self, telegram_id: int, data: bytes, prompt: str = None, style: str = None) -> asyncio.Task:
+        """Programa el archivado de la imagen sin esperar.
+
+        Devuelve la tarea, que termina con la ruta relativa de la imagen (la
+        ya archivada si el usuario tenía el mismo contenido), o None si falló
+        o si esa misma imagen del usuario se estaba archivando en ese momento.
+        """
+        write = asyncio.ensure_future(self._save(telegram_id, data, prompt, style))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+        return write
+
+    async def _save(self, telegram_id, data, prompt, style):
+        try:
+            digest = await asyncio.to_thread(content_hash, data)
+        except Exception as e:
+            self.failed += 1
+            logger.error("No se pudo archivar la imagen: %s", e)
+            return None
+        key = (telegram_id, digest)
+        if key in self._pending:
+            # La misma imagen del mismo usuario ya se está archivando
+            self.duplicates += 1
+            return None
+        self._pending.add(key)
+        try:
+            return await self._store(telegram_id, digest, data, prompt, style)
+        finally:
+            self._pending.discard(key)
+
+    async def _store(self, telegram_id, digest, data, prompt, style):
+        try:
+            existing = await run_db(find_user_image, telegram_id, digest)
+        except Exception as e:
+            self.failed += 1
+            logger.error("No se pudo consultar el archivo de imágenes: %s", e)
+            return None
+        if existing is not None:
+            self.duplicates += 1
+            return existing
+        path = archive_path(uuid.uuid4().hex)
+        try:
+            await asyncio.to_thread(write_file, self.directory, path, data)
+        except Exception as e:
+            self.failed += 1
+            logger.error("No se pudo archivar la imagen: %s", e)
+            return None
+        try:
+            await run_db(insert_entry, telegram_id, path, digest, len(data), prompt, style)
+        except Exception as e:
+            # Sin fila en el índice la expulsión no la vería nunca
+            self.failed += 1
+            logger.error("No se pudo indexar la imagen archivada: %s", e)
+            await asyncio.to_thread(remove_files, self.directory, [path])
+            return None
+        self.saved += 1
+        if self.bytes is not None:
+            self.bytes += len(data)
+            if self.bytes > self.max_bytes and self._wakeup is not None:
+                self._wakeup.set()
+        return path
+
+    async def evict(self) -> int:
+        """Aplica el presupuesto de tamaño y antigüedad. Devuelve cuántas imágenes borró."""
+        async with self._evict_lock:
+            removed, self.bytes = await run_db(evict_entries, self.max_bytes, self.max_age_days)
+            if removed:
+                await asyncio.to_thread(remove_files, self.directory, removed)
+                self.evicted += len(removed)
+                logger.info("Archivo de imágenes: %d borradas, quedan %.1f MB", len(removed), self.bytes / 1e6)
+            return len(removed)
+
+    async def _run(self):
+        while True:
+            # Una expulsión a medias dejaría archivos fuera del índice: stop()
+            # cancela la espera, no la expulsión
+            self._evicting = asyncio.ensure_future(self.evict())
+            try:
+                await asyncio.shield(self._evicting)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error expulsando imágenes del archivo: %s", e)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            if self._evicting is not None and not self._evicting.done():
+                await asyncio.wait([self._evicting])
+            self._task = None
+            self._wakeup = None
+            self._evicting = None
+
+    async def flush(self):
+        """Espera a que terminen las escrituras pendientes (usar al apagar)."""
+        if self._writes:
+            await asyncio.gather(*list(self._writes), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "evicted": self.evicted,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "pending_writes": len(self._writes),
+        }
+
+
+async def alist_user_images(telegram_id: int, limit: int = 20) -> list:
+    return await run_db(list_user_images, telegram_id, limit)
+
+
+image_archive = ImageArchive()
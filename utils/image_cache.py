@@ -0,0 +1,201 @@
+"""
+Caché en disco de imágenes generadas, direccionada por contenido.
+
+La clave es el SHA-256 del prompt final y los parámetros de la petición
+(tamaño, semilla...): la misma petición devuelve los mismos bytes sin
+volver a llamar a Pollinations. Cada entrada es un archivo <clave>.png con
+un <clave>.json de metadatos al lado, repartidos en subcarpetas por los
+dos primeros caracteres de la clave.
+  - Tamaño acotado (IMAGE_CACHE_MAX_MB): al pasarse se borran las menos
+    usadas (LRU; la fecha de modificación se renueva en cada acierto, así
+    que el orden sobrevive a los reinicios).
+  - Peticiones idénticas simultáneas esperan una sola descarga.
+  - Es opcional por llamada: /batch pide semillas nuevas y no la usa.
+stats() da aciertos, fallos, ratio de aciertos y bytes ahorrados.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE = os.getenv("IMAGE_CACHE", "1") == "1"
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+
+
+def cache_key(prompt: str, **params) -> str:
+    """Clave de una petición: hash del prompt final y sus parámetros."""
+    payload = json.dumps({"prompt": prompt, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Imágenes en disco con expulsión LRU por tamaño y descargas compartidas."""
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = int(IMAGE_CACHE_MAX_MB * 1024 * 1024),
+                 enabled: bool = IMAGE_CACHE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        # clave -> tamaño en bytes, de la menos a la más usada
+        self._index = OrderedDict()
+        self._loaded = None
+        self._inflight = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    def _path(self, key: str, ext: str = ".png") -> str:
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    def _scan(self) -> list:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        entries.sort()
+        return entries
+
+    async def _load(self):
+        entries = await asyncio.to_thread(self._scan)
+        for _, key, size in entries:
+            self._index[key] = size
+            self.bytes += size
+        logger.info("Caché de imágenes: %d entradas, %.1f MB", len(self._index), self.bytes / 1e6)
+
+    async def _ensure_loaded(self):
+        # El índice se reconstruye del disco una vez, en el primer uso. La carga
+        # va en su propia tarea: termina aunque se cancele quien la lanzó, y si
+        # falla, el siguiente uso la reintenta
+        task = self._loaded
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self._loaded = asyncio.ensure_future(self._load())
+        await asyncio.shield(task)
+
+    def _read(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes, meta: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with open(self._path(key, ".json"), "w", encoding="utf-8") as f:
+            json.dump({**(meta or {}), "size": len(data), "created_at": time.time()}, f, ensure_ascii=False)
+
+    def _remove(self, keys: list):
+        for key in keys:
+            for ext in (".png", ".json"):
+                try:
+                    os.remove(self._path(key, ext))
+                except FileNotFoundError:
+                    pass
+
+    def _forget(self, key: str):
+        self.bytes -= self._index.pop(key, 0)
+
+    async def _store(self, key: str, data: bytes, meta: dict):
+        try:
+            await asyncio.to_thread(self._write, key, data, meta)
+        except OSError as e:
+            logger.error("No se pudo guardar la imagen en caché: %s", e)
+            return
+        self._forget(key)
+        self._index[key] = len(data)
+        self.bytes += len(data)
+        evicted = []
+        while self.bytes > self.max_bytes and len(self._index) > 1:
+            old_key, size = self._index.popitem(last=False)
+            self.bytes -= size
+            evicted.append(old_key)
+        if evicted:
+            self.evictions += len(evicted)
+            await asyncio.to_thread(self._remove, evicted)
+
+    async def get_or_fetch(self, key: str, fetch, meta: dict = None) -> bytes:
+        """Bytes de `key` desde el disco, o de `await fetch()` guardándolos.
+
+        Si ya hay una descarga de la misma clave en curso, espera esa.
+        """
+        if not self.enabled:
+            return await fetch()
+        await self._ensure_loaded()
+        if key in self._index:
+            data = await asyncio.to_thread(self._read, key)
+            if data is not None:
+                self._index.move_to_end(key)
+                self.hits += 1
+                self.bytes_saved += len(data)
+                return data
+            # Borrada por fuera: se descarga de nuevo
+            self._forget(key)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            data = await asyncio.shield(pending)
+            self.coalesced += 1
+            self.bytes_saved += len(data)
+            return data
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await fetch()
+            self.misses += 1
+            future.set_result(data)
+            # Sigue en _inflight hasta estar en disco: nadie la descarga dos veces
+            await self._store(key, data, meta)
+            return data
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except Exception as e:
+            # Si falló _store, los que esperaban ya tienen los bytes
+            if not future.done():
+                future.set_exception(e)
+                # Si nadie más espera, evita "Future exception was never retrieved"
+                future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+image_cache = ImageCache()
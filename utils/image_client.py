@@ -0,0 +1,88 @@
+"""
+Cliente HTTP async compartido para la generación de imágenes (Pollinations).
+
+Un único httpx.AsyncClient con pool de conexiones keep-alive: las imágenes
+no ocupan hilos del executor mientras se generan y reutilizan las
+conexiones TLS abiertas. Usa HTTP/2 si está instalado el paquete h2 (varias
+imágenes por una sola conexión). Los timeouts de conexión y de lectura se
+configuran por separado, y el número de conexiones está acotado por host.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+POLLINATIONS_BASE_URL = os.getenv("POLLINATIONS_BASE_URL", "https://image.pollinations.ai").rstrip("/")
+IMAGE_CONNECT_TIMEOUT = float(os.getenv("IMAGE_CONNECT_TIMEOUT", "5"))
+IMAGE_READ_TIMEOUT = float(os.getenv("IMAGE_READ_TIMEOUT", "60"))
+IMAGE_MAX_CONNECTIONS_PER_HOST = int(os.getenv("IMAGE_MAX_CONNECTIONS_PER_HOST", "16"))
+IMAGE_MAX_KEEPALIVE = int(os.getenv("IMAGE_MAX_KEEPALIVE", "16"))
+IMAGE_HTTP2 = os.getenv("IMAGE_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+_client = None
+# host -> semáforo con IMAGE_MAX_CONNECTIONS_PER_HOST peticiones en curso
+_host_slots = {}
+
+
+def get_image_client() -> httpx.AsyncClient:
+    """Devuelve el cliente compartido, creándolo en la primera llamada."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=IMAGE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=IMAGE_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(IMAGE_READ_TIMEOUT, connect=IMAGE_CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+        logger.info(
+            "Cliente HTTP de imágenes inicializado (HTTP/2=%s, %d conexiones por host)",
+            IMAGE_HTTP2, IMAGE_MAX_CONNECTIONS_PER_HOST,
+        )
+    return _client
+
+
+@asynccontextmanager
+async def _host_slot(url: str):
+    # httpx solo limita el pool entero; el límite por host va aparte
+    host = httpx.URL(url).host
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(IMAGE_MAX_CONNECTIONS_PER_HOST)
+    async with slot:
+        yield
+
+
+async def fetch_image(url: str, params: dict = None, timeout: float = None) -> bytes:
+    """GET de una imagen. `timeout` sustituye al timeout de lectura.
+
+    Raises:
+        httpx.TimeoutException: si no conecta o no termina a tiempo.
+        httpx.HTTPStatusError: si la respuesta no es 200.
+        httpx.HTTPError: otros errores de red.
+    """
+    request_timeout = httpx.Timeout(timeout or IMAGE_READ_TIMEOUT, connect=IMAGE_CONNECT_TIMEOUT)
+    async with _host_slot(url):
+        response = await get_image_client().get(url, params=params, timeout=request_timeout)
+    if response.status_code != 200:
+        raise httpx.HTTPStatusError(
+            f"Error API: {response.status_code}", request=response.request, response=response
+        )
+    return response.content
+
+
+async def close_image_client():
+    """Cierra el pool de conexiones (usar al apagar el bot)."""
+    global _client
+    client, _client = _client, None
+    _host_slots.clear()
+    if client is not None:
+        await client.aclose()
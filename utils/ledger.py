@@ -0,0 +1,170 @@
+"""
+Compactación del ledger (tabla transactions).
+
+Las filas más antiguas que LEDGER_RETENTION_DAYS se resumen en
+transactions_daily_rollup (por usuario, día y tipo) y se mueven a una base
+de datos de archivo adjunta (LEDGER_ARCHIVE_PATH), de modo que la base
+principal se mantiene pequeña y su caché de páginas útil.
+
+Cada lote se procesa en dos pasos idempotentes:
+  1. Copia al archivo con INSERT OR IGNORE (conserva el id original).
+  2. En una sola transacción de la base principal: suma el lote a los
+     agregados diarios y borra las filas crudas.
+Si el proceso se interrumpe entre ambos pasos, la siguiente ejecución
+repite la copia sin duplicar nada y completa el paso 2, así que para todo
+usuario SUM(agregados) + SUM(filas crudas) se conserva exactamente.
+"""
+
+import logging
+import os
+from datetime import date, timedelta
+
+from utils.audit import flush_audit_log
+from utils.db import get_connection, run_db, transaction
+
+logger = logging.getLogger(__name__)
+
+LEDGER_ARCHIVE_PATH = os.getenv("LEDGER_ARCHIVE_PATH") or "bot_data_archive.sqlite"
+LEDGER_RETENTION_DAYS = int(os.getenv("LEDGER_RETENTION_DAYS", "90"))
+LEDGER_COMPACT_BATCH = int(os.getenv("LEDGER_COMPACT_BATCH", "5000"))
+
+
+def _attach_archive(conn):
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if "archive" not in attached:
+        conn.execute("ATTACH DATABASE ? AS archive", (LEDGER_ARCHIVE_PATH,))
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive.transactions_archive (
+                id INTEGER PRIMARY KEY,
+                telegram_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS archive.idx_archive_user_created "
+            "ON transactions_archive(telegram_id, created_at)"
+        )
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS compact_batch(id INTEGER PRIMARY KEY)"
+    )
+
+
+def retention_cutoff(retention_days: int = None, today: date = None) -> str:
+    """Fecha (YYYY-MM-DD) a partir de la cual las filas se quedan en la base principal."""
+    retention_days = LEDGER_RETENTION_DAYS if retention_days is None else retention_days
+    today = today or date.today()
+    return (today - timedelta(days=retention_days)).isoformat()
+
+
+def compact_ledger_batch(cutoff: str, batch_size: int = None) -> int:
+    """Archiva y agrega un lote de filas anteriores a `cutoff`. Devuelve cuántas movió."""
+    batch_size = batch_size or LEDGER_COMPACT_BATCH
+    conn = get_connection()
+    _attach_archive(conn)
+
+    with transaction() as conn:
+        conn.execute("DELETE FROM compact_batch")
+        conn.execute(
+            "INSERT INTO compact_batch(id) SELECT id FROM transactions "
+            "WHERE created_at < ? ORDER BY created_at LIMIT ?",
+            (cutoff, batch_size),
+        )
+        moved = conn.execute("SELECT COUNT(*) FROM compact_batch").fetchone()[0]
+        if not moved:
+            return 0
+        # Paso 1: copia idempotente al archivo
+        conn.execute(
+            "INSERT OR IGNORE INTO archive.transactions_archive(id, telegram_id, kind, amount, created_at) "
+            "SELECT id, telegram_id, kind, amount, created_at FROM transactions "
+            "WHERE id IN (SELECT id FROM compact_batch)"
+        )
+
+    # Paso 2: agregados + borrado, atómicos en la base principal
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO transactions_daily_rollup(telegram_id, day, kind, sum, count)
+            SELECT telegram_id, substr(created_at, 1, 10), kind, SUM(amount), COUNT(*)
+            FROM transactions WHERE id IN (SELECT id FROM compact_batch)
+            GROUP BY telegram_id, substr(created_at, 1, 10), kind
+            ON CONFLICT(telegram_id, day, kind) DO UPDATE SET
+                sum = sum + excluded.sum,
+                count = count + excluded.count
+            """
+        )
+        conn.execute("DELETE FROM transactions WHERE id IN (SELECT id FROM compact_batch)")
+    return moved
+
+
+def compact_ledger(retention_days: int = None, batch_size: int = None) -> int:
+    """Compacta todo el ledger anterior a la ventana de retención. Devuelve las filas movidas."""
+    flush_audit_log()
+    cutoff = retention_cutoff(retention_days)
+    total = 0
+    while True:
+        moved = compact_ledger_batch(cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+    if total:
+        get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info("Ledger compactado: %d filas anteriores a %s archivadas", total, cutoff)
+    return total
+
+
+async def acompact_ledger(retention_days: int = None, batch_size: int = None) -> int:
+    """Versión async de compact_ledger.
+
+    Cada lote pasa por el hilo de la DB por separado, así las operaciones de
+    los usuarios se intercalan entre lotes en lugar de esperar al final.
+    """
+    await run_db(flush_audit_log)
+    cutoff = retention_cutoff(retention_days)
+    total = 0
+    while True:
+        moved = await run_db(compact_ledger_batch, cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+    if total:
+        await run_db(lambda: get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)"))
+        logger.info("Ledger compactado: %d filas anteriores a %s archivadas", total, cutoff)
+    return total
+
+
+def user_ledger_totals(telegram_id: int) -> dict:
+    """Totales del ledger de un usuario repartidos entre filas crudas, agregados y archivo.
+
+    `consistent` es True si los agregados cuadran exactamente con las filas
+    archivadas; `ledger_total` (crudas + agregados) es el total histórico
+    de movimientos del usuario, igual que antes de compactar.
+    """
+    flush_audit_log()
+    conn = get_connection()
+    _attach_archive(conn)
+    hot = conn.execute(
+        "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM transactions WHERE telegram_id = ?", (telegram_id,)
+    ).fetchone()
+    rollup = conn.execute(
+        "SELECT COALESCE(SUM(sum), 0), COALESCE(SUM(count), 0) FROM transactions_daily_rollup "
+        "WHERE telegram_id = ?",
+        (telegram_id,),
+    ).fetchone()
+    archived = conn.execute(
+        "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM archive.transactions_archive WHERE telegram_id = ?",
+        (telegram_id,),
+    ).fetchone()
+    return {
+        "hot_sum": hot[0],
+        "hot_count": hot[1],
+        "rollup_sum": rollup[0],
+        "rollup_count": rollup[1],
+        "archive_sum": archived[0],
+        "archive_count": archived[1],
+        "ledger_total": hot[0] + rollup[0],
+        "consistent": tuple(rollup) == tuple(archived),
+    }
@@ -0,0 +1,151 @@
+"""
+Cliente async de Groq compartido por todo el bot.
+
+Un único AsyncGroq sobre un httpx.AsyncClient con pool de conexiones
+keep-alive: las llamadas al LLM no bloquean el event loop y reutilizan las
+conexiones TLS abiertas. Los timeouts de conexión y de lectura se
+configuran por separado. Cada llamada espera turno en el planificador
+global (utils.llm_scheduler).
+"""
+
+import logging
+import math
+import os
+
+import httpx
+from groq import AsyncGroq, RateLimitError
+
+from utils.llm_scheduler import BACKGROUND, NORMAL, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "15"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "50"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "20"))
+GROQ_RATE_LIMIT_RETRIES = int(os.getenv("GROQ_RATE_LIMIT_RETRIES", "2"))
+
+# Heurística sin tokenizador: los modelos Llama rondan 3.5 caracteres por
+# token en español e inglés, más unos pocos tokens de formato por mensaje
+CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_client = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens de un texto."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def messages_tokens(messages) -> int:
+    """Tokens estimados de una lista de mensajes de chat."""
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(m["content"]) for m in messages)
+
+
+def _request_tokens(kwargs) -> int:
+    # Groq descuenta del límite TPM el prompt más los tokens de salida pedidos
+    return messages_tokens(kwargs.get("messages", [])) + kwargs.get("max_tokens", 0)
+
+
+def _retry_after(error: RateLimitError) -> float:
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return 2.0
+
+
+def get_llm_client() -> AsyncGroq:
+    """Devuelve el cliente compartido, creándolo en la primera llamada.
+
+    Raises:
+        ValueError: si GROQ_API_KEY no está definida.
+    """
+    global _client
+    if _client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY requerida")
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+        )
+        _client = AsyncGroq(
+            api_key=api_key,
+            base_url=GROQ_BASE_URL,
+            http_client=http_client,
+            # Sin reintentos del SDK: reintentaría los 429 por su cuenta, sin
+            # pasar por el planificador. Los 429 se reintentan abajo tras
+            # penalize(); los demás fallos, con la cadena de llm_fallback.
+            max_retries=0,
+        )
+        logger.info("Cliente Groq async inicializado (pool de %d conexiones)", GROQ_MAX_CONNECTIONS)
+    return _client
+
+
+async def close_llm_client():
+    """Cierra el pool de conexiones (usar al apagar el bot)."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.close()
+
+
+async def chat_completion(priority: int = BACKGROUND, metrics: dict = None, **kwargs) -> str:
+    """Completion sin streaming (resúmenes y tareas de fondo). Devuelve el texto."""
+    tokens = _request_tokens(kwargs)
+    for attempt in range(GROQ_RATE_LIMIT_RETRIES + 1):
+        async with llm_scheduler.slot(priority, tokens, kwargs.get("model")) as queue_wait:
+            if metrics is not None:
+                metrics["queue_wait"] = metrics.get("queue_wait", 0.0) + queue_wait
+            try:
+                response = await get_llm_client().chat.completions.create(**kwargs)
+            except RateLimitError as e:
+                llm_scheduler.penalize(_retry_after(e), kwargs.get("model"))
+                if attempt == GROQ_RATE_LIMIT_RETRIES:
+                    raise
+                continue
+            return (response.choices[0].message.content or "").strip()
+
+
+async def stream_chat_completion(priority: int = NORMAL, metrics: dict = None, on_admit=None, **kwargs):
+    """Itera los fragmentos de texto de una completion en streaming.
+
+    La llamada espera turno en el planificador con la prioridad indicada y
+    ocupa su hueco de concurrencia hasta que termina el stream. Si se pasa
+    `metrics`, se guarda en metrics["queue_wait"] la espera en cola; si se
+    pasa `on_admit`, se llama cada vez que el planificador admite la
+    petición (justo antes de enviarla a Groq).
+
+    Si la tarea que consume el generador se cancela, el `finally` cierra la
+    respuesta HTTP y la conexión vuelve al pool sin esperar al modelo.
+    """
+    tokens = _request_tokens(kwargs)
+    for attempt in range(GROQ_RATE_LIMIT_RETRIES + 1):
+        async with llm_scheduler.slot(priority, tokens, kwargs.get("model")) as queue_wait:
+            if metrics is not None:
+                metrics["queue_wait"] = metrics.get("queue_wait", 0.0) + queue_wait
+            if on_admit is not None:
+                on_admit()
+            try:
+                stream = await get_llm_client().chat.completions.create(stream=True, **kwargs)
+            except RateLimitError as e:
+                # Pausa la cola del modelo y vuelve a pedir turno
+                llm_scheduler.penalize(_retry_after(e), kwargs.get("model"))
+                if attempt == GROQ_RATE_LIMIT_RETRIES:
+                    raise
+                continue
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                await stream.close()
+            return
@@ -0,0 +1,201 @@
+"""
+Cadena de modelos de respaldo y peticiones duplicadas (hedging) para el chat.
+
+stream_chat_resilient() intenta los modelos de CHAT_MODEL_CHAIN en orden:
+  - Cada intento tiene CHAT_ATTEMPT_TIMEOUT segundos, desde que el
+    planificador lo admite, para empezar a responder (primer fragmento);
+    si falla o no llega a tiempo, se lanza el siguiente modelo de la
+    cadena. La espera en la cola del LLM es nuestra, no del modelo: sólo
+    cuenta para el SLA.
+  - Si el intento principal tarda más que el p95 reciente de ese modelo en
+    dar el primer fragmento, sale una petición duplicada; gana la primera
+    que responda y la otra se cancela. No se duplica si la cola del LLM
+    está llena: ahí la espera es nuestra, no del modelo.
+  - Si nada ha empezado a responder en CHAT_REPLY_SLA segundos, se lanza
+    LLMUnavailable para que el llamador use una respuesta de reserva.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+
+from utils.llm import stream_chat_completion
+from utils.llm_scheduler import NORMAL, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL_CHAIN = [
+    m.strip()
+    for m in os.getenv("CHAT_MODEL_CHAIN", "llama-3.1-8b-instant,llama-3.3-70b-versatile").split(",")
+    if m.strip()
+]
+CHAT_ATTEMPT_TIMEOUT = float(os.getenv("CHAT_ATTEMPT_TIMEOUT", "6"))
+CHAT_REPLY_SLA = float(os.getenv("CHAT_REPLY_SLA", "10"))
+CHAT_HEDGE = os.getenv("CHAT_HEDGE", "1") == "1"
+# Espera antes de duplicar mientras no haya suficientes muestras de latencia
+CHAT_HEDGE_DEFAULT_DELAY = float(os.getenv("CHAT_HEDGE_DEFAULT_DELAY", "2.0"))
+CHAT_HEDGE_MIN_DELAY = float(os.getenv("CHAT_HEDGE_MIN_DELAY", "0.3"))
+_HEDGE_MIN_SAMPLES = 20
+
+# modelo -> últimos tiempos hasta el primer fragmento (s)
+_first_chunk_latency = {}
+
+
+class LLMUnavailable(Exception):
+    """Ningún modelo de la cadena empezó a responder dentro del SLA."""
+
+
+def record_latency(model: str, seconds: float):
+    _first_chunk_latency.setdefault(model, deque(maxlen=500)).append(seconds)
+
+
+def hedge_delay(model: str) -> float:
+    """p95 reciente del tiempo hasta el primer fragmento de `model`."""
+    samples = _first_chunk_latency.get(model)
+    if not samples or len(samples) < _HEDGE_MIN_SAMPLES:
+        return CHAT_HEDGE_DEFAULT_DELAY
+    ordered = sorted(samples)
+    return max(CHAT_HEDGE_MIN_DELAY, ordered[int(len(ordered) * 0.95)])
+
+
+class _Attempt:
+    __slots__ = ("model", "stream", "first", "admitted", "started_at", "hedge")
+
+    def __init__(self, model: str, hedge: bool):
+        self.model = model
+        self.hedge = hedge
+        self.stream = None
+        self.first = None
+        # Se resuelve cuando el planificador admite la petición
+        self.admitted = asyncio.get_running_loop().create_future()
+        # Hora de admisión (None mientras espera en cola); se renueva si un
+        # 429 la devuelve a la cola
+        self.started_at = None
+
+    def start(self, stream):
+        self.stream = stream
+        # El primer fragmento se pide en una tarea aparte para poder competir
+        self.first = asyncio.ensure_future(stream.__anext__())
+
+    def on_admit(self):
+        self.started_at = asyncio.get_running_loop().time()
+        if not self.admitted.done():
+            self.admitted.set_result(None)
+
+
+async def _discard(attempt: _Attempt):
+    if not attempt.admitted.done():
+        attempt.admitted.cancel()
+    if not attempt.first.done():
+        attempt.first.cancel()
+        # wait() no propaga la cancelación; el stream cierra su conexión al cancelarse
+        await asyncio.wait([attempt.first])
+    try:
+        await attempt.stream.aclose()
+    except Exception:
+        pass
+
+
+async def stream_chat_resilient(
+    models: list = None,
+    priority: int = NORMAL,
+    metrics: dict = None,
+    attempt_timeout: float = None,
+    sla: float = None,
+    **kwargs,
+):
+    """Como stream_chat_completion, con cadena de respaldo, hedging y SLA.
+
+    Si se pasa `metrics` se rellenan model (el que respondió), attempts,
+    hedged y queue_wait.
+
+    Raises:
+        LLMUnavailable: si nada empezó a responder dentro del SLA o fallaron
+            todos los modelos de la cadena.
+    """
+    loop = asyncio.get_running_loop()
+    chain = list(models or CHAT_MODEL_CHAIN)
+    attempt_timeout = CHAT_ATTEMPT_TIMEOUT if attempt_timeout is None else attempt_timeout
+    started = loop.time()
+    deadline = started + (CHAT_REPLY_SLA if sla is None else sla)
+    metrics = metrics if metrics is not None else {}
+    metrics.update(attempts=0, hedged=False)
+
+    running = []
+    hedged = False
+
+    def launch(model: str, hedge: bool = False):
+        attempt = _Attempt(model, hedge)
+        attempt.start(stream_chat_completion(
+            priority=priority, metrics=metrics, on_admit=attempt.on_admit, model=model, **kwargs
+        ))
+        running.append(attempt)
+        metrics["attempts"] += 1
+
+    launch(chain.pop(0))
+    winner = None
+    first_delta = None
+    try:
+        while winner is None:
+            now = loop.time()
+            if now >= deadline:
+                raise LLMUnavailable(f"sin respuesta en {deadline - started:.1f}s")
+            if not running:
+                raise LLMUnavailable("fallaron todos los modelos de la cadena")
+
+            # Próximo evento: SLA, admisión o deadline de un intento, o momento
+            # de duplicar. Los intentos en cola sólo tienen el SLA
+            admitted = [a for a in running if a.started_at is not None]
+            wake_at = [deadline] + [a.started_at + attempt_timeout for a in admitted]
+            primary = running[0]
+            can_hedge = CHAT_HEDGE and not hedged and not primary.hedge and primary.started_at is not None
+            hedge_at = primary.started_at + hedge_delay(primary.model) if can_hedge else None
+            if can_hedge and hedge_at > now:
+                wake_at.append(hedge_at)
+            timeout = max(0.0, min(wake_at) - now)
+            waiting = [a.first for a in running] + [a.admitted for a in running if a.started_at is None]
+            done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            now = loop.time()
+            for attempt in [a for a in running if a.first in done]:
+                running.remove(attempt)
+                error = attempt.first.exception() if not attempt.first.cancelled() else None
+                if error is None and not attempt.first.cancelled():
+                    winner, first_delta = attempt, attempt.first.result()
+                    break
+                if isinstance(error, StopAsyncIteration):
+                    error = "respuesta vacía"
+                logger.warning("Modelo %s falló: %s", attempt.model, error)
+                await _discard(attempt)
+                if chain and not running:
+                    launch(chain.pop(0))
+            if winner is not None:
+                break
+
+            for attempt in [a for a in running
+                            if a.started_at is not None and now - a.started_at >= attempt_timeout]:
+                logger.warning("Modelo %s sin respuesta en %.1fs", attempt.model, attempt_timeout)
+                running.remove(attempt)
+                await _discard(attempt)
+                if chain:
+                    launch(chain.pop(0))
+
+            # Si al llegar la hora de duplicar la cola está llena, no se duplica
+            if (can_hedge and running and running[0] is primary and now >= hedge_at
+                    and llm_scheduler.has_capacity(primary.model)):
+                hedged = True
+                metrics["hedged"] = True
+                launch(primary.model, hedge=True)
+    finally:
+        for attempt in running:
+            await _discard(attempt)
+
+    record_latency(winner.model, loop.time() - winner.started_at)
+    metrics["model"] = winner.model
+    try:
+        yield first_delta
+        async for delta in winner.stream:
+            yield delta
+    finally:
+        await winner.stream.aclose()
@@ -0,0 +1,230 @@
+"""
+Planificador global de llamadas al LLM.
+
+Todas las peticiones a Groq pasan por aquí antes de salir:
+  - Groq limita cada modelo por separado, así que cada modelo tiene sus
+    token buckets: peticiones por minuto (GROQ_RPM) y tokens por minuto
+    (GROQ_TPM, prompt estimado + max_tokens). 0 desactiva el límite
+    correspondiente; TPM viene desactivado porque la estimación incluye
+    max_tokens y sobrestima mucho el consumo real.
+  - Como mucho LLM_MAX_CONCURRENCY llamadas en curso a la vez.
+  - Cola con prioridad: CRISIS (mensajes con dolor emocional) pasa delante
+    de NORMAL, y NORMAL delante de BACKGROUND (resúmenes).
+  - Un 429 de Groq pausa la cola de ese modelo durante el Retry-After, en
+    lugar de que cada petición choque por su cuenta con el límite.
+Cada admisión registra el tiempo de espera en cola, por prioridad.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = int(os.getenv("GROQ_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "20"))
+
+CRISIS = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {CRISIS: "crisis", NORMAL: "normal", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Cubeta que se rellena a `per_minute` unidades por minuto, con ese mismo tope."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float = None) -> float:
+        """Segundos hasta que haya `amount` unidades (0 si ya las hay)."""
+        self._refill(now or time.monotonic())
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float = None):
+        self._refill(now or time.monotonic())
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, tokens: int, future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _ModelLimits:
+    """Cubetas RPM/TPM, pausa por 429 y cola de espera de un modelo."""
+
+    __slots__ = ("rpm", "tpm", "paused_until", "queue")
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.queue = []
+
+    def delay(self, tokens: int, now: float) -> float:
+        delay = self.paused_until - now
+        if self.rpm is not None:
+            delay = max(delay, self.rpm.delay(1, now))
+        if self.tpm is not None:
+            delay = max(delay, self.tpm.delay(tokens, now))
+        return delay
+
+    def take(self, tokens: int, now: float):
+        if self.rpm is not None:
+            self.rpm.take(1, now)
+        if self.tpm is not None:
+            self.tpm.take(tokens, now)
+
+
+class LLMScheduler:
+    """Cola con prioridad, límite de concurrencia y límites RPM/TPM por modelo."""
+
+    def __init__(self, rpm: int = GROQ_RPM, tpm: int = GROQ_TPM, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self._models = {}
+        self._seq = itertools.count()
+        self._active = 0
+        self._wakeup = None
+        self._waits = {p: deque(maxlen=1000) for p in PRIORITY_NAMES}
+        self._admitted = {p: 0 for p in PRIORITY_NAMES}
+        self.rate_limited = 0
+
+    def _limits(self, model) -> _ModelLimits:
+        limits = self._models.get(model)
+        if limits is None:
+            limits = self._models[model] = _ModelLimits(self.rpm, self.tpm)
+        return limits
+
+    def _schedule_wakeup(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._wakeup is not None:
+            if self._wakeup.when() <= when:
+                return
+            self._wakeup.cancel()
+        self._wakeup = loop.call_at(when, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._pump()
+
+    def _pump(self):
+        """Admite peticiones en orden de prioridad mientras haya hueco y cupo.
+
+        Cada modelo tiene su cola: si el primero de un modelo espera cupo de
+        ese modelo, los de otros modelos pueden pasar.
+        """
+        while self._active < self.max_concurrency:
+            now = time.monotonic()
+            best = None
+            wait = None
+            for limits in self._models.values():
+                queue = limits.queue
+                while queue and queue[0][2].future.done():
+                    heapq.heappop(queue)
+                if not queue:
+                    continue
+                delay = limits.delay(queue[0][2].tokens, now)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                elif best is None or queue[0] < best.queue[0]:
+                    best = limits
+            if best is None:
+                if wait is not None:
+                    self._schedule_wakeup(wait)
+                return
+            _, _, waiter = heapq.heappop(best.queue)
+            best.take(waiter.tokens, now)
+            self._active += 1
+            waiter.future.set_result(now - waiter.enqueued_at)
+
+    def _release(self):
+        self._active -= 1
+        self._pump()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = NORMAL, tokens: int = 1, model: str = None):
+        """Espera turno para una llamada al LLM. Devuelve la espera en cola (s).
+
+        Uso:
+            async with llm_scheduler.slot(CRISIS, tokens=900, model=model) as queue_wait:
+                ...
+        """
+        queue = self._limits(model).queue
+        entry = (priority, next(self._seq), _Waiter(priority, tokens, asyncio.get_running_loop().create_future()))
+        waiter = entry[2]
+        heapq.heappush(queue, entry)
+        self._pump()
+        try:
+            queue_wait = await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitida justo antes de cancelarse: devolver el hueco
+                self._release()
+            elif entry in queue:
+                # Sale de la cola ya, para que has_capacity() no la cuente
+                queue.remove(entry)
+                heapq.heapify(queue)
+            raise
+        self._waits[priority].append(queue_wait)
+        self._admitted[priority] += 1
+        try:
+            yield queue_wait
+        finally:
+            self._release()
+
+    def has_capacity(self, model: str = None) -> bool:
+        """True si una petición nueva a `model` se admitiría sin esperar en cola."""
+        if self._active >= self.max_concurrency:
+            return False
+        limits = self._limits(model)
+        return not limits.queue and limits.delay(1, time.monotonic()) <= 0
+
+    def penalize(self, retry_after: float, model: str = None):
+        """Groq respondió 429 para `model`: no admitir nada suyo durante `retry_after` segundos."""
+        self.rate_limited += 1
+        limits = self._limits(model)
+        limits.paused_until = max(limits.paused_until, time.monotonic() + retry_after)
+        logger.warning("Límite de Groq alcanzado (%s); cola del modelo en pausa %.1fs", model, retry_after)
+
+    def stats(self) -> dict:
+        """Admisiones y espera en cola (p50/p95/máx., en segundos) por prioridad."""
+        queued = sum(len(limits.queue) for limits in self._models.values())
+        stats = {"active": self._active, "queued": queued, "rate_limited": self.rate_limited}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(self._waits[priority])
+            if waits:
+                stats[name] = {
+                    "admitted": self._admitted[priority],
+                    "wait_p50": round(waits[len(waits) // 2], 3),
+                    "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3),
+                    "wait_max": round(waits[-1], 3),
+                }
+        return stats
+
+
+llm_scheduler = LLMScheduler()
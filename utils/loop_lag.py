@@ -0,0 +1,62 @@
+"""
+Monitor de latencia del event loop.
+
+Duerme en intervalos fijos y mide cuánto se retrasa el despertar: si algún
+handler bloquea el loop (p. ej. una llamada síncrona a SQLite), el retraso
+aparece aquí.
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Mide el retraso del event loop y registra avisos cuando supera un umbral."""
+
+    def __init__(self, interval: float = 0.1, warn_threshold: float = 0.25, window: int = 600):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.window = window
+        self.samples = []
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            self.samples.append(lag)
+            if len(self.samples) > self.window:
+                del self.samples[0]
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                logger.warning("Event loop bloqueado %.0f ms", lag * 1000)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Devuelve p50/p99/máximo del retraso (en ms) sobre la ventana reciente."""
+        if not self.samples:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "max_ms": self.max_lag * 1000,
+            "samples": len(ordered),
+        }
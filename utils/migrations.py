@@ -0,0 +1,209 @@
+"""
+Migraciones versionadas del esquema SQLite.
+
+La versión aplicada se guarda en `PRAGMA user_version`. Cada paso de
+MIGRATIONS se ejecuta una sola vez, en su propia transacción, junto con el
+incremento de la versión. Para cambiar el esquema se agrega un paso nuevo
+al final de la lista; nunca se editan los pasos ya publicados.
+"""
+
+import logging
+import sqlite3
+
+from utils.db import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _m001_base_schema(conn: sqlite3.Connection):
+    """Tablas users y transactions (incluye columnas añadidas en versiones antiguas)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            telegram_id INTEGER PRIMARY KEY,
+            credits INTEGER NOT NULL DEFAULT 0,
+            is_admin INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            last_daily_bonus TEXT,
+            subscription_tier TEXT NOT NULL DEFAULT 'free',
+            stripe_customer_id TEXT,
+            stripe_subscription_id TEXT,
+            subscription_expires_at TEXT
+        )
+        """
+    )
+    # Bases creadas antes de las suscripciones no tienen estas columnas
+    existing = _columns(conn, "users")
+    for name, ddl in (
+        ("last_daily_bonus", "TEXT"),
+        ("subscription_tier", "TEXT NOT NULL DEFAULT 'free'"),
+        ("stripe_customer_id", "TEXT"),
+        ("stripe_subscription_id", "TEXT"),
+        ("subscription_expires_at", "TEXT"),
+    ):
+        if name not in existing:
+            conn.execute(f"ALTER TABLE users ADD COLUMN {name} {ddl}")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(telegram_id) REFERENCES users(telegram_id)
+        )
+        """
+    )
+
+
+def _m002_indexes(conn: sqlite3.Connection):
+    """Índices para historial por usuario, expiración de suscripciones y webhooks de Stripe."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions(telegram_id, created_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_subscription_expires ON users(subscription_expires_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_stripe_customer ON users(stripe_customer_id)"
+    )
+
+
+def _m003_ledger_rollup(conn: sqlite3.Connection):
+    """Tabla de agregados diarios para el ledger compactado (ver utils.ledger)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions_daily_rollup (
+            telegram_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sum INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (telegram_id, day, kind)
+        ) WITHOUT ROWID
+        """
+    )
+    # La compactación selecciona por antigüedad, sin filtrar por usuario
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions(created_at)")
+
+
+def _m004_usage_counters(conn: sqlite3.Connection):
+    """Contadores de uso por usuario en ventanas fijas de día y mes (cuotas por plan)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_counters (
+            telegram_id INTEGER PRIMARY KEY,
+            day TEXT NOT NULL,
+            day_count INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            month_count INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _m005_chat_sessions(conn: sqlite3.Connection):
+    """Historial de chat persistente: una fila por usuario (ver utils.chat_store)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            telegram_id INTEGER PRIMARY KEY,
+            history TEXT NOT NULL,
+            summary TEXT NOT NULL DEFAULT '',
+            pending TEXT NOT NULL DEFAULT '[]',
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m006_telegram_files(conn: sqlite3.Connection):
+    """file_id de Telegram de cada imagen ya subida, por hash del contenido (ver utils.telegram_files)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS telegram_files (
+            content_hash TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m007_image_archive(conn: sqlite3.Connection):
+    """Índice del archivo de imágenes generadas (ver utils.image_archive)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS image_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            content_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            prompt TEXT,
+            style TEXT,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_image_archive_user_created ON image_archive(telegram_id, created_at)"
+    )
+    # La expulsión recorre por antigüedad, sin filtrar por usuario
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_image_archive_created ON image_archive(created_at)")
+
+
+def _m008_image_archive_hash(conn: sqlite3.Connection):
+    """Búsqueda de una imagen ya archivada del usuario por hash del contenido."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_image_archive_user_hash ON image_archive(telegram_id, content_hash)"
+    )
+
+
+# Orden fijo: la posición (1-based) es el número de versión
+MIGRATIONS = [
+    _m001_base_schema,
+    _m002_indexes,
+    _m003_ledger_rollup,
+    _m004_usage_counters,
+    _m005_chat_sessions,
+    _m006_telegram_files,
+    _m007_image_archive,
+    _m008_image_archive_hash,
+]
+
+
+def get_schema_version(path: str = None) -> int:
+    """Versión del esquema aplicada en la base de datos."""
+    return get_connection(path).execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(path: str = None, target: int = None) -> int:
+    """Aplica las migraciones pendientes hasta `target` (por defecto, la última).
+
+    Returns:
+        int: versión del esquema tras aplicar las migraciones.
+    """
+    target = len(MIGRATIONS) if target is None else target
+    version = get_schema_version(path)
+    while version < target:
+        step = MIGRATIONS[version]
+        with transaction(path) as conn:
+            # Releer dentro de la transacción: otro proceso pudo migrar antes
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if current != version:
+                version = current
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        version += 1
+        logger.info("Migración %d aplicada: %s", version, step.__name__)
+    return version
@@ -0,0 +1,53 @@
+"""
+Envío masivo de mensajes respetando los límites de Telegram.
+
+Telegram admite unas 30 mensajes/segundo por bot; RateLimitedSender espacia
+los envíos por debajo de ese ritmo y respeta los RetryAfter que devuelva la
+API.
+"""
+
+import asyncio
+import logging
+import os
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_RATE_PER_SEC = float(os.getenv("NOTIFY_RATE_PER_SEC", "20"))
+
+
+class RateLimitedSender:
+    """Envía lotes de mensajes con un ritmo máximo de `rate_per_sec`."""
+
+    def __init__(self, bot, rate_per_sec: float = NOTIFY_RATE_PER_SEC):
+        self.bot = bot
+        self.interval = 1.0 / rate_per_sec
+        self._lock = asyncio.Lock()
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        while True:
+            try:
+                await self.bot.send_message(chat_id, text)
+                return True
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                logger.warning("Límite de Telegram alcanzado; esperando %.1fs", delay)
+                await asyncio.sleep(delay)
+            except Forbidden:
+                # El usuario bloqueó el bot: no hay nada que reintentar
+                return False
+            except TelegramError as e:
+                logger.warning("No se pudo notificar a %s: %s", chat_id, e)
+                return False
+
+    async def send_many(self, messages) -> int:
+        """Envía una lista de (chat_id, texto). Devuelve cuántos se entregaron."""
+        delivered = 0
+        # Un solo lote a la vez, para que dos tareas no dupliquen el ritmo
+        async with self._lock:
+            for chat_id, text in messages:
+                if await self._send(chat_id, text):
+                    delivered += 1
+                await asyncio.sleep(self.interval)
+        return delivered
@@ -0,0 +1,195 @@
+"""
+Reenvío de fotos por file_id de Telegram.
+
+Al subir una foto, Telegram devuelve un file_id con el que la misma foto se
+puede volver a mandar sin subir los bytes. Se guarda en la tabla
+telegram_files por SHA-256 del contenido, así que cualquier reenvío de la
+misma imagen sale por file_id: un acierto de la caché de imágenes, un
+"enviar otra vez" o un reenvío de un admin. Los file_id recientes se
+guardan también en memoria. Si Telegram rechaza un file_id guardado por
+inválido, se olvida y la foto se vuelve a subir; cualquier otro BadRequest
+(caption, chat, etc.) se propaga sin tocar lo guardado.
+stats() da subidas, bytes subidos, reenvíos, bytes ahorrados y latencia
+de envío de cada modo.
+"""
+
+import hashlib
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from io import BytesIO
+
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+from utils.cache import TTLCache
+from utils.db import get_connection, run_db
+
+logger = logging.getLogger(__name__)
+
+# Fragmentos (en minúsculas) de los BadRequest de Telegram que indican un
+# file_id inválido o caducado: "Wrong file identifier/HTTP URL specified",
+# "Wrong remote file identifier specified: ...", "FILE_REFERENCE_EXPIRED"...
+STALE_FILE_ID_ERRORS = ("file identifier", "file_id", "file reference", "file_reference")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_file_id(digest: str):
+    """file_id guardado para ese contenido, o None."""
+    row = get_connection().execute(
+        "SELECT file_id FROM telegram_files WHERE content_hash = ?", (digest,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def save_file_id(digest: str, file_id: str, file_unique_id: str, size: int):
+    get_connection().execute(
+        """
+        INSERT INTO telegram_files(content_hash, file_id, file_unique_id, size, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(content_hash) DO UPDATE SET
+            file_id = excluded.file_id,
+            file_unique_id = excluded.file_unique_id
+        """,
+        (digest, file_id, file_unique_id, size, datetime.utcnow().isoformat()),
+    )
+
+
+def is_stale_file_id(error: BadRequest) -> bool:
+    """True si el BadRequest es por un file_id que Telegram ya no acepta."""
+    text = str(error).lower()
+    return any(fragment in text for fragment in STALE_FILE_ID_ERRORS)
+
+
+def delete_file_ids(digests: list):
+    get_connection().executemany("DELETE FROM telegram_files WHERE content_hash = ?", [(d,) for d in digests])
+
+
+class TelegramFiles:
+    """Envía fotos subiéndolas una sola vez y recordando su file_id."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600.0):
+        self._cache = TTLCache(maxsize, ttl)
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.reused = 0
+        self.bytes_saved = 0
+        self.stale = 0
+        self._latency = {"upload": deque(maxlen=1000), "file_id": deque(maxlen=1000)}
+
+    async def _lookup(self, digest: str):
+        file_id = self._cache.get(digest)
+        if file_id is None:
+            file_id = await run_db(get_file_id, digest)
+            if file_id is not None:
+                self._cache.set(digest, file_id)
+        return file_id
+
+    async def _remember(self, digest: str, message, size: int):
+        if not getattr(message, "photo", None):
+            return
+        # La última es la de mayor resolución
+        photo = message.photo[-1]
+        self._cache.set(digest, photo.file_id)
+        try:
+            await run_db(save_file_id, digest, photo.file_id, photo.file_unique_id, size)
+        except Exception as e:
+            logger.error("No se pudo guardar el file_id de la foto: %s", e)
+
+    async def _forget(self, digests):
+        self.stale += len(digests)
+        for digest in digests:
+            self._cache.invalidate(digest)
+        await run_db(delete_file_ids, digests)
+
+    def _record(self, mode: str, started: float, images: list):
+        self._latency[mode].append(time.monotonic() - started)
+        if mode == "upload":
+            self.uploads += len(images)
+            self.upload_bytes += sum(len(data) for data in images)
+
+    async def send_photo(self, message, image_bytes: bytes, **kwargs):
+        """Como message.reply_photo, por file_id si esa imagen ya se subió."""
+        digest = content_hash(image_bytes)
+        file_id = await self._lookup(digest)
+        if file_id is not None:
+            started = time.monotonic()
+            try:
+                sent = await message.reply_photo(photo=file_id, **kwargs)
+                self._record("file_id", started, [])
+                self.reused += 1
+                self.bytes_saved += len(image_bytes)
+                return sent
+            except BadRequest as e:
+                if not is_stale_file_id(e):
+                    raise
+                logger.warning("file_id rechazado por Telegram (%s); se vuelve a subir", e)
+                await self._forget([digest])
+        started = time.monotonic()
+        sent = await message.reply_photo(photo=BytesIO(image_bytes), **kwargs)
+        try:
+            self._record("upload", started, [image_bytes])
+            await self._remember(digest, sent, len(image_bytes))
+        except Exception as e:
+            # La foto ya llegó: el envío no debe contar como fallido
+            logger.error("No se pudo registrar la foto enviada: %s", e)
+        return sent
+
+    async def send_media_group(self, message, images: list, captions: list = None):
+        """Como message.reply_media_group; cada imagen ya subida va por file_id."""
+        captions = captions or [None] * len(images)
+        digests = [content_hash(data) for data in images]
+        file_ids = [await self._lookup(digest) for digest in digests]
+        known = [digest for digest, file_id in zip(digests, file_ids) if file_id is not None]
+
+        def media(use_file_ids: bool):
+            return [
+                InputMediaPhoto(file_id if use_file_ids and file_id else BytesIO(data), caption=caption)
+                for data, file_id, caption in zip(images, file_ids, captions)
+            ]
+
+        started = time.monotonic()
+        try:
+            sent = await message.reply_media_group(media(True))
+        except BadRequest as e:
+            if not known or not is_stale_file_id(e):
+                raise
+            logger.warning("file_id rechazado por Telegram (%s); se vuelve a subir el álbum", e)
+            await self._forget(known)
+            file_ids = [None] * len(images)
+            started = time.monotonic()
+            sent = await message.reply_media_group(media(False))
+        try:
+            uploaded = [data for data, file_id in zip(images, file_ids) if file_id is None]
+            self._record("upload" if uploaded else "file_id", started, uploaded)
+            self.reused += len(images) - len(uploaded)
+            self.bytes_saved += sum(len(data) for data, file_id in zip(images, file_ids) if file_id is not None)
+            for digest, data, file_id, sent_message in zip(digests, images, file_ids, sent):
+                if file_id is None:
+                    await self._remember(digest, sent_message, len(data))
+        except Exception as e:
+            # El álbum ya llegó: el envío no debe contar como fallido
+            logger.error("No se pudo registrar el álbum enviado: %s", e)
+        return sent
+
+    def stats(self) -> dict:
+        stats = {
+            "uploads": self.uploads,
+            "upload_bytes": self.upload_bytes,
+            "reused": self.reused,
+            "bytes_saved": self.bytes_saved,
+            "stale": self.stale,
+        }
+        for mode, samples in self._latency.items():
+            if samples:
+                ordered = sorted(samples)
+                stats[f"{mode}_p50"] = round(ordered[len(ordered) // 2], 3)
+                stats[f"{mode}_p95"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+        return stats
+
+
+telegram_files = TelegramFiles()
@@ -6,10 +6,15 @@ Este archivo se ejecuta en paralelo con el bot de Telegram.
 import os
 import logging
 from flask import Flask, request, jsonify
+from utils.audit import audit_log
 from utils.payments import process_webhook
 
 logger = logging.getLogger(__name__)
 
+# Este proceso no tiene apagado ordenado (SIGTERM no ejecuta atexit): cada
+# fila de auditoría se escribe en la misma transacción que el pago.
+audit_log.set_strict()
+
 app = Flask(__name__)
 
 